@@ -0,0 +1,388 @@
+"""여러 RTSP 카메라를 제한된 수의 디코딩 프로세스로 나눠 받는 풀입니다.
+
+디코딩은 GIL 을 피하려고 별도 프로세스(spawn)에서 하고, 각 프로세스는 맡은 스트림마다 LatestFrameGrabber
+스레드를 돌립니다. 프레임은 스트림별 공유 메모리의 두 칸에 번갈아 써서 앱 프로세스가 복사 한 번으로
+최신 프레임만 읽고, 복사하는 동안 쓰기가 겹쳤는지는 seqlock(version)으로 확인합니다.
+공유 메모리는 스트림을 열 때마다 새로 만들고, 앱 프로세스는 머리(header)에 쓰지 않습니다. 이전 공유 메모리는
+디코딩 프로세스가 grabber 를 멈추고 닫았다고 알린 뒤에 해제하므로, 이전 주소의 프레임이 섞이지 않습니다.
+
+화면에 보이는 타일만 디코딩합니다. 각 세션은 그리는 타일마다 request(스트림, 세션, 가로 픽셀, fps) 로
+임대(lease)를 갱신하고, 풀은 임대가 살아 있는 스트림만 열며 가장 큰 요청에 맞춰 해상도/프레임률을 정합니다.
+아무도 보지 않는 스트림은 닫으므로 CPU 는 연결된 카메라 수가 아니라 실제로 보이는 타일에 비례합니다.
+"""
+import os
+import time
+import queue
+import logging
+import threading
+import atexit
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 공유 메모리 머리(header) 필드. 모두 float64 로 저장합니다.
+# version 은 seqlock 카운터로, 프레임과 seq/slot/width/height/decoded_at 을 쓰는 동안에만 홀수입니다.
+HEADER_FIELDS = ["seq", "slot", "width", "height", "decoded_at",
+                 "decode_fps", "decoded", "skipped", "failures", "connected", "version"]
+H = {name: i for i, name in enumerate(HEADER_FIELDS)}
+HEADER_BYTES = 8 * 16
+
+
+class FrameBuffer:
+    """한 스트림의 공유 메모리(머리 + 프레임 두 칸)입니다. 쓰는 쪽은 디코딩 프로세스 하나뿐입니다."""
+
+    def __init__(self, shm, slot_bytes, read_retries=3):
+        self.shm = shm
+        self.slot_bytes = slot_bytes
+        self.read_retries = read_retries
+        # 읽는 쪽(앱 프로세스)에서 마지막으로 온전하게 읽은 (프레임, seq, 디코딩 시각)
+        self._last = (None, 0, None)
+        self.header = np.ndarray((HEADER_BYTES // 8,), dtype=np.float64, buffer=shm.buf[:HEADER_BYTES])
+        self.slots = [
+            np.ndarray((slot_bytes,), dtype=np.uint8, buffer=shm.buf[HEADER_BYTES + i * slot_bytes:HEADER_BYTES + (i + 1) * slot_bytes])
+            for i in range(2)
+        ]
+
+    @classmethod
+    def create(cls, slot_bytes):
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + 2 * slot_bytes)
+        buffer = cls(shm, slot_bytes)
+        buffer.header[:] = 0
+        return buffer
+
+    @classmethod
+    def attach(cls, name, slot_bytes):
+        return cls(shared_memory.SharedMemory(name=name), slot_bytes)
+
+    def write(self, frame, decoded_at):
+        """프레임을 다음 칸에 쓰고 seq 를 올려 공개합니다. 칸보다 큰 프레임은 줄여서 씁니다.
+
+        쓰는 동안 version 을 홀수로 두어, 그 사이에 복사한 읽기는 read() 가 버리게 합니다.
+        """
+        height, width = frame.shape[:2]
+        if height * width * 3 > self.slot_bytes:
+            import cv2
+            scale = (self.slot_bytes / (height * width * 3)) ** 0.5
+            width, height = int(width * scale), int(height * scale)
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        slot = int(self.header[H["seq"]] + 1) % 2
+        self.header[H["version"]] += 1
+        self.slots[slot][:height * width * 3] = frame.reshape(-1)
+        self.header[H["slot"]], self.header[H["width"]], self.header[H["height"]] = slot, width, height
+        self.header[H["decoded_at"]] = decoded_at
+        self.header[H["seq"]] += 1
+        self.header[H["version"]] += 1
+
+    def read(self):
+        """(프레임 BGR 사본, seq, 디코딩 시각 epoch 초) 를 반환합니다. 아직 프레임이 없으면 (None, 0, None) 입니다.
+
+        복사 전후의 version 이 같은 짝수일 때만 온전한 프레임으로 봅니다. read_retries 번 모두 쓰기와 겹치면
+        마지막으로 온전하게 읽은 프레임을 돌려줍니다.
+        """
+        for _ in range(self.read_retries):
+            version = int(self.header[H["version"]])
+            if version % 2:
+                continue
+            seq = int(self.header[H["seq"]])
+            if seq == 0:
+                # 스트림을 새로 열어 머리가 초기화된 경우이므로 이전 스트림의 프레임도 버립니다.
+                self._last = (None, 0, None)
+                return self._last
+            slot, width, height = (int(self.header[H[name]]) for name in ("slot", "width", "height"))
+            decoded_at = float(self.header[H["decoded_at"]])
+            frame = self.slots[slot][:height * width * 3].copy().reshape(height, width, 3)
+            if int(self.header[H["version"]]) == version:
+                self._last = (frame, seq, decoded_at)
+                return self._last
+        return self._last
+
+    def close(self, unlink=False):
+        # numpy 뷰가 버퍼를 잡고 있으면 close() 가 실패하므로 먼저 놓습니다.
+        self.header = self.slots = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _worker_main(worker_id, commands, events, slot_bytes, parent_pid):
+    """디코딩 프로세스: 명령(open/configure/close/stop)을 받아 스트림별 grabber 를 관리합니다.
+
+    스트림을 닫으면 grabber 가 멈춘 뒤 events 에 ("closed", 공유 메모리 이름) 을 보내 앱이 해제할 수 있게 합니다.
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S')
+    from rtsp_grabber import LatestFrameGrabber
+
+    streams = {}
+
+    def close(stream_id):
+        grabber, buffer = streams.pop(stream_id)
+        grabber.stop()
+        buffer.header[H["connected"]] = 0
+        shm_name = buffer.shm.name
+        buffer.close()
+        events.put(("closed", shm_name))
+
+    while True:
+        try:
+            command = commands.get(timeout=1.0)
+        except queue.Empty:
+            command = None
+        if os.getppid() != parent_pid:
+            # 앱 프로세스가 사라졌으면 함께 종료합니다.
+            command = ("stop",)
+        if command is not None:
+            op = command[0]
+            if op == "open":
+                _, stream_id, url, width, fps, shm_name = command
+                if stream_id in streams:
+                    close(stream_id)
+                buffer = FrameBuffer.attach(shm_name, slot_bytes)
+                grabber = LatestFrameGrabber(url, max_width=width, max_fps=fps, idle_timeout=None,
+                                             name=stream_id, on_frame=buffer.write)
+                streams[stream_id] = (grabber.start(), buffer)
+            elif op == "configure":
+                _, stream_id, width, fps = command
+                if stream_id in streams:
+                    grabber = streams[stream_id][0]
+                    grabber.max_width, grabber.max_fps = width, fps
+            elif op == "close":
+                if command[1] in streams:
+                    close(command[1])
+            elif op == "stop":
+                for stream_id in list(streams):
+                    close(stream_id)
+                return
+        for grabber, buffer in streams.values():
+            stats = grabber.get_stats()
+            for name in ("decode_fps", "decoded", "skipped", "failures", "connected"):
+                buffer.header[H[name]] = float(stats[name])
+
+
+class CameraPool:
+    """보이는 타일의 임대에 따라 스트림을 디코딩 프로세스에 배정하고 최신 프레임을 읽어 주는 풀입니다."""
+
+    def __init__(self, max_workers=2, slot_size=(1280, 720), lease_timeout=5.0, reconcile_interval=0.5,
+                 low_res_width=640, name="camera-pool"):
+        self.max_workers = max_workers
+        self.slot_bytes = slot_size[0] * slot_size[1] * 3
+        self.lease_timeout = lease_timeout
+        self.reconcile_interval = reconcile_interval
+        # 요청 해상도가 이 값 이하이고 카메라에 보조(저해상도) 스트림이 있으면 그 주소로 받습니다.
+        self.low_res_width = low_res_width
+        self.name = name
+        self._ctx = mp.get_context("spawn")
+        self._workers = []
+        self._cameras = {}
+        self._leases = {}
+        self._active = {}
+        self._buffers = {}
+        # 닫기를 요청했지만 아직 해제하지 않은 공유 메모리 {이름: {"buffer", "worker", "acked"}}
+        self._retired = {}
+        self._delivered = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # ----------------------------------
+    # 카메라와 임대
+    # ----------------------------------
+    def set_cameras(self, cameras):
+        """카메라 목록 [{name, url, url_low(선택)}] 을 등록합니다. 목록에서 빠진 카메라는 다음 정리 때 닫힙니다."""
+        with self._lock:
+            self._cameras = {camera["name"]: dict(camera) for camera in cameras}
+            for stream_id in list(self._leases):
+                if stream_id not in self._cameras:
+                    del self._leases[stream_id]
+
+    def request(self, stream_id, viewer, width, fps):
+        """viewer 가 stream_id 를 width 픽셀 폭, fps 로 보고 있음을 알립니다. lease_timeout 안에 다시 불러야 유지됩니다."""
+        with self._lock:
+            if stream_id in self._cameras:
+                self._leases.setdefault(stream_id, {})[viewer] = (time.monotonic() + self.lease_timeout, width, fps)
+
+    def read(self, stream_id):
+        """스트림의 최신 프레임(BGR)과 정보 dict(seq, age, width, height)를 반환합니다. 프레임이 없으면 None 입니다."""
+        buffer = self._buffers.get(stream_id)
+        if buffer is None or stream_id not in self._active:
+            return None, None
+        frame, seq, decoded_at = buffer.read()
+        if frame is None:
+            return None, None
+        with self._lock:
+            self._delivered[stream_id] = self._delivered.get(stream_id, (0, 0))
+            last_seq, delivered = self._delivered[stream_id]
+            if seq > last_seq:
+                self._delivered[stream_id] = (seq, delivered + 1)
+        return frame, {"seq": seq, "age": time.time() - decoded_at, "width": frame.shape[1], "height": frame.shape[0]}
+
+    # ----------------------------------
+    # 배정
+    # ----------------------------------
+    def _desired(self, now):
+        desired = {}
+        for stream_id, leases in self._leases.items():
+            for viewer, (expires, _, _) in list(leases.items()):
+                if expires < now:
+                    del leases[viewer]
+            if leases:
+                desired[stream_id] = (max(w for _, w, _ in leases.values()), max(f for _, _, f in leases.values()))
+        return desired
+
+    def _source_url(self, stream_id, width):
+        camera = self._cameras[stream_id]
+        if camera.get("url_low") and width <= self.low_res_width:
+            return camera["url_low"]
+        return camera["url"]
+
+    def _start_worker(self, index):
+        commands, events = self._ctx.Queue(), self._ctx.Queue()
+        process = self._ctx.Process(target=_worker_main, args=(index, commands, events, self.slot_bytes, os.getpid()),
+                                    name=f"{self.name}-{index}", daemon=True)
+        process.start()
+        logging.info(f"[{self.name}] 디코딩 프로세스 {index} 시작 (pid {process.pid})")
+        return {"process": process, "commands": commands, "events": events, "streams": set()}
+
+    def _release_retired(self):
+        # 디코딩 프로세스가 닫았다고 알린(또는 프로세스가 죽은) 공유 메모리만 해제합니다.
+        for worker in self._workers:
+            while True:
+                try:
+                    event = worker["events"].get_nowait()
+                except queue.Empty:
+                    break
+                if event[0] == "closed" and event[1] in self._retired:
+                    self._retired[event[1]]["acked"] = True
+        for shm_name, retired in list(self._retired.items()):
+            if not retired["acked"]:
+                continue
+            try:
+                retired["buffer"].close(unlink=True)
+            except BufferError:
+                # 다른 세션이 아직 읽는 중이면 다음 정리 때 다시 해제합니다.
+                continue
+            except FileNotFoundError:
+                pass
+            del self._retired[shm_name]
+
+    def _retire(self, stream_id, worker, acked=False):
+        buffer = self._buffers.pop(stream_id, None)
+        if buffer is not None:
+            self._retired[buffer.shm.name] = {"buffer": buffer, "worker": worker, "acked": acked}
+
+    def _reconcile(self):
+        with self._lock:
+            # 죽은 디코딩 프로세스는 다시 띄우고, 맡았던 스트림은 아래에서 새로 배정합니다.
+            for index, worker in enumerate(self._workers):
+                if not worker["process"].is_alive():
+                    logging.error(f"[{self.name}] 디코딩 프로세스 {index} 종료됨 (exit {worker['process'].exitcode}), 다시 시작합니다.")
+                    for stream_id in worker["streams"]:
+                        self._active.pop(stream_id, None)
+                        self._retire(stream_id, index, acked=True)
+                    for retired in self._retired.values():
+                        if retired["worker"] == index:
+                            retired["acked"] = True
+                    self._workers[index] = self._start_worker(index)
+            self._release_retired()
+
+            desired = self._desired(time.monotonic())
+            for stream_id in [s for s in self._active if s not in desired]:
+                self._close(stream_id)
+            for stream_id, (width, fps) in desired.items():
+                url = self._source_url(stream_id, width)
+                active = self._active.get(stream_id)
+                if active is not None and active["url"] != url:
+                    self._close(stream_id)
+                    active = None
+                if active is None:
+                    self._open(stream_id, url, width, fps)
+                elif (active["width"], active["fps"]) != (width, fps):
+                    self._workers[active["worker"]]["commands"].put(("configure", stream_id, width, fps))
+                    active.update(width=width, fps=fps)
+
+    def _open(self, stream_id, url, width, fps):
+        index = min(range(len(self._workers)), key=lambda i: len(self._workers[i]["streams"]))
+        # 이전 공유 메모리는 닫힌 grabber 가 아직 쓰고 있을 수 있으므로 항상 새로 만듭니다.
+        buffer = self._buffers[stream_id] = FrameBuffer.create(self.slot_bytes)
+        self._delivered.pop(stream_id, None)
+        self._workers[index]["commands"].put(("open", stream_id, url, width, fps, buffer.shm.name))
+        self._workers[index]["streams"].add(stream_id)
+        self._active[stream_id] = {"worker": index, "url": url, "width": width, "fps": fps}
+        logging.info(f"[{self.name}] '{stream_id}' 디코딩 시작 (프로세스 {index}, {width}px, {fps}fps)")
+
+    def _close(self, stream_id):
+        active = self._active.pop(stream_id)
+        worker = self._workers[active["worker"]]
+        worker["commands"].put(("close", stream_id))
+        worker["streams"].discard(stream_id)
+        self._retire(stream_id, active["worker"])
+        logging.info(f"[{self.name}] '{stream_id}' 화면에 없어 디코딩 중지")
+
+    # ----------------------------------
+    # 생명주기
+    # ----------------------------------
+    def start(self):
+        """디코딩 프로세스들과 배정 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        with self._lock:
+            self._workers = [self._start_worker(i) for i in range(self.max_workers)]
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-reconcile", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self._reconcile()
+            except Exception as e:
+                logging.error(f"[{self.name}] 스트림 배정 실패: {e}", exc_info=True)
+            self._stop_event.wait(self.reconcile_interval)
+
+    def stop(self, timeout=5.0):
+        """배정 스레드와 디코딩 프로세스를 종료하고 공유 메모리를 해제합니다."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        for worker in self._workers:
+            worker["commands"].put(("stop",))
+        for worker in self._workers:
+            worker["process"].join(timeout)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+        self._workers = []
+        self._active.clear()
+        for buffer in [*self._buffers.values(), *(retired["buffer"] for retired in self._retired.values())]:
+            try:
+                buffer.close(unlink=True)
+            except (FileNotFoundError, BufferError):
+                pass
+        self._buffers.clear()
+        self._retired.clear()
+
+    def get_stats(self):
+        """카메라별 상태(디코딩 중/중지, 배정 프로세스, 해상도, fps, 디코딩/전달/버린 프레임 수)를 반환합니다."""
+        with self._lock:
+            stats = {}
+            for stream_id in self._cameras:
+                active = self._active.get(stream_id)
+                entry = {"state": "decoding" if active else "paused", "viewers": len(self._leases.get(stream_id, {})),
+                         "worker": None, "width": None, "fps": None, "low_res": False,
+                         "connected": False, "decode_fps": 0.0, "decoded": 0, "delivered": 0, "dropped": 0,
+                         "skipped": 0, "failures": 0}
+                if active:
+                    header = self._buffers[stream_id].header
+                    delivered = self._delivered.get(stream_id, (0, 0))[1]
+                    decoded = int(header[H["decoded"]])
+                    entry.update(worker=active["worker"], width=active["width"], fps=active["fps"],
+                                 low_res=active["url"] != self._cameras[stream_id]["url"],
+                                 connected=bool(header[H["connected"]]), decode_fps=float(header[H["decode_fps"]]),
+                                 decoded=decoded, delivered=delivered, dropped=max(0, decoded - delivered),
+                                 skipped=int(header[H["skipped"]]), failures=int(header[H["failures"]]))
+                stats[stream_id] = entry
+            workers = [{"pid": w["process"].pid, "alive": w["process"].is_alive(), "streams": len(w["streams"])}
+                       for w in self._workers]
+        return {"cameras": stats, "workers": workers}
@@ -0,0 +1,110 @@
+import os
+
+import streamlit as st
+
+from camera_pool import CameraPool
+
+# --- 페이지 설정 ---
+st.set_page_config(page_title="다중 카메라 모니터링", layout="wide")
+st.title("🎥 다중 RTSP 카메라 모니터링")
+st.markdown("여러 카메라를 격자로 봅니다. 화면에 보이는 타일만 디코딩하고, 타일 크기와 갱신 주기에 맞춰 해상도/프레임률을 낮춥니다.")
+
+# 디코딩 프로세스 수. 스트림은 이 프로세스들에 나눠 배정됩니다.
+DECODE_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+GRID_WIDTH_PX = 1600  # 격자 전체 폭(픽셀). 타일 해상도는 이 값을 열 수로 나눠 정합니다.
+FOCUS_WIDTH_PX = 1280  # 확대한 카메라의 해상도
+FOCUS_FPS = 15  # 확대한 카메라의 갱신 프레임률
+TILE_FPS_OPTIONS = [1, 2, 5, 10]
+DEFAULT_CAMERAS = "Jetson Orin,rtsp://172.30.1.15:8554/stream"
+
+
+def load_cameras():
+    """secrets 의 [[cameras]] (name, url, url_low) 를 쓰고, 없으면 입력한 '이름,주소[,저해상도 주소]' 줄을 씁니다."""
+    try:
+        cameras = [dict(camera) for camera in st.secrets.get("cameras", [])]
+    except Exception:
+        cameras = []
+    if cameras:
+        return cameras
+    text = st.sidebar.text_area("카메라 목록 (이름,RTSP 주소[,저해상도 주소])", DEFAULT_CAMERAS, height=120)
+    cameras = []
+    for line in text.splitlines():
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) >= 2 and parts[0] and parts[1]:
+            cameras.append({"name": parts[0], "url": parts[1], "url_low": parts[2] if len(parts) > 2 else None})
+    return cameras
+
+
+@st.cache_resource
+def get_camera_pool():
+    # 모든 세션이 디코딩 프로세스 풀 하나를 공유합니다.
+    return CameraPool(max_workers=DECODE_WORKERS).start()
+
+
+with st.sidebar:
+    st.header("⚙️ 격자 설정")
+    cameras = load_cameras()
+    columns = st.slider("열 수", 1, 4, 2)
+    rows = st.slider("페이지당 행 수", 1, 4, 2)
+    tile_fps = st.select_slider("타일 갱신 FPS", TILE_FPS_OPTIONS, value=2)
+    names = [camera["name"] for camera in cameras]
+    focus = st.selectbox("확대할 카메라", ["없음", *names])
+
+if not cameras:
+    st.warning("카메라를 한 대 이상 등록해주세요.")
+    st.stop()
+
+pool = get_camera_pool()
+pool.set_cameras(cameras)
+if "viewer_id" not in st.session_state:
+    st.session_state.viewer_id = os.urandom(8).hex()
+viewer = st.session_state.viewer_id
+
+# 확대 모드면 한 대만, 아니면 현재 페이지의 타일만 보이는 것으로 요청합니다.
+if focus != "없음":
+    visible, tile_width, fps, grid_columns = [focus], FOCUS_WIDTH_PX, FOCUS_FPS, 1
+else:
+    per_page = columns * rows
+    pages = max(1, -(-len(names) // per_page))
+    page = st.number_input("페이지", 1, pages, 1) if pages > 1 else 1
+    visible = names[(page - 1) * per_page:page * per_page]
+    tile_width, fps, grid_columns = GRID_WIDTH_PX // columns, tile_fps, columns
+
+
+@st.fragment(run_every=1.0 / fps)
+def render_tiles():
+    cols = st.columns(grid_columns)
+    for i, name in enumerate(visible):
+        pool.request(name, viewer, tile_width, fps)
+        frame, info = pool.read(name)
+        with cols[i % grid_columns]:
+            if frame is None:
+                st.info(f"📡 {name}: 연결 중...")
+            else:
+                st.image(frame, channels="BGR", output_format="JPEG", use_container_width=True,
+                         caption=f"{name} · {info['width']}x{info['height']} · {info['age'] * 1000:.0f} ms 전")
+
+
+@st.fragment(run_every=2)
+def render_pool_stats():
+    stats = pool.get_stats()
+    alive = sum(1 for worker in stats["workers"] if worker["alive"])
+    decoding = sum(1 for camera in stats["cameras"].values() if camera["state"] == "decoding")
+    cols = st.columns(3)
+    cols[0].metric("디코딩 프로세스", f"{alive}/{len(stats['workers'])}")
+    cols[1].metric("디코딩 중인 카메라", f"{decoding}/{len(stats['cameras'])}")
+    cols[2].metric("디코딩 FPS 합계", f"{sum(c['decode_fps'] for c in stats['cameras'].values()):.1f}")
+    rows = [
+        {"카메라": name, "상태": "🟢 디코딩" if c["state"] == "decoding" and c["connected"]
+         else "🟠 연결 중" if c["state"] == "decoding" else "⏸️ 중지",
+         "프로세스": c["worker"], "해상도": c["width"], "FPS 제한": c["fps"], "저해상도": c["low_res"],
+         "디코딩 FPS": round(c["decode_fps"], 1), "디코딩": c["decoded"], "전달": c["delivered"],
+         "버림": c["dropped"], "건너뜀": c["skipped"], "실패": c["failures"]}
+        for name, c in stats["cameras"].items()
+    ]
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
+render_tiles()
+with st.expander("📊 디코딩 상태", expanded=False):
+    render_pool_stats()
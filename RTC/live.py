@@ -1,71 +1,81 @@
+import os
 import streamlit as st
-import cv2
-import av
-from streamlit_webrtc import webrtc_streamer, VideoProcessorBase
+from streamlit_webrtc import webrtc_streamer, WebRtcMode
+
+from rtsp_grabber import LatestFrameGrabber, make_video_track
 
 # --- 페이지 설정 ---
 st.set_page_config(page_title="Jetson RTSP 스트리밍", layout="wide")
 st.title("📹 Jetson Orin 실시간 RTSP 영상 보기")
 st.markdown("Jetson Orin에서 송출 중인 RTSP 영상을 실시간으로 확인합니다.")
 
+# 전송 해상도(가로 픽셀)와 프레임률 선택지. 줄이면 디코딩 후 변환/인코딩 부담과 전송량이 줄어듭니다.
+WIDTH_OPTIONS = {"원본": None, "1280": 1280, "960": 960, "640": 640}
+FPS_OPTIONS = {"제한 없음": None, "30": 30, "15": 15, "10": 10, "5": 5}
+SEND_FPS = 30  # WebRTC 로 내보내는 간격 (프레임률을 제한하면 그 값을 사용)
+
 # --- Jetson IP 입력 ---
 JETSON_IP = st.text_input("Jetson Orin IP 주소를 입력하세요:", "172.30.1.15") # 찾으신 IP를 기본값으로 설정
 
-if JETSON_IP:
-    RTSP_URL = f"rtsp://{JETSON_IP}:8554/stream"
+with st.sidebar:
+    st.header("⚙️ 영상 설정")
+    max_width = WIDTH_OPTIONS[st.selectbox("최대 가로 해상도", list(WIDTH_OPTIONS))]
+    max_fps = FPS_OPTIONS[st.selectbox("최대 프레임률", list(FPS_OPTIONS))]
 
-    # 1. VideoCapture를 안전하게 처리하는 클래스를 정의합니다.
-    class RTSPVideoProcessor(VideoProcessorBase):
-        def __init__(self, rtsp_url):
-            self.rtsp_url = rtsp_url
-            self.cap = None
 
-        def recv(self, frame: av.VideoFrame) -> av.VideoFrame:
-            # 이 메서드는 webrtc_streamer에 의해 내부적으로 호출됩니다.
-            # 하지만 우리는 자체 VideoCapture를 사용할 것이므로,
-            # 입력 프레임(frame)은 무시하고 우리 소스의 프레임을 반환합니다.
+@st.cache_resource
+def get_grabber(rtsp_url):
+    # 같은 주소를 보는 모든 세션이 디코딩 스레드 하나를 공유합니다. 해상도/프레임률은 세션별 요청 중 가장 큰 값입니다.
+    return LatestFrameGrabber(rtsp_url).start()
 
-            if self.cap is None:
-                # VideoCapture 객체를 recv 메서드 안에서 처음 호출될 때 생성
-                self.cap = cv2.VideoCapture(self.rtsp_url)
-                if not self.cap.isOpened():
-                    st.error("RTSP 연결 실패. IP 주소나 네트워크를 확인하세요.")
-                    return None # 연결 실패 시 아무것도 하지 않음
 
-            ret, frame_bgr = self.cap.read()
-            if not ret:
-                st.warning("프레임을 받아오지 못했습니다. 재연결 시도 중...")
-                self.cap.release()
-                self.cap = None # 연결이 끊어지면 cap을 None으로 만들어 재연결 시도
-                return av.VideoFrame.from_ndarray(
-                    cv2.cvtColor(
-                        cv2.putText(
-                            np.zeros((480, 640, 3), dtype=np.uint8),
-                            "Reconnecting...",
-                            (50, 240),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            1,
-                            (255, 255, 255),
-                            2
-                        ),
-                        cv2.COLOR_BGR2RGB
-                    ),
-                    format="rgb24"
-                )
+@st.fragment(run_every=1)
+def render_stream_stats(grabber, viewer, max_width, max_fps):
+    # 화면이 열려 있는 동안 매초 이 세션의 설정 임대를 갱신합니다.
+    grabber.request(viewer, max_width, max_fps)
+    stats = grabber.get_stats()
+    cols = st.columns(5)
+    if stats["connected"]:
+        cols[0].success("🟢 수신 중")
+    elif stats["idle"]:
+        cols[0].info("⏸️ 시청자 없음")
+    else:
+        cols[0].warning(f"🟠 재연결 중 ({stats['failures']}회)")
+    cols[1].metric("디코딩 FPS", f"{stats['decode_fps']:.1f}")
+    cols[2].metric("버린 프레임", f"{stats['dropped']:,}", help="전송하기 전에 더 새 프레임으로 덮어쓴 프레임 수")
+    cols[3].metric("건너뛴 프레임", f"{stats['skipped']:,}", help="프레임률 제한으로 변환하지 않은 프레임 수")
+    cols[4].metric("화면 지연(추정)", "N/A" if stats["delay"] is None else f"{stats['delay'] * 1000:.0f} ms",
+                   help="디코딩 누적 지연 + 전달 대기 시간. 카메라 인코딩/네트워크 고정 지연은 포함하지 않습니다.")
+    st.caption(f"적용 중인 설정 (시청자 {stats['viewers']}명 중 가장 높은 값): "
+               f"가로 {stats['max_width'] or '원본'} / {stats['max_fps'] or '제한 없음'} fps")
+    if stats["last_error"] and not stats["connected"]:
+        st.caption(f"마지막 오류: {stats['last_error']}")
+
+
+if JETSON_IP:
+    RTSP_URL = f"rtsp://{JETSON_IP}:8554/stream"
 
-            # OpenCV(BGR) 프레임을 WebRTC(RGB)가 이해하는 포맷으로 변환
-            return av.VideoFrame.from_ndarray(frame_bgr, format="bgr24")
+    # RTSP 디코딩은 별도 스레드가 맡고, WebRTC 트랙은 보낼 시점의 최신 프레임만 가져가므로 기다리지 않습니다.
+    # 설정을 바꾸면 연결을 새로 열지 않고 같은 grabber 의 다음 프레임부터 반영됩니다.
+    # 같은 주소를 보는 세션들의 설정은 임대로 모아 가장 높은 값을 쓰므로 서로 덮어쓰지 않습니다.
+    if "viewer_id" not in st.session_state:
+        st.session_state.viewer_id = os.urandom(8).hex()
+    grabber = get_grabber(RTSP_URL)
+    grabber.request(st.session_state.viewer_id, max_width, max_fps)
+    stream_key = f"jetson-rtsp-{RTSP_URL}-{max_fps}"
+    if st.session_state.get("video_track_key") != stream_key:
+        st.session_state.video_track = make_video_track(grabber, fps=max_fps or SEND_FPS)
+        st.session_state.video_track_key = stream_key
 
     st.info(f"아래 박스에서 RTSP 스트리밍을 시작하세요. URL: {RTSP_URL}")
 
     webrtc_streamer(
-        key="jetson-rtsp",
+        key=stream_key,
         mode=WebRtcMode.RECVONLY,
         rtc_configuration={"iceServers": [{"urls": ["stun:stun.l.google.com:19302"]}]},
-        # 2. video_processor_factory에 우리가 정의한 클래스를 전달합니다.
-        video_processor_factory=lambda: RTSPVideoProcessor(rtsp_url=RTSP_URL),
+        source_video_track=st.session_state.video_track,
         media_stream_constraints={"video": True, "audio": False},
-        async_processing=True,
     )
+    render_stream_stats(grabber, st.session_state.viewer_id, max_width, max_fps)
 else:
     st.warning("Jetson Orin IP 주소를 입력해주세요.")
@@ -0,0 +1,271 @@
+import time
+import asyncio
+import random
+import logging
+import threading
+import atexit
+from fractions import Fraction
+
+import numpy as np
+import cv2
+
+VIDEO_CLOCK_RATE = 90000
+
+
+def placeholder_frame(text, width=640, height=480):
+    """연결 대기/재연결 중에 보낼 검은 바탕 안내 화면(BGR)을 만듭니다."""
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    cv2.putText(frame, text, (40, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+    return frame
+
+
+def open_rtsp(url, open_timeout=5.0, read_timeout=5.0):
+    """FFmpeg 백엔드로 RTSP 를 엽니다. 내부 버퍼를 1 프레임으로 줄여 오래된 프레임이 쌓이지 않게 합니다."""
+    cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, [
+        cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout * 1000),
+        cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout * 1000),
+    ])
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+class LatestFrameGrabber:
+    """RTSP 를 자체 스레드에서 디코딩하고 가장 최근 프레임 하나만 보관합니다.
+
+    소비자(WebRTC 트랙)는 latest() 로 그 시점의 최신 프레임만 가져가므로 기다리지 않고, 소비자보다 빨리
+    디코딩된 프레임은 덮어써서 버립니다. 끊기면 이 스레드가 지수 백오프로 다시 연결합니다.
+    max_fps 를 넘는 프레임은 색 변환 없이 grab() 으로 건너뛰고, max_width 보다 넓은 프레임은 줄여서 넘깁니다.
+    idle_timeout 초 동안 아무도 latest() 를 부르지 않으면 연결을 닫고, 다음 호출 때 다시 엽니다(None 이면 계속 수신).
+    on_frame 을 주면 새 프레임마다 디코딩 스레드에서 on_frame(frame, 디코딩 시각 epoch 초) 를 호출합니다.
+    max_width, max_fps 는 실행 중에 바꿔도 다음 프레임부터 반영됩니다. 여러 시청자가 공유할 때는 request() 로
+    시청자별 설정을 알리면, lease_timeout 안에 갱신된 요청 중 가장 큰 값으로 정합니다.
+    """
+
+    def __init__(self, url, max_width=None, max_fps=None, idle_timeout=30.0, lease_timeout=5.0,
+                 base_backoff=1.0, max_backoff=30.0, capture_factory=open_rtsp, name=None, on_frame=None):
+        self.url = url
+        self.name = name or url
+        self.max_width = max_width
+        self.max_fps = max_fps
+        self.idle_timeout = idle_timeout
+        self.lease_timeout = lease_timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.capture_factory = capture_factory
+        self.on_frame = on_frame
+        self._frame = None
+        self._seq = 0
+        self._decoded_at = None
+        self._consumed_seq = 0
+        self._last_access = time.monotonic()
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stream_origin = None
+        self._stats = {
+            "connected": False, "decoded": 0, "dropped": 0, "skipped": 0, "reconnects": 0, "failures": 0,
+            "decode_fps": 0.0, "decode_lag": None, "handoff_age": None, "last_error": None, "idle": False,
+        }
+
+    # ----------------------------------
+    # 소비자 쪽 (절대 기다리지 않음)
+    # ----------------------------------
+    def latest(self):
+        """(최신 프레임 BGR, 시퀀스 번호, 디코딩 시각 monotonic) 를 반환합니다. 아직 프레임이 없으면 프레임은 None 입니다."""
+        self._last_access = time.monotonic()
+        if self._stats["idle"]:
+            self._wake.set()
+        with self._lock:
+            frame, seq, decoded_at = self._frame, self._seq, self._decoded_at
+            if seq > self._consumed_seq:
+                self._consumed_seq = seq
+        if decoded_at is not None:
+            self._stats["handoff_age"] = time.monotonic() - decoded_at
+        return frame, seq, decoded_at
+
+    def request(self, viewer, max_width=None, max_fps=None):
+        """viewer 가 max_width 픽셀 폭, max_fps 로 보고 있음을 알립니다. lease_timeout 안에 다시 불러야 유지됩니다.
+
+        살아 있는 요청 중 가장 큰 값(None 은 제한 없음)을 적용하므로, 한 시청자가 낮춘 설정이 다른 시청자의
+        화면을 떨어뜨리지 않고, 떠난 시청자의 설정은 임대가 끝나면 빠집니다.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._leases[viewer] = (now + self.lease_timeout, max_width, max_fps)
+            for key, (expires, _, _) in list(self._leases.items()):
+                if expires < now:
+                    del self._leases[key]
+            widths = [width for _, width, _ in self._leases.values()]
+            rates = [fps for _, _, fps in self._leases.values()]
+            self.max_width = None if None in widths else max(widths)
+            self.max_fps = None if None in rates else max(rates)
+
+    def get_stats(self):
+        """연결 상태, 디코딩 FPS, 버린/건너뛴 프레임 수, 지연 추정값을 반환합니다.
+
+        decode_lag 는 연결 후 첫 프레임 대비 스트림 시각(pts)이 벽시계보다 얼마나 뒤처졌는지(누적 지연),
+        handoff_age 는 디코딩된 프레임이 소비자에게 넘어갈 때까지 걸린 시간입니다. 두 값의 합을 화면 지연
+        (glass-to-glass) 추정값 delay 로 돌려주며, 카메라 인코딩/네트워크의 고정 지연은 포함하지 않습니다.
+        """
+        stats = dict(self._stats)
+        stats.update(max_width=self.max_width, max_fps=self.max_fps, viewers=len(self._leases))
+        lag, age = stats["decode_lag"], stats["handoff_age"]
+        stats["delay"] = None if lag is None and age is None else (lag or 0.0) + (age or 0.0)
+        return stats
+
+    # ----------------------------------
+    # 생명주기
+    # ----------------------------------
+    def start(self):
+        """디코딩 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"rtsp-{self.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=5.0):
+        """디코딩 스레드를 종료합니다."""
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _is_idle(self, now):
+        return self.idle_timeout is not None and now - self._last_access > self.idle_timeout
+
+    def _backoff(self, failures):
+        delay = min(self.max_backoff, self.base_backoff * 2 ** max(failures - 1, 0))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _run(self):
+        failures = 0
+        while not self._stop_event.is_set():
+            if self._is_idle(time.monotonic()):
+                # 보는 사람이 없으면 연결을 닫고 다음 latest() 호출까지 기다립니다.
+                self._stats["idle"] = True
+                self._wake.clear()
+                self._wake.wait()
+                self._stats["idle"] = False
+                continue
+            cap = None
+            try:
+                cap = self.capture_factory(self.url)
+                if not cap.isOpened():
+                    raise ConnectionError("RTSP 연결 실패")
+                if failures:
+                    self._stats["reconnects"] += 1
+                logging.info(f"[{self.name}] RTSP 연결됨")
+                self._stats["connected"] = True
+                failures = 0
+                self._read_loop(cap)
+            except Exception as e:
+                failures += 1
+                self._stats["failures"] += 1
+                self._stats["last_error"] = str(e)
+                logging.warning(f"[{self.name}] RTSP 수신 중단 ({failures}회): {e}")
+            finally:
+                self._stats["connected"] = False
+                if cap is not None:
+                    cap.release()
+            if failures and not self._stop_event.is_set():
+                self._stop_event.wait(self._backoff(failures))
+
+    def _read_loop(self, cap):
+        self._stream_origin = None
+        window_start, window_frames = time.monotonic(), 0
+        next_due = 0.0
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if self._is_idle(now):
+                return
+            if self.max_fps and now < next_due:
+                # 프레임률 제한: 디코더는 계속 따라가되 색 변환/전달은 건너뜁니다.
+                if not cap.grab():
+                    raise ConnectionError("프레임 수신 실패")
+                self._stats["skipped"] += 1
+                continue
+            ok, frame = cap.read()
+            if not ok or frame is None:
+                raise ConnectionError("프레임 수신 실패")
+            now = time.monotonic()
+            if self.max_fps:
+                next_due = max(next_due + 1.0 / self.max_fps, now - 1.0 / self.max_fps)
+            if self.max_width and frame.shape[1] > self.max_width:
+                height = int(frame.shape[0] * self.max_width / frame.shape[1])
+                frame = cv2.resize(frame, (self.max_width, height), interpolation=cv2.INTER_AREA)
+            self._track_lag(cap, now)
+            with self._lock:
+                if self._seq > self._consumed_seq:
+                    # 소비자가 가져가기 전에 새 프레임이 왔으므로 이전 프레임은 버려집니다.
+                    self._stats["dropped"] += 1
+                self._frame, self._decoded_at = frame, now
+                self._seq += 1
+            if self.on_frame is not None:
+                self.on_frame(frame, time.time())
+            self._stats["decoded"] += 1
+            window_frames += 1
+            if now - window_start >= 1.0:
+                self._stats["decode_fps"] = window_frames / (now - window_start)
+                window_start, window_frames = now, 0
+
+    def _track_lag(self, cap, now):
+        # 스트림 시각(ms)이 벽시계보다 얼마나 늦게 흘렀는지로 디코딩이 밀린 정도를 추정합니다.
+        pos = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        if pos <= 0:
+            return
+        if self._stream_origin is None:
+            self._stream_origin = (now, pos)
+            return
+        wall, stream = self._stream_origin
+        lag = (now - wall) - (pos - stream)
+        if lag < 0:
+            # 처음 프레임이 늦게 나왔던 경우: 기준을 당겨 최소 지연을 0 으로 맞춥니다.
+            self._stream_origin = (now, pos)
+            lag = 0.0
+        self._stats["decode_lag"] = lag
+
+
+def make_video_track(grabber, fps=30):
+    """grabber 의 최신 프레임을 fps 간격으로 내보내는 aiortc 비디오 트랙을 만듭니다.
+
+    recv() 는 다음 전송 시각까지만 기다리고 그 시점의 최신 프레임을 보내므로 디코딩을 기다리지 않습니다.
+    aiortc 와 av 는 streamlit-webrtc 와 함께 설치되므로 이 함수 안에서 불러옵니다.
+    """
+    import av
+    from aiortc import VideoStreamTrack
+
+    time_base = Fraction(1, VIDEO_CLOCK_RATE)
+    waiting = placeholder_frame("Connecting...")
+
+    class LatestFrameTrack(VideoStreamTrack):
+        kind = "video"
+
+        def __init__(self):
+            super().__init__()
+            self._started = None
+            self._count = 0
+
+        async def next_timestamp(self):
+            if self._started is None:
+                self._started = time.time()
+            else:
+                self._count += 1
+                wait = self._started + self._count / fps - time.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            return int(self._count * VIDEO_CLOCK_RATE / fps), time_base
+
+        async def recv(self):
+            pts, _ = await self.next_timestamp()
+            frame, _, _ = grabber.latest()
+            video = av.VideoFrame.from_ndarray(frame if frame is not None else waiting, format="bgr24")
+            video.pts = pts
+            video.time_base = time_base
+            return video
+
+    return LatestFrameTrack()
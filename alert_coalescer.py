@@ -0,0 +1,76 @@
+import time
+import threading
+
+SOURCE_FIELDS = ("source", "source_device", "source_ip")
+
+
+class AlertCoalescer:
+    """같은 (유형, 발생원) 경보를 하나의 사건(incident)으로 묶습니다.
+
+    사건의 첫 경보만 새 사건으로 돌려주고(알림/저장 대상), 이후 window 초 안에 이어지는 같은 경보는
+    count 와 last_timestamp 만 갱신합니다. window 초 동안 같은 경보가 없으면 사건이 닫힙니다.
+    collect() 는 닫힌 사건과 refresh_interval 이 지난 진행 중 사건 중 바뀐 것을 돌려주므로,
+    저장소 갱신과 화면 알림이 프레임 수가 아니라 사건 수에 비례합니다.
+    """
+
+    def __init__(self, window=10.0, refresh_interval=30.0, source_fields=SOURCE_FIELDS):
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.source_fields = source_fields
+        self._open = {}   # key -> {"incident", "last_seen", "last_flush", "dirty"}
+        self._lock = threading.Lock()
+        self._stats = {"received": 0, "incidents": 0, "merged": 0}
+
+    def key(self, alert):
+        """경보의 (유형, 발생원) 키를 만듭니다. 발생원은 있는 발생원 필드(장치, IP 등)를 모두 합친 것입니다."""
+        return (alert.get("type"), *(alert.get(field) for field in self.source_fields))
+
+    def add(self, alert, now=None):
+        """경보를 추가합니다. 새 사건이면 사건 dict 를, 진행 중인 사건에 합쳐졌으면 None 을 반환합니다.
+
+        사건 dict 는 경보 필드에 count, first_timestamp, last_timestamp 를 더한 것이며,
+        이후 갱신도 같은 dict 에 반영되므로 호출자가 _id 등을 넣어 두면 collect() 결과에 그대로 남습니다.
+        """
+        now = time.monotonic() if now is None else now
+        key = self.key(alert)
+        timestamp = alert.get("timestamp")
+        with self._lock:
+            self._stats["received"] += 1
+            entry = self._open.get(key)
+            if entry is not None and now - entry["last_seen"] <= self.window:
+                incident = entry["incident"]
+                incident["count"] += 1
+                if timestamp is not None:
+                    incident["last_timestamp"] = timestamp
+                entry["last_seen"] = now
+                entry["dirty"] = True
+                self._stats["merged"] += 1
+                return None
+            incident = dict(alert, count=1, first_timestamp=timestamp, last_timestamp=timestamp)
+            self._open[key] = {"incident": incident, "last_seen": now, "last_flush": now, "dirty": False}
+            self._stats["incidents"] += 1
+            return incident
+
+    def collect(self, now=None):
+        """갱신이 필요한 사건을 [(사건 dict, 닫힘 여부)] 로 반환합니다.
+
+        window 가 지난 사건은 닫고 목록에서 뺍니다. 닫히는 사건은 바뀐 것이 있을 때만 포함됩니다.
+        """
+        now = time.monotonic() if now is None else now
+        updates = []
+        with self._lock:
+            for key, entry in list(self._open.items()):
+                closed = now - entry["last_seen"] > self.window
+                due = closed or now - entry["last_flush"] >= self.refresh_interval
+                if due and entry["dirty"]:
+                    updates.append((entry["incident"], closed))
+                    entry["dirty"] = False
+                    entry["last_flush"] = now
+                if closed:
+                    del self._open[key]
+        return updates
+
+    def get_stats(self):
+        """받은 경보 수, 사건 수, 합쳐진 경보 수, 진행 중 사건 수를 반환합니다."""
+        with self._lock:
+            return {**self._stats, "open": len(self._open)}
@@ -0,0 +1,86 @@
+import os
+import logging
+
+import streamlit as st
+
+# 경보 종류별 음원 이름 (확장자 제외). 압축된 '<이름>_mp3.mp3' 를 우선 사용하고 없으면 '<이름>.wav' 를 씁니다.
+ALERT_SOUNDS = {
+    "fire": "fire_cut",
+    "safety": "Stranger_cut",
+}
+SEARCH_DIRS = (os.path.join("app", "static"), "sounds")
+MAX_SOUND_BYTES = 2 * 1024 * 1024
+
+_MIME_TYPES = {".mp3": "audio/mpeg", ".wav": "audio/wav"}
+
+# 재생용 audio 요소를 담는 컨테이너의 key 접두어. 이 컨테이너는 화면에서 숨깁니다.
+PLAYER_KEY_PREFIX = "alert-sound"
+_HIDE_PLAYER_STYLE = f"<style>[class*='st-key-{PLAYER_KEY_PREFIX}'] {{display: none;}}</style>"
+
+
+def _is_valid_audio(path):
+    """파일 머리(header)로 MP3/WAV 여부를 확인합니다."""
+    size = os.path.getsize(path)
+    if size == 0 or size > MAX_SOUND_BYTES:
+        return False
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if path.endswith(".wav"):
+        return head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+    # ID3 태그 또는 MPEG 프레임 동기 비트
+    return head[:3] == b"ID3" or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+
+
+class AudioAssetManager:
+    """경보 음원을 시작할 때 한 번 찾아 검증하고 bytes 로 들고 있는 관리자입니다.
+
+    Streamlit 정적 파일 제공은 mp3/wav 를 text/plain + nosniff 로 보내므로(Firefox 는 재생하지 않음),
+    음원은 st.audio 로 미디어 파일 관리자에 넘깁니다. 미디어 주소는 올바른 Content-Type 으로 제공되고
+    같은 bytes 면 같은 주소(내용 해시)가 되므로, 브라우저는 한 번 받은 음원을 캐시하고 경보마다 요소 참조만 받습니다.
+    """
+
+    def __init__(self, sounds=ALERT_SOUNDS, base_dir=None, search_dirs=SEARCH_DIRS):
+        self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
+        self.assets = {}
+        for name, stem in sounds.items():
+            asset = self._load(name, stem, search_dirs)
+            if asset is not None:
+                self.assets[name] = asset
+
+    def _find(self, stem, search_dirs):
+        for filename in (f"{stem}_mp3.mp3", f"{stem}.wav"):
+            for directory in search_dirs:
+                path = os.path.join(self.base_dir, directory, filename)
+                if os.path.isfile(path):
+                    if _is_valid_audio(path):
+                        return path
+                    logging.warning(f"올바른 음원 파일이 아닙니다: {path}")
+        return None
+
+    def _load(self, name, stem, search_dirs):
+        path = self._find(stem, search_dirs)
+        if path is None:
+            logging.error(f"'{name}' 경보 음원을 찾을 수 없습니다: {stem}_mp3.mp3 / {stem}.wav")
+            return None
+        filename = os.path.basename(path)
+        mime = _MIME_TYPES[os.path.splitext(filename)[1]]
+        with open(path, "rb") as f:
+            data = f.read()
+        logging.info(f"경보 음원 준비: {name} -> {filename} ({len(data) / 1024:.1f}KB)")
+        return {"data": data, "mime": mime, "file": filename}
+
+    def has(self, name):
+        return name in self.assets
+
+    def play(self, name, nonce=""):
+        """숨긴 audio 요소로 음원을 자동 재생합니다. 음원이 없으면 False 를 반환합니다.
+
+        컨테이너 key 에 nonce 를 넣어 매번 새 요소로 그리므로, nonce 가 바뀌면 같은 음원도 다시 재생됩니다.
+        """
+        asset = self.assets.get(name)
+        if asset is None:
+            return False
+        with st.container(key=f"{PLAYER_KEY_PREFIX}-{nonce}"):
+            st.html(_HIDE_PLAYER_STYLE)
+            st.audio(asset["data"], format=asset["mime"], autoplay=True)
+        return True
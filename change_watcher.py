@@ -0,0 +1,311 @@
+"""컬렉션의 최신 N건을 프로세스 안에서 공유하는 목록(LatestView)과 이를 유지하는 감시 스레드(CollectionWatcher).
+
+감시 스레드는 처음에 한 번 조회해 목록을 채운 뒤 변경 스트림의 추가/수정/삭제만 반영합니다.
+목록 조건(query)은 최상위 필드의 값 비교만 지원하며, 수정된 문서가 조건을 벗어나면 목록에서 뺍니다.
+"""
+import bisect
+import time
+import random
+import logging
+import threading
+import atexit
+
+import pymongo
+from pymongo.errors import OperationFailure, PyMongoError
+
+# 변경 스트림을 쓸 수 없는 배포(단일 서버 등)에서 watch() 가 내는 오류 코드
+CHANGE_STREAM_UNSUPPORTED_CODES = {40573, 40324, 136}
+# 저장한 resume token 이 oplog 에서 밀려나 이어 받을 수 없을 때의 오류 코드
+CHANGE_STREAM_HISTORY_LOST_CODES = {286, 280}
+
+# 수정된 문서가 목록 조건을 여전히 만족하는지 확인할 때 쓰는 비교 연산자
+QUERY_OPERATORS = {
+    "$eq": lambda value, arg: value == arg,
+    "$ne": lambda value, arg: value != arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$gte": lambda value, arg: value is not None and value >= arg,
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$lte": lambda value, arg: value is not None and value <= arg,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+}
+
+
+def _check_query(query):
+    """query 가 matches_query() 로 평가할 수 있는 조건인지 확인합니다."""
+    for field, cond in query.items():
+        if field.startswith("$") or "." in field:
+            raise ValueError(f"목록 조건은 최상위 필드 비교만 지원합니다: {field}")
+        if isinstance(cond, dict):
+            unsupported = [op for op in cond if op not in QUERY_OPERATORS and op != "$exists"]
+            if unsupported:
+                raise ValueError(f"목록 조건에서 지원하지 않는 연산자입니다: {', '.join(unsupported)}")
+
+
+def matches_query(doc, query):
+    """문서가 최상위 필드 비교로만 이뤄진 query 를 만족하는지 확인합니다. 없는 필드는 None 으로 비교합니다."""
+    for field, cond in query.items():
+        value = doc.get(field)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, arg in cond.items():
+            if op == "$exists":
+                ok = (field in doc) == bool(arg)
+            else:
+                try:
+                    ok = QUERY_OPERATORS[op](value, arg)
+                except TypeError:
+                    ok = False
+            if not ok:
+                return False
+    return True
+
+
+class _Desc:
+    """정렬 키에서 내림차순 필드를 뒤집어 비교하기 위한 래퍼입니다."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class LatestView:
+    """정렬 기준으로 가장 앞선 capacity 개 문서를 들고 있는 공유 목록입니다.
+
+    감시 스레드만 쓰고 세션들은 items() 로 사본을 읽습니다. 내용이 바뀔 때마다 version 이 올라가므로
+    세션은 version 이 같으면 이전에 그린 화면을 그대로 쓰면 됩니다.
+    """
+
+    def __init__(self, sort, capacity=100):
+        self.sort = list(sort)
+        self.capacity = capacity
+        self.version = 0
+        self.ready = False
+        self._keys = []
+        self._docs = []
+        self._lock = threading.Lock()
+
+    def _key(self, doc):
+        return tuple(
+            _Desc(doc.get(field)) if direction == pymongo.DESCENDING else doc.get(field)
+            for field, direction in self.sort
+        )
+
+    def reset(self, docs):
+        """목록 전체를 바꿉니다. 내용이 같으면 version 을 올리지 않습니다."""
+        docs = list(docs)[:self.capacity]
+        with self._lock:
+            if self.ready and docs == self._docs:
+                return False
+            self._docs = docs
+            self._keys = [self._key(doc) for doc in docs]
+            self.ready = True
+            self.version += 1
+        return True
+
+    def upsert(self, doc):
+        """문서를 추가하거나 같은 _id 의 문서를 바꿉니다. 목록 끝보다 뒤에 오는 문서는 무시합니다."""
+        with self._lock:
+            removed = self._remove(doc["_id"])
+            key = self._key(doc)
+            index = bisect.bisect_right(self._keys, key)
+            if index >= self.capacity:
+                if removed:
+                    self.version += 1
+                return removed
+            self._keys.insert(index, key)
+            self._docs.insert(index, doc)
+            del self._keys[self.capacity:], self._docs[self.capacity:]
+            self.version += 1
+        return True
+
+    def delete(self, doc_id):
+        """_id 의 문서를 뺍니다. 목록에 있었으면 True 를 반환합니다."""
+        with self._lock:
+            removed = self._remove(doc_id)
+            if removed:
+                self.version += 1
+        return removed
+
+    def _remove(self, doc_id):
+        for i, doc in enumerate(self._docs):
+            if doc["_id"] == doc_id:
+                del self._docs[i], self._keys[i]
+                return True
+        return False
+
+    def items(self, limit=None):
+        """앞에서부터 limit 개 문서 목록과 그 시점의 version 을 반환합니다. 문서는 수정하지 않아야 합니다."""
+        with self._lock:
+            return self._docs[:limit], self.version
+
+    def __len__(self):
+        return len(self._docs)
+
+
+class CollectionWatcher:
+    """컬렉션의 최신 N건을 LatestView 로 유지하는 백그라운드 스레드입니다.
+
+    처음에 한 번 조회해 목록을 채운 뒤 변경 스트림으로 추가/수정/삭제만 반영하므로, 세션 수나 새로고침 주기와
+    관계없이 DB 조회는 프로세스당 한 번입니다. 연결이 끊기면 resume token 으로 이어 받고, 이어 받을 수 없으면
+    목록을 다시 조회합니다. 변경 스트림을 지원하지 않는 서버에서는 poll_interval 마다 다시 조회하며,
+    조회가 실패하면 지수 백오프로 간격을 늘립니다.
+
+    query 는 최상위 필드 비교만 쓸 수 있고, stream_stages 가 fullDocument 에서 query 의 필드를 빼면 안 됩니다.
+    """
+
+    def __init__(self, collection, capacity=100, query=None, projection=None, sort=None, stream_stages=None,
+                 name=None, poll_interval=5.0, base_backoff=1.0, max_backoff=60.0, await_ms=1000):
+        self.collection = collection
+        self.name = name or collection.name
+        self.query = query or {}
+        _check_query(self.query)
+        self.projection = projection
+        self.sort = sort or [("timestamp", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+        self.stream_stages = stream_stages or []
+        self.poll_interval = poll_interval
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.await_ms = await_ms
+        self.view = LatestView(self.sort, capacity)
+        self.mode = "starting"
+        self._resume_token = None
+        self._failures = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._stats = {"changes": 0, "reloads": 0, "errors": 0, "last_error": None, "last_change": None}
+
+    # ----------------------------------
+    # 조회
+    # ----------------------------------
+    def _reload(self):
+        cursor = self.collection.find(self.query, self.projection).sort(self.sort).limit(self.view.capacity)
+        changed = self.view.reset(cursor)
+        self._stats["reloads"] += 1
+        return changed
+
+    def _stream_pipeline(self):
+        # 추가 이벤트만 서버에서 조건으로 거릅니다. 수정/교체로 조건을 벗어난 문서도 목록에서 빼야 하므로
+        # 수정/교체/삭제 이벤트는 모두 받아 _apply 에서 확인합니다. 삭제 이벤트에는 문서가 없습니다.
+        match = {"operationType": {"$in": ["insert", "replace", "update", "delete"]}}
+        if self.query:
+            match = {"$or": [
+                {"operationType": {"$in": ["replace", "update", "delete"]}},
+                {"operationType": "insert", **{f"fullDocument.{field}": cond for field, cond in self.query.items()}},
+            ]}
+        return [{"$match": match}, *self.stream_stages]
+
+    def _apply(self, change):
+        operation = change["operationType"]
+        doc_id = change["documentKey"]["_id"]
+        if operation == "delete":
+            # 목록에서 한 건이 빠지면 그 자리를 채울 문서는 DB 에만 있으므로 다시 조회합니다.
+            if self.view.delete(doc_id) and len(self.view) < self.view.capacity:
+                self._reload()
+            return
+        doc = change.get("fullDocument")
+        if not doc or "_id" not in doc:
+            # 수정 직후 삭제되어 문서를 찾지 못한 경우
+            self.view.delete(doc_id)
+            return
+        if self.query and not matches_query(doc, self.query):
+            # 수정으로 조건을 벗어난 문서는 목록에서 빼고, 빈 자리는 DB 에서 다시 채웁니다.
+            if self.view.delete(doc_id) and len(self.view) < self.view.capacity:
+                self._reload()
+            return
+        self.view.upsert(doc)
+
+    # ----------------------------------
+    # 생명주기
+    # ----------------------------------
+    def start(self):
+        """감시 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"watch-{self.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=5.0):
+        """감시 스레드를 종료합니다."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _backoff(self):
+        delay = min(self.max_backoff, self.base_backoff * 2 ** max(self._failures - 1, 0))
+        return delay * random.uniform(0.5, 1.5)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                if self.mode == "polling":
+                    self._reload()
+                    self._failures = 0
+                    self._stop_event.wait(self.poll_interval)
+                    continue
+                self._watch()
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                    self._fall_back_to_polling(e)
+                    continue
+                if e.code in CHANGE_STREAM_HISTORY_LOST_CODES:
+                    logging.warning(f"[{self.name}] resume token 으로 이어 받을 수 없어 목록을 다시 불러옵니다: {e}")
+                    self._resume_token = None
+                    continue
+                self._on_error(e)
+            except PyMongoError as e:
+                self._on_error(e)
+            except Exception as e:
+                # 드라이버가 변경 스트림을 지원하지 않는 등 재시도로 풀리지 않는 오류는 주기 조회로 계속합니다.
+                logging.error(f"[{self.name}] 감시 중 예기치 못한 오류: {e}", exc_info=True)
+                if self.mode == "polling":
+                    self._on_error(e)
+                else:
+                    self._fall_back_to_polling(e)
+
+    def _fall_back_to_polling(self, error):
+        logging.warning(f"[{self.name}] 변경 스트림을 쓸 수 없어 {self.poll_interval}초 주기 조회로 바꿉니다: {error}")
+        self.mode = "polling"
+
+    def _on_error(self, error):
+        self._failures += 1
+        self._stats["errors"] += 1
+        self._stats["last_error"] = str(error)
+        delay = self._backoff()
+        logging.error(f"[{self.name}] 감시 실패 ({self._failures}회), {delay:.1f}초 후 재시도: {error}")
+        self._stop_event.wait(delay)
+
+    def _watch(self):
+        with self.collection.watch(self._stream_pipeline(), full_document="updateLookup",
+                                   resume_after=self._resume_token, max_await_time_ms=self.await_ms) as stream:
+            if self._resume_token is None:
+                # 스트림을 연 뒤에 목록을 불러와야 그 사이에 들어온 변경을 놓치지 않습니다.
+                self._reload()
+            if self.mode != "stream":
+                logging.info(f"[{self.name}] 변경 스트림 감시 시작")
+            self.mode = "stream"
+            self._failures = 0
+            while not self._stop_event.is_set() and stream.alive:
+                change = stream.try_next()
+                # 변경이 없어도 서버가 주는 최신 resume token 을 저장해 두면 재연결 시 다시 읽는 구간이 짧아집니다.
+                self._resume_token = stream.resume_token
+                if change is None:
+                    continue
+                self._apply(change)
+                self._stats["changes"] += 1
+                self._stats["last_change"] = time.time()
+
+    def get_status(self):
+        """동작 방식(stream/polling/starting), 목록 크기와 처리 통계를 반환합니다."""
+        return {"mode": self.mode, "size": len(self.view), "version": self.view.version,
+                "failures": self._failures, **self._stats}
@@ -0,0 +1,124 @@
+"""대시보드가 읽는 네 컬렉션(경보, 센서, 균열, 안전조끼)의 필수 인덱스와 주요 조회의 실행 계획 점검입니다.
+
+모든 목록/초기 로드 조회가 timestamp 로 정렬하므로, 인덱스가 없으면 새로고침마다 컬렉션 전체를 읽고
+메모리에서 정렬합니다. 시작할 때 ensure_indexes() 로 인덱스를 만들고(이미 있으면 아무 일도 하지 않음),
+check_query_plans() 로 주요 조회가 인덱스를 타는지 explain() 으로 확인해 아니면 경고를 남깁니다.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pymongo
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+
+from detection_feed import FEED_SORT
+
+ASC, DESC = pymongo.ASCENDING, pymongo.DESCENDING
+
+# 컬렉션 키 -> 필수 인덱스 키 목록. 인덱스 이름은 MongoDB 기본 이름을 써서 기존 인덱스와 충돌하지 않게 합니다.
+INDEX_SPECS = {
+    "alerts": [
+        [("timestamp", DESC)],
+        [("type", ASC), ("timestamp", DESC)],
+        [("source_device", ASC), ("timestamp", DESC)],
+    ],
+    "sensors": [
+        [("timestamp", DESC)],
+        [("source_device", ASC), ("timestamp", DESC)],
+    ],
+    "crack": [
+        [("timestamp", DESC), ("_id", DESC)],
+        [("source_device", ASC), ("timestamp", DESC)],
+    ],
+    "hivis": [
+        [("timestamp", DESC), ("_id", DESC)],
+        [("source_device", ASC), ("timestamp", DESC)],
+    ],
+}
+
+# 실행 계획에 이 단계가 있으면 인덱스를 타는 것으로 봅니다.
+INDEX_STAGES = {"IXSCAN", "EXPRESS_IXSCAN", "DISTINCT_SCAN", "IDHACK", "COUNT_SCAN"}
+
+
+def hot_queries(now=None):
+    """대시보드의 주요 조회를 (이름, 컬렉션 키, filter, sort, limit) 목록으로 반환합니다. 값은 대표값입니다."""
+    now = now or datetime.now(timezone.utc)
+    return [
+        ("경보 초기 로드", "alerts", {"type": {"$ne": "normal"}}, [("timestamp", DESC)], 5),
+        ("센서 초기 로드", "sensors", {"source_device": "multiSensor"}, [("timestamp", DESC)], 1000),
+        ("센서 추세(원본)", "sensors", {"timestamp": {"$gte": now - timedelta(minutes=10), "$lt": now}},
+         [("timestamp", ASC)], 0),
+        ("균열 목록", "crack", {}, FEED_SORT, 11),
+        ("균열 목록 다음 페이지", "crack", {"$or": [{"timestamp": {"$lt": now}}, {"timestamp": now, "_id": {"$lt": ObjectId.from_datetime(now)}}]},
+         FEED_SORT, 11),
+        ("안전조끼 목록", "hivis", {}, FEED_SORT, 11),
+    ]
+
+
+def ensure_indexes(collections, specs=INDEX_SPECS):
+    """필수 인덱스를 만듭니다. 이미 있는 인덱스는 건너뛰며, 만든 인덱스 이름 목록을 반환합니다."""
+    created = []
+    for key, indexes in specs.items():
+        collection = collections.get(key)
+        if collection is None:
+            continue
+        for keys in indexes:
+            try:
+                created.append(f"{collection.name}.{collection.create_index(keys)}")
+            except OperationFailure as e:
+                # 같은 키에 다른 옵션의 인덱스가 이미 있는 경우 등. 기존 인덱스를 그대로 씁니다.
+                logging.warning(f"[{collection.name}] 인덱스 {keys} 생성 건너뜀: {e}")
+            except PyMongoError as e:
+                logging.error(f"[{collection.name}] 인덱스 {keys} 생성 실패: {e}")
+    return created
+
+
+def plan_stages(explain):
+    """explain() 결과의 채택된 실행 계획(winningPlan)에 포함된 단계 이름 목록을 반환합니다."""
+    stages = []
+
+    def walk(node, in_plan):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "winningPlan":
+                    walk(value, True)
+                elif key in ("rejectedPlans", "executionStats", "allPlansExecution"):
+                    continue
+                else:
+                    if in_plan and key == "stage":
+                        stages.append(value)
+                    walk(value, in_plan)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item, in_plan)
+
+    walk(explain, False)
+    return stages
+
+
+def check_query_plans(collections, queries=None):
+    """주요 조회의 실행 계획을 확인하고 [{name, collection, stages, indexed, in_memory_sort}] 를 반환합니다.
+
+    인덱스 없이 컬렉션을 읽거나(COLLSCAN) 메모리에서 정렬(SORT)하는 조회는 경고로 남깁니다.
+    """
+    report = []
+    for name, key, query, sort, limit in queries or hot_queries():
+        collection = collections.get(key)
+        if collection is None:
+            continue
+        try:
+            explain = collection.find(query).sort(sort).limit(limit).explain()
+        except Exception as e:
+            # 점검은 참고용이라 explain 을 지원하지 않는 서버/권한이어도 시작을 막지 않습니다.
+            logging.warning(f"[{collection.name}] '{name}' 실행 계획을 확인할 수 없습니다: {e}")
+            continue
+        stages = plan_stages(explain)
+        indexed = bool(INDEX_STAGES.intersection(stages)) and "COLLSCAN" not in stages
+        in_memory_sort = "SORT" in stages
+        report.append({"name": name, "collection": collection.name, "stages": stages,
+                       "indexed": indexed, "in_memory_sort": in_memory_sort})
+        if not indexed or in_memory_sort:
+            logging.warning(f"[{collection.name}] '{name}' 조회가 인덱스를 충분히 쓰지 않습니다: {' > '.join(stages) or '알 수 없음'}")
+        else:
+            logging.info(f"[{collection.name}] '{name}' 실행 계획 확인: {' > '.join(stages)}")
+    return report
@@ -0,0 +1,245 @@
+import threading
+import time
+import logging
+import atexit
+from collections import deque
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from metrics import REGISTRY
+
+INSERT_SECONDS = REGISTRY.histogram("mongo_insert_seconds", "MongoDB 배치 insert_many 소요 시간(초)", ["writer"])
+
+# 버퍼가 가득 찼을 때의 처리 방식
+#   drop_oldest : 가장 오래된 문서를 버리고 새 문서를 넣습니다.
+#   drop_newest : 새로 들어온 문서를 버립니다.
+#   block       : 공간이 생길 때까지 (block_timeout 초까지) 기다린 뒤, 그래도 가득 차 있으면 새 문서를 버립니다.
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class BatchedMongoWriter:
+    """문서를 버퍼에 모아 백그라운드 스레드에서 insert_many 로 일괄 기록합니다."""
+
+    def __init__(self, collection, name, batch_size=500, max_latency=1.0,
+                 max_buffer=10000, overflow_policy="drop_oldest", block_timeout=0.5,
+                 retry_backoff=1.0, max_retry_backoff=30.0):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"지원하지 않는 overflow_policy 입니다: {overflow_policy}")
+        if batch_size < 1 or max_buffer < batch_size:
+            raise ValueError("batch_size 는 1 이상이고 max_buffer 보다 클 수 없습니다.")
+
+        self.collection = collection
+        self.name = name
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_buffer = max_buffer
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+
+        self._insert_seconds = INSERT_SECONDS.labels(name)
+        self._buffer = deque()
+        self._oldest_time = None
+        self._cond = threading.Condition()
+        self._flush_requested = False
+        self._stopping = False
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        self._stats = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0,
+            "retries": 0,
+            "last_batch_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    # ----------------------------------
+    # 생명주기
+    # ----------------------------------
+    def start(self):
+        """백그라운드 기록 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stopping = False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"mongo-writer-{self.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logging.info(f"[{self.name}] MongoDB 배치 writer 시작 (batch={self.batch_size}, "
+                     f"latency={self.max_latency}s, buffer={self.max_buffer}, policy={self.overflow_policy})")
+        return self
+
+    def stop(self, timeout=5.0):
+        """남은 문서를 모두 기록한 뒤 스레드를 종료합니다."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # ----------------------------------
+    # 생산자 API (렌더/MQTT 스레드에서 호출)
+    # ----------------------------------
+    def submit(self, doc):
+        """문서 한 건을 버퍼에 추가합니다. 버려진 경우 False 를 반환합니다."""
+        # insert_many 가 _id 를 추가하므로 호출자의 dict 는 건드리지 않도록 얕은 복사합니다.
+        doc = dict(doc)
+        with self._cond:
+            self._stats["submitted"] += 1
+            if len(self._buffer) >= self.max_buffer:
+                if not self._make_room():
+                    self._stats["dropped"] += 1
+                    return False
+            if not self._buffer:
+                self._oldest_time = time.monotonic()
+            self._buffer.append(doc)
+            # 첫 문서는 경과시간 타이머를 시작시키고, batch_size 에 도달하면 즉시 기록하도록 깨웁니다.
+            if len(self._buffer) == 1 or len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def submit_many(self, docs):
+        """여러 문서를 버퍼에 추가하고, 실제로 추가된 개수를 반환합니다."""
+        return sum(1 for doc in docs if self.submit(doc))
+
+    def flush(self, timeout=None):
+        """버퍼에 쌓인 문서를 즉시 기록하도록 요청하고, 비워질 때까지 기다립니다."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._buffer and self._thread is not None and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def _make_room(self):
+        """overflow_policy 에 따라 버퍼 공간을 확보합니다. (self._cond 를 잡은 상태에서 호출)"""
+        if self.overflow_policy == "drop_oldest":
+            self._buffer.popleft()
+            self._stats["dropped"] += 1
+            return True
+        if self.overflow_policy == "block":
+            deadline = time.monotonic() + self.block_timeout
+            while len(self._buffer) >= self.max_buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.notify_all()
+                self._cond.wait(remaining)
+            return True
+        return False
+
+    # ----------------------------------
+    # 통계
+    # ----------------------------------
+    def get_stats(self):
+        """기록 처리량, 배치 크기, flush 지연시간 통계를 반환합니다."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["buffered"] = len(self._buffer)
+        batches = stats["batches"]
+        stats["avg_batch_size"] = stats["written"] / batches if batches else 0.0
+        stats["avg_flush_ms"] = stats["total_flush_ms"] / batches if batches else 0.0
+        return stats
+
+    # ----------------------------------
+    # 백그라운드 스레드
+    # ----------------------------------
+    def _take_batch(self):
+        """flush 조건(크기/경과시간/요청/종료)이 될 때까지 기다렸다가 배치를 꺼냅니다."""
+        with self._cond:
+            while True:
+                if self._buffer:
+                    age = time.monotonic() - self._oldest_time
+                    if (len(self._buffer) >= self.batch_size or age >= self.max_latency
+                            or self._flush_requested or self._stopping):
+                        break
+                    self._cond.wait(self.max_latency - age)
+                else:
+                    self._flush_requested = False
+                    self._cond.notify_all()
+                    if self._stopping:
+                        return None
+                    self._cond.wait()
+
+            count = min(self.batch_size, len(self._buffer))
+            batch = [self._buffer.popleft() for _ in range(count)]
+            self._oldest_time = time.monotonic() if self._buffer else None
+            # block 정책으로 기다리는 생산자를 깨웁니다.
+            self._cond.notify_all()
+            return batch
+
+    def _requeue(self, batch):
+        """기록에 실패한 배치를 버퍼 앞쪽으로 되돌립니다. 공간이 없으면 오래된 것부터 버립니다."""
+        with self._cond:
+            room = self.max_buffer - len(self._buffer)
+            if room < len(batch):
+                self._stats["dropped"] += len(batch) - max(room, 0)
+                batch = batch[len(batch) - max(room, 0):]
+            self._buffer.extendleft(reversed(batch))
+            if self._buffer:
+                self._oldest_time = time.monotonic()
+
+    def _write(self, batch):
+        """배치 하나를 insert_many(ordered=False) 로 기록합니다. 재시도가 필요하면 False 를 반환합니다."""
+        started = time.perf_counter()
+        written, failed = len(batch), 0
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # 순서 없는 삽입이므로 실패한 문서(중복 키 등)만 빠지고 나머지는 기록됩니다.
+            failed = len(e.details.get("writeErrors", []))
+            written = e.details.get("nInserted", len(batch) - failed)
+            logging.warning(f"[{self.name}] 일부 문서 기록 실패: {failed}건")
+        except PyMongoError as e:
+            logging.error(f"[{self.name}] MongoDB 배치 기록 실패 ({len(batch)}건), 재시도 예정: {e}")
+            return False
+
+        elapsed = time.perf_counter() - started
+        self._insert_seconds.observe(elapsed)
+        elapsed_ms = elapsed * 1000
+        with self._cond:
+            s = self._stats
+            s["written"] += written
+            s["failed"] += failed
+            s["batches"] += 1
+            s["last_batch_size"] = len(batch)
+            s["last_flush_ms"] = elapsed_ms
+            s["max_flush_ms"] = max(s["max_flush_ms"], elapsed_ms)
+            s["total_flush_ms"] += elapsed_ms
+        return True
+
+    def _run(self):
+        backoff = self.retry_backoff
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                break
+            if self._write(batch):
+                backoff = self.retry_backoff
+                continue
+
+            self._requeue(batch)
+            with self._cond:
+                self._stats["retries"] += 1
+                if self._stopping:
+                    # 종료 중에는 무한히 재시도하지 않습니다.
+                    self._stats["dropped"] += len(self._buffer)
+                    self._buffer.clear()
+                    self._cond.notify_all()
+                    break
+            # 새 문서가 들어와도 깨지 않도록 조건변수 대신 종료 이벤트로 대기합니다.
+            self._stop_event.wait(backoff)
+            backoff = min(backoff * 2, self.max_retry_backoff)
+        logging.info(f"[{self.name}] MongoDB 배치 writer 종료")
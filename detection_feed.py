@@ -0,0 +1,82 @@
+import pymongo
+
+from image_store import LEGACY_IMAGE_FIELD, IMAGE_REF_FIELD, THUMBNAIL_REF_FIELD
+
+# 목록에는 이미지와 감지 상세 없이 표시에 필요한 필드만 가져옵니다.
+LIST_PROJECTION = {
+    "timestamp": 1,
+    "source_device": 1,
+    "detection_count": {"$size": {"$ifNull": ["$detections", []]}},
+}
+
+# 항목을 펼쳤을 때만 가져오는 필드
+DETAIL_PROJECTION = {
+    "detections": 1,
+    LEGACY_IMAGE_FIELD: 1,
+    IMAGE_REF_FIELD: 1,
+    THUMBNAIL_REF_FIELD: 1,
+}
+
+FEED_SORT = [("timestamp", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)]
+
+# 변경 스트림 이벤트에서도 목록 필드만 받도록 fullDocument 를 LIST_PROJECTION 과 같은 모양으로 줄입니다.
+STREAM_LIST_STAGES = [{"$project": {
+    "operationType": 1,
+    "documentKey": 1,
+    "fullDocument._id": 1,
+    "fullDocument.timestamp": 1,
+    "fullDocument.source_device": 1,
+    "fullDocument.detection_count": {"$size": {"$ifNull": ["$fullDocument.detections", []]}},
+}}]
+
+
+def _before(cursor):
+    """(timestamp, _id) 키셋 커서보다 오래된 문서를 찾는 조건을 만듭니다."""
+    timestamp, doc_id = cursor
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": doc_id}},
+    ]}
+
+
+def fetch_page(collection, page_size, cursor=None):
+    """최신순 감지 목록 한 페이지와 다음 페이지 커서를 반환합니다.
+
+    (timestamp, _id) 키셋 페이지네이션을 사용하므로 skip 없이 인덱스 구간만 읽어,
+    몇 주 전 페이지도 최신 페이지와 같은 비용으로 조회합니다. 마지막 페이지면 다음 커서는 None 입니다.
+    """
+    query = _before(cursor) if cursor else {}
+    # 다음 페이지가 있는지 알기 위해 한 건 더 읽습니다.
+    items = list(collection.find(query, LIST_PROJECTION).sort(FEED_SORT).limit(page_size + 1))
+    if len(items) <= page_size:
+        return items, None
+    items = items[:page_size]
+    last = items[-1]
+    return items, (last["timestamp"], last["_id"])
+
+
+def view_page(view, page_size):
+    """감시 스레드가 유지하는 최신 목록(LatestView)에서 첫 페이지를 (항목, 다음 커서, version) 으로 반환합니다.
+
+    목록이 아직 채워지지 않았거나 페이지가 목록보다 커서 다음 페이지 여부를 알 수 없으면 None 입니다.
+    """
+    if not view.ready or page_size >= view.capacity:
+        return None
+    items, version = view.items(page_size + 1)
+    if len(items) <= page_size:
+        return items, None, version
+    items = items[:page_size]
+    last = items[-1]
+    return items, (last["timestamp"], last["_id"]), version
+
+
+def fetch_head(collection):
+    """가장 최신 문서의 (timestamp, _id) 키를 반환합니다. 새 감지가 있는지 확인하는 용도이며 문서가 없으면 None 입니다."""
+    doc = collection.find_one({}, {"timestamp": 1}, sort=FEED_SORT)
+    return (doc["timestamp"], doc["_id"]) if doc else None
+
+
+def fetch_detail(collection, doc_id, include_image=True):
+    """펼친 항목의 감지 상세를 가져옵니다. 이미지가 이미 캐시에 있으면 include_image=False 로 이미지 필드를 뺍니다."""
+    projection = DETAIL_PROJECTION if include_image else {"detections": 1}
+    return collection.find_one({"_id": doc_id}, projection) or {}
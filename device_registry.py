@@ -0,0 +1,42 @@
+import threading
+from datetime import datetime, timezone
+
+
+def device_from_topic(topic, default):
+    """'<접두어>/<장치 ID>/<종류>' 토픽에서 장치 ID 를 꺼냅니다. 장치 ID 가 없는 이전 토픽이면 default 입니다."""
+    parts = topic.split("/")
+    return parts[1] if len(parts) == 3 and parts[1] else default
+
+
+class DeviceRegistry:
+    """수신 스레드가 장치별 마지막 수신 시각과 메시지 수를 기록하는 공용 목록입니다.
+
+    세션은 전체 스트림을 훑지 않고 이 목록만 보고 장치 선택지와 상태를 그립니다.
+    """
+
+    def __init__(self):
+        self._devices = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def touch(self, device, kind, count=1, now=None):
+        """장치의 kind(예: 'alerts', 'sensors') 메시지 수신을 기록합니다."""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            entry = self._devices.get(device)
+            if entry is None:
+                entry = self._devices[device] = {"device": device, "first_seen": now, "last_seen": now, "counts": {}}
+            entry["last_seen"] = now
+            entry["counts"][kind] = entry["counts"].get(kind, 0) + count
+            entry[f"{kind}_last_seen"] = now
+            self.version += 1
+
+    def devices(self, kind=None):
+        """장치 ID 목록을 이름순으로 반환합니다. kind 를 주면 해당 메시지를 받은 장치만 반환합니다."""
+        with self._lock:
+            return sorted(d for d, entry in self._devices.items() if kind is None or kind in entry["counts"])
+
+    def snapshot(self):
+        """장치별 상태 사본 목록을 반환합니다."""
+        with self._lock:
+            return [dict(entry, counts=dict(entry["counts"])) for _, entry in sorted(self._devices.items())]
@@ -0,0 +1,381 @@
+import os
+import io
+import csv
+import json
+import time
+import atexit
+import bisect
+import collections
+import logging
+import threading
+from datetime import datetime, timezone
+
+INDEX_FILE = "index.json"
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+def _to_epoch(ts):
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def _parse_line(line):
+    """JSON 한 줄을 이벤트 dict 로 바꿉니다. 쓰는 중이던 마지막 줄처럼 깨진 줄은 None 입니다."""
+    try:
+        entry = json.loads(line)
+        entry["ts"] = datetime.fromisoformat(entry["ts"])
+        return entry
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class EventLog:
+    """센서 이벤트를 JSON-lines 세그먼트 파일에 기록하는 로그입니다.
+
+    이벤트는 메모리에 모았다가 백그라운드 스레드가 한 번에 파일에 씁니다. 세그먼트는 크기나 사용 기간을
+    넘으면 새 파일로 바뀌고, 오래된 세그먼트는 max_segments 개를 넘으면 지웁니다.
+    index.json 에는 세그먼트별 시간 범위, 건수, index_every 건마다의 (시각, 바이트 오프셋) 표시가 있어
+    최근 N건은 파일 끝에서부터, 기간 조회는 해당 위치로 바로 이동해 필요한 줄만 읽습니다.
+    """
+
+    def __init__(self, directory, max_segment_bytes=4 * 1024 * 1024, max_segment_age=86400.0,
+                 max_segments=60, flush_interval=1.0, flush_batch=200, index_every=256):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.index_every = index_every
+
+        self._pending = []
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()   # 파일 쓰기/회전/삭제와 index 갱신을 직렬화
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._written = 0
+        self._rotations = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._segments = self._load_index()
+
+    # ----------------------------------
+    # 쓰기
+    # ----------------------------------
+    def write(self, message, ts=None, **fields):
+        """이벤트 한 건을 기록 대기열에 넣습니다. 실제 파일 기록은 백그라운드 스레드가 묶어서 합니다."""
+        entry = {"ts": ts or datetime.now(timezone.utc), "message": message, **fields}
+        with self._cond:
+            self._pending.append(entry)
+            if len(self._pending) == 1 or len(self._pending) >= self.flush_batch:
+                self._cond.notify()
+
+    def flush(self):
+        """대기 중인 이벤트를 즉시 파일에 기록합니다."""
+        with self._cond:
+            entries, self._pending = self._pending, []
+        if entries:
+            self._append(entries)
+
+    def start(self):
+        """백그라운드 기록 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=5.0):
+        """스레드를 멈추고 남은 이벤트를 기록합니다."""
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait(self.flush_interval)
+                # 첫 이벤트 후 flush_interval 동안 더 모읍니다. (배치가 차면 바로 기록)
+                deadline = time.monotonic() + self.flush_interval
+                while (len(self._pending) < self.flush_batch and not self._stop_event.is_set()
+                       and (remaining := deadline - time.monotonic()) > 0):
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except OSError as e:
+                logging.error(f"이벤트 로그 기록 실패: {e}")
+                self._stop_event.wait(self.flush_interval)
+
+    def _append(self, entries):
+        with self._io_lock:
+            segment, chunks = None, []
+            for entry in entries:
+                if segment is None or segment["size"] >= self.max_segment_bytes:
+                    if chunks:
+                        self._write_chunks(segment, chunks)
+                    segment, chunks = self._active_segment(entry["ts"]), []
+                data = (json.dumps({**entry, "ts": entry["ts"].isoformat()}, ensure_ascii=False) + "\n").encode("utf-8")
+                epoch = _to_epoch(entry["ts"])
+                if segment["count"] % self.index_every == 0:
+                    segment["marks"].append([epoch, segment["size"]])
+                if segment["first_ts"] is None:
+                    segment["first_ts"] = epoch
+                segment["last_ts"] = max(segment["last_ts"] or epoch, epoch)
+                segment["count"] += 1
+                segment["size"] += len(data)
+                chunks.append(data)
+            self._write_chunks(segment, chunks)
+            self._written += len(entries)
+            self._save_index()
+
+    def _write_chunks(self, segment, chunks):
+        with open(os.path.join(self.directory, segment["name"]), "ab") as f:
+            f.write(b"".join(chunks))
+
+    def _active_segment(self, ts):
+        """기록할 세그먼트를 반환합니다. 크기/기간을 넘었으면 새 세그먼트를 만들고 오래된 세그먼트를 지웁니다."""
+        current = self._segments[-1] if self._segments else None
+        if current is not None:
+            too_big = current["size"] >= self.max_segment_bytes
+            too_old = time.time() - current["created"] >= self.max_segment_age
+            if not (too_big or too_old):
+                return current
+            self._rotations += 1
+        # 이름 순서가 시간 순서가 되도록 시각(마이크로초까지)으로 이름을 짓습니다.
+        name = f"{SEGMENT_PREFIX}{ts.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}{SEGMENT_SUFFIX}"
+        if current is not None and name <= current["name"]:
+            name = current["name"].replace(SEGMENT_SUFFIX, f"-1{SEGMENT_SUFFIX}")
+        segment = {"name": name, "created": time.time(), "first_ts": None, "last_ts": None,
+                   "count": 0, "size": 0, "marks": []}
+        self._segments.append(segment)
+        while len(self._segments) > self.max_segments:
+            old = self._segments.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, old["name"]))
+            except FileNotFoundError:
+                pass
+        return segment
+
+    # ----------------------------------
+    # index
+    # ----------------------------------
+    def _save_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": self._segments}, f)
+        os.replace(tmp_path, path)
+
+    def _load_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            with open(path, encoding="utf-8") as f:
+                segments = json.load(f)["segments"]
+            # index 가 마지막 기록보다 뒤처졌으면(비정상 종료) 파일 크기와 맞지 않으므로 다시 만듭니다.
+            if all(os.path.exists(os.path.join(self.directory, s["name"])) and
+                   os.path.getsize(os.path.join(self.directory, s["name"])) == s["size"] for s in segments):
+                return segments
+        except (OSError, ValueError, KeyError):
+            pass
+        return self._rebuild_index()
+
+    def _rebuild_index(self):
+        """세그먼트 파일을 처음부터 읽어 index 를 다시 만듭니다."""
+        segments = []
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX))
+        for name in names:
+            path = os.path.join(self.directory, name)
+            segment = {"name": name, "created": os.path.getmtime(path), "first_ts": None, "last_ts": None,
+                       "count": 0, "size": 0, "marks": []}
+            with open(path, "rb") as f:
+                offset = 0
+                for line in f:
+                    entry = _parse_line(line)
+                    if entry is not None:
+                        epoch = _to_epoch(entry["ts"])
+                        if segment["count"] % self.index_every == 0:
+                            segment["marks"].append([epoch, offset])
+                        if segment["first_ts"] is None:
+                            segment["first_ts"] = epoch
+                        segment["last_ts"] = max(segment["last_ts"] or epoch, epoch)
+                        segment["count"] += 1
+                    offset += len(line)
+                segment["size"] = offset
+            segments.append(segment)
+        if segments:
+            logging.info(f"이벤트 로그 index 재생성: 세그먼트 {len(segments)}개")
+        return segments
+
+    def _snapshot(self):
+        with self._io_lock:
+            return [dict(s) for s in self._segments]
+
+    # ----------------------------------
+    # 읽기
+    # ----------------------------------
+    def tail(self, n):
+        """최신 이벤트 n 건을 최신순으로 반환합니다. 파일 끝에서부터 필요한 만큼만 읽습니다."""
+        with self._cond:
+            result = list(reversed(self._pending[-n:]))
+        for segment in reversed(self._snapshot()):
+            if len(result) >= n:
+                break
+            path = os.path.join(self.directory, segment["name"])
+            for line in self._read_reverse(path, segment["size"]):
+                entry = _parse_line(line)
+                if entry is not None:
+                    result.append(entry)
+                    if len(result) >= n:
+                        break
+        return result[:n]
+
+    def iter_range(self, start=None, end=None):
+        """[start, end] 구간의 이벤트를 오래된 순서로 하나씩 돌려줍니다. 세그먼트를 차례로 읽으며 메모리에 모으지 않습니다."""
+        start_epoch = _to_epoch(start) if start else None
+        end_epoch = _to_epoch(end) if end else None
+        for segment in self._snapshot():
+            if segment["count"] == 0:
+                continue
+            if start_epoch is not None and segment["last_ts"] < start_epoch:
+                continue
+            if end_epoch is not None and segment["first_ts"] > end_epoch:
+                break
+            offset = 0
+            if start_epoch is not None and segment["marks"]:
+                # start 이전의 가장 가까운 표시 위치로 이동합니다.
+                position = bisect.bisect_right([mark[0] for mark in segment["marks"]], start_epoch) - 1
+                offset = segment["marks"][max(position, 0)][1]
+            try:
+                f = open(os.path.join(self.directory, segment["name"]), "rb")
+            except FileNotFoundError:
+                # 읽는 사이에 보관 기간 정리로 지워진 세그먼트는 건너뜁니다.
+                continue
+            with f:
+                f.seek(offset)
+                remaining = segment["size"] - offset
+                for line in f:
+                    remaining -= len(line)
+                    if remaining < 0:
+                        break
+                    entry = _parse_line(line)
+                    if entry is None:
+                        continue
+                    epoch = _to_epoch(entry["ts"])
+                    if start_epoch is not None and epoch < start_epoch:
+                        continue
+                    if end_epoch is not None and epoch > end_epoch:
+                        break
+                    yield entry
+
+    def read_range(self, start=None, end=None, limit=None):
+        """[start, end] 구간의 이벤트를 최신순으로 최대 limit 건 반환합니다."""
+        if start is None and limit is not None:
+            return [e for e in self.tail(limit) if end is None or e["ts"] <= end]
+        # 구간이 길어도 마지막 limit 건만 남도록 길이 제한 deque 에 담습니다.
+        entries = collections.deque(self.iter_range(start, end), maxlen=limit)
+        entries.reverse()
+        return list(entries)
+
+    def iter_csv(self, start=None, end=None, fields=("ts", "message"), chunk_size=1000):
+        """구간의 이벤트를 CSV bytes 조각으로 돌려줍니다. (Excel 호환을 위해 UTF-8 BOM 포함)"""
+        buffer = io.StringIO()
+        buffer.write("\ufeff")
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        rows = 0
+        for entry in self.iter_range(start, end):
+            writer.writerow([entry["ts"].isoformat() if f == "ts" else entry.get(f, "") for f in fields])
+            rows += 1
+            if rows % chunk_size == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    def export_csv(self, fileobj, start=None, end=None, fields=("ts", "message")):
+        """구간의 이벤트를 바이너리 파일 객체에 CSV 로 이어 씁니다."""
+        for chunk in self.iter_csv(start, end, fields):
+            fileobj.write(chunk)
+
+    @staticmethod
+    def _read_reverse(path, size, block_size=64 * 1024):
+        """파일의 [0, size) 범위를 끝에서부터 줄 단위로 돌려줍니다."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            position, rest = size, b""
+            while position > 0:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                block = f.read(read_size) + rest
+                lines = block.split(b"\n")
+                rest = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line
+            if rest:
+                yield rest
+
+    # ----------------------------------
+    # 관리
+    # ----------------------------------
+    def import_legacy_text(self, path):
+        """이전 형식('<ISO 시각> - <메시지>' 텍스트) 로그를 가져오고 원본 이름에 .imported 를 붙입니다."""
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if " - " not in line:
+                    continue
+                ts_text, message = line.split(" - ", 1)
+                try:
+                    ts = datetime.fromisoformat(ts_text)
+                except ValueError:
+                    continue
+                entries.append({"ts": ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc), "message": message.strip()})
+        for i in range(0, len(entries), self.flush_batch):
+            self._append(entries[i:i + self.flush_batch])
+        os.replace(path, f"{path}.imported")
+        logging.info(f"이전 로그 파일 {len(entries)}건을 이벤트 로그로 가져왔습니다: {path}")
+        return len(entries)
+
+    def clear(self):
+        """모든 세그먼트와 대기 중인 이벤트를 지웁니다."""
+        with self._cond:
+            self._pending = []
+        with self._io_lock:
+            for segment in self._segments:
+                try:
+                    os.remove(os.path.join(self.directory, segment["name"]))
+                except FileNotFoundError:
+                    pass
+            self._segments = []
+            self._save_index()
+
+    def is_empty(self):
+        with self._cond:
+            if self._pending:
+                return False
+        with self._io_lock:
+            return not any(s["count"] for s in self._segments)
+
+    def get_stats(self):
+        """세그먼트 수, 전체 건수/크기, 기록 및 회전 횟수, 대기 건수를 반환합니다."""
+        with self._io_lock:
+            segments = len(self._segments)
+            entries = sum(s["count"] for s in self._segments)
+            size = sum(s["size"] for s in self._segments)
+        with self._cond:
+            pending = len(self._pending)
+        return {"segments": segments, "entries": entries, "bytes": size,
+                "written": self._written, "rotations": self._rotations, "pending": pending}
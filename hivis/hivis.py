@@ -1,8 +1,16 @@
+import os
+import sys
 import streamlit as st
 import pymongo
-import base64
 from datetime import datetime
 
+# 저장소 루트의 공용 모듈(image_store, image_cache, change_watcher)을 불러오기 위해 경로를 추가합니다.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from image_store import ImageStore, LEGACY_IMAGE_FIELD, has_image
+from image_cache import ImageCache
+from change_watcher import CollectionWatcher
+from detection_feed import fetch_detail
+
 # --- 페이지 기본 설정 ---
 st.set_page_config(layout="wide", page_title="안전 조끼 감지 대시보드")
 
@@ -24,6 +32,20 @@ def init_connection():
 
 client = init_connection()
 
+@st.cache_resource
+def get_image_cache():
+    # 문서는 기록 후 바뀌지 않으므로 디코딩한 이미지를 모든 세션이 공유합니다.
+    return ImageCache(max_bytes=128 * 1024 * 1024)
+
+@st.cache_resource
+def start_watcher(_collection):
+    # 최신 100건을 변경 스트림으로 유지해, 세션이 늘어나도 새로고침마다 DB 를 조회하지 않습니다.
+    # base64 이미지(이전 형식)는 목록에서 빼고, 이미지 캐시에 없을 때만 문서에서 다시 읽습니다.
+    return CollectionWatcher(
+        _collection, capacity=100, projection={LEGACY_IMAGE_FIELD: 0},
+        stream_stages=[{"$project": {f"fullDocument.{LEGACY_IMAGE_FIELD}": 0}}],
+    ).start()
+
 # --- 메인 대시보드 UI ---
 st.title("🦺 실시간 안전 조끼(Hivis) 감지 대시보드")
 
@@ -33,6 +55,8 @@ else:
     # ⭐️ DB 및 컬렉션 이름 변경
     db = client["HIvisDB"]
     collection = db["HivisData"]
+    # 이미지는 문서에 base64 로 들어 있거나(이전 형식) GridFS/로컬 저장소 참조로 들어 있습니다.
+    store = ImageStore(db, blob_dir=st.secrets.get("image_blob_dir"))
 
     st.sidebar.header("🔍 필터 옵션")
     limit = st.sidebar.slider("표시할 최근 항목 수", 1, 100, 10)
@@ -42,7 +66,13 @@ else:
 
     st.header(f"최근 감지된 안전 조끼 착용 현황 (상위 {limit}개)")
 
-    for doc in collection.find({}).sort("timestamp", -1).limit(limit):
+    # 감시 스레드가 유지하는 최신 목록을 읽고, 아직 채워지지 않았으면 DB에서 직접 조회
+    watcher = start_watcher(collection)
+    if watcher.view.ready:
+        docs = watcher.view.items(limit)[0]
+    else:
+        docs = collection.find({}, {LEGACY_IMAGE_FIELD: 0}).sort("timestamp", -1).limit(limit)
+    for doc in docs:
         
         timestamp_local = doc['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
         device_name = doc.get('source_device', 'N/A')
@@ -53,8 +83,14 @@ else:
             col1, col2 = st.columns([2, 1])
             
             with col1:
-                img_bytes = base64.b64decode(doc['annotated_image_base64'])
-                st.image(img_bytes, caption="감지 결과 이미지", use_container_width=True)
+                # 펼치지 않은 항목도 그려지므로 목록에는 썸네일을 쓰고, 원본은 요청할 때만 불러옵니다.
+                full = st.toggle("🔍 원본 이미지 보기", key=f"full_{doc['_id']}")
+                img_bytes = get_image_cache().get_or_load(
+                    (collection.full_name, doc['_id'], "full" if full else "thumb"),
+                    lambda: store.load_image(doc if has_image(doc) else fetch_detail(collection, doc['_id']),
+                                             thumbnail=not full)
+                )
+                st.image(img_bytes, caption="감지 결과 이미지" if full else "감지 결과 썸네일", use_container_width=True)
 
             with col2:
                 st.subheader("상세 감지 정보")
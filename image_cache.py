@@ -0,0 +1,78 @@
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    """디코딩된 이미지 bytes 를 메모리 예산(바이트) 안에서 LRU 로 보관하는 프로세스 공용 캐시입니다.
+
+    감지 문서는 기록된 뒤 바뀌지 않으므로 (컬렉션, _id, 종류) 를 키로 쓰면 무효화가 필요 없습니다.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        if max_bytes < 1:
+            raise ValueError("max_bytes 는 1 이상이어야 합니다.")
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._evicted_bytes = 0
+
+    def get(self, key):
+        """캐시된 값을 반환하고 최근 사용으로 표시합니다. 없으면 None 입니다."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """값을 저장하고, 예산을 넘으면 가장 오래 사용하지 않은 항목부터 내보냅니다."""
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old)
+            self._entries[key] = value
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self._evictions += 1
+                self._evicted_bytes += len(evicted)
+
+    def get_or_load(self, key, loader):
+        """캐시에 없으면 loader() 로 불러와 저장한 뒤 반환합니다. loader 가 None 을 반환하면 저장하지 않습니다."""
+        value = self.get(key)
+        if value is None:
+            # 로딩(DB/GridFS 조회, base64 디코딩) 중에는 잠금을 잡지 않습니다.
+            value = loader()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get_stats(self):
+        """적중/실패 횟수, 내보낸 항목과 바이트 수, 현재 사용량을 반환합니다."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "evicted_bytes": self._evicted_bytes,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
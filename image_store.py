@@ -0,0 +1,115 @@
+import os
+import io
+import base64
+import hashlib
+import logging
+
+import gridfs
+from PIL import Image
+
+# 감지 문서의 이미지 필드
+LEGACY_IMAGE_FIELD = "annotated_image_base64"   # 이전 형식: 문서에 JPEG 전체를 base64 로 포함
+IMAGE_REF_FIELD = "image"                       # 새 형식: 이미지 저장소 참조
+THUMBNAIL_REF_FIELD = "thumbnail"               # 새 형식: 썸네일 저장소 참조
+
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 70
+
+
+def make_thumbnail(image_bytes, size=THUMBNAIL_SIZE, quality=THUMBNAIL_QUALITY):
+    """이미지 bytes 로 비율을 유지한 JPEG 썸네일을 만듭니다."""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        img.thumbnail(size)
+        out = io.BytesIO()
+        img.save(out, format="JPEG", quality=quality, optimize=True)
+        return out.getvalue()
+
+
+class ImageStore:
+    """감지 이미지 원본과 썸네일을 GridFS 또는 로컬 디렉터리에 내용 주소(SHA-256)로 저장합니다.
+
+    문서에는 {"store", "sha256", "size", "content_type"} 형태의 참조만 남깁니다.
+    같은 이미지는 한 번만 저장되며, 읽기는 참조의 store 값에 따라 알맞은 저장소에서 합니다.
+    """
+
+    def __init__(self, db=None, backend="gridfs", bucket_name="detection_images", blob_dir=None):
+        if backend not in ("gridfs", "local"):
+            raise ValueError(f"지원하지 않는 이미지 저장소입니다: {backend}")
+        if backend == "gridfs" and db is None:
+            raise ValueError("GridFS 저장소에는 db 가 필요합니다.")
+        if backend == "local" and not blob_dir:
+            raise ValueError("로컬 저장소에는 blob_dir 이 필요합니다.")
+        self.backend = backend
+        self.bucket = gridfs.GridFSBucket(db, bucket_name=bucket_name) if db is not None else None
+        self.blob_dir = blob_dir
+
+    # ----------------------------------
+    # 쓰기
+    # ----------------------------------
+    def put(self, data, content_type="image/jpeg"):
+        """bytes 를 저장하고 참조 dict 를 반환합니다. 이미 있는 내용이면 다시 저장하지 않습니다."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.backend == "gridfs":
+            if not self._gridfs_exists(digest):
+                self.bucket.upload_from_stream_with_id(
+                    digest, digest, io.BytesIO(data), metadata={"content_type": content_type}
+                )
+        else:
+            path = self._blob_path(digest)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+        return {"store": self.backend, "sha256": digest, "size": len(data), "content_type": content_type}
+
+    def put_image(self, image_bytes):
+        """원본 이미지와 썸네일을 저장하고 문서에 넣을 참조 필드를 반환합니다."""
+        fields = {IMAGE_REF_FIELD: self.put(image_bytes)}
+        try:
+            fields[THUMBNAIL_REF_FIELD] = self.put(make_thumbnail(image_bytes))
+        except Exception as e:
+            logging.warning(f"썸네일 생성 실패, 원본만 저장합니다: {e}")
+        return fields
+
+    # ----------------------------------
+    # 읽기
+    # ----------------------------------
+    def get(self, ref):
+        """참조가 가리키는 bytes 를 읽습니다."""
+        if ref.get("store") == "local":
+            if not self.blob_dir:
+                raise ValueError("로컬 저장소 참조를 읽으려면 blob_dir 이 필요합니다.")
+            with open(self._blob_path(ref["sha256"]), "rb") as f:
+                return f.read()
+        if self.bucket is None:
+            raise ValueError("GridFS 참조를 읽으려면 db 가 필요합니다.")
+        return self.bucket.open_download_stream(ref["sha256"]).read()
+
+    def load_image(self, doc, thumbnail=False):
+        """감지 문서에서 이미지 bytes 를 꺼냅니다. 이전 base64 형식과 참조 형식을 모두 지원합니다.
+
+        thumbnail=True 이면 썸네일을 우선 사용하고, 없으면 원본을 반환합니다. 이미지가 없으면 None 입니다.
+        """
+        if LEGACY_IMAGE_FIELD in doc:
+            return base64.b64decode(doc[LEGACY_IMAGE_FIELD])
+        ref = doc.get(THUMBNAIL_REF_FIELD) if thumbnail else None
+        ref = ref or doc.get(IMAGE_REF_FIELD)
+        if not ref:
+            return None
+        return self.get(ref)
+
+    def _gridfs_exists(self, digest):
+        for _ in self.bucket.find({"_id": digest}).limit(1):
+            return True
+        return False
+
+    def _blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest[2:])
+
+
+def has_image(doc):
+    """문서에 이미지(이전 형식 또는 참조)가 있는지 확인합니다."""
+    return LEGACY_IMAGE_FIELD in doc or IMAGE_REF_FIELD in doc
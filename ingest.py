@@ -0,0 +1,159 @@
+import threading
+import logging
+from collections import deque
+
+# 채널 큐가 가득 찼을 때의 처리 방식
+#   drop_oldest : 가장 오래된 메시지를 버리고 새 메시지를 넣습니다.
+#   drop_newest : 새로 들어온 메시지를 버립니다.
+# 전체 대기 메시지 수(max_pending)를 넘으면 우선순위(priority)가 낮은 채널의 가장 오래된 메시지부터 버립니다.
+# 예를 들어 센서 채널을 경보 채널보다 낮은 우선순위로 두면 경보보다 센서 데이터가 먼저 버려집니다.
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+
+class IngestionWorker:
+    """MQTT 콜백이 넣은 원본 메시지를 세션과 무관하게 처리하는 백그라운드 스레드입니다.
+
+    채널마다 큐와 처리 함수를 등록하면, 쌓인 메시지를 한 번에 꺼내(drain)
+    처리 함수에 목록으로 넘깁니다. 파싱, DB 저장, 허브 발행은 모두 이 스레드에서
+    한 번씩만 수행되므로 열려 있는 대시보드 수와 관계가 없습니다.
+    큐는 채널별 maxsize 와 전체 max_pending 으로 제한되어, 처리가 밀려도 메모리가 무한히 늘지 않습니다.
+    """
+
+    def __init__(self, name="ingest", max_batch=1000, idle_timeout=1.0, max_pending=None):
+        self.name = name
+        self.max_batch = max_batch
+        self.idle_timeout = idle_timeout
+        self.max_pending = max_pending
+        self._channels = {}
+        self._tickers = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._drain_on_stop = False
+        self._thread = None
+
+    def add_channel(self, channel, handler, maxsize=None, overflow_policy="drop_oldest", priority=0):
+        """채널과 처리 함수(메시지 목록을 받는 함수)를 등록합니다.
+
+        maxsize 를 넘으면 overflow_policy 에 따라 버리고, 전체 max_pending 을 넘으면
+        priority 가 가장 낮은 채널부터 오래된 메시지를 버립니다.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"지원하지 않는 overflow_policy 입니다: {overflow_policy}")
+        self._channels[channel] = {
+            "queue": deque(), "handler": handler, "maxsize": maxsize,
+            "policy": overflow_policy, "priority": priority,
+            "stats": {"received": 0, "processed": 0, "dropped": 0, "high_water": 0},
+        }
+        return self
+
+    def add_ticker(self, handler):
+        """메시지 유무와 관계없이 매 처리 주기(최대 idle_timeout 간격)마다 호출할 함수를 등록합니다."""
+        self._tickers.append(handler)
+        return self
+
+    def put(self, channel, item):
+        """MQTT 콜백 스레드에서 원본 메시지를 채널 큐에 넣습니다. 버려진 경우 False 를 반환합니다."""
+        entry = self._channels[channel]
+        with self._lock:
+            entry["stats"]["received"] += 1
+            q = entry["queue"]
+            if entry["maxsize"] and len(q) >= entry["maxsize"]:
+                entry["stats"]["dropped"] += 1
+                if entry["policy"] == "drop_newest":
+                    return False
+                q.popleft()
+                self._pending -= 1
+            if self.max_pending and self._pending >= self.max_pending:
+                victim = self._pick_victim(entry["priority"])
+                if victim is None:
+                    entry["stats"]["dropped"] += 1
+                    return False
+                victim["queue"].popleft()
+                victim["stats"]["dropped"] += 1
+                self._pending -= 1
+            q.append(item)
+            self._pending += 1
+            if len(q) > entry["stats"]["high_water"]:
+                entry["stats"]["high_water"] = len(q)
+        self._wakeup.set()
+        return True
+
+    def _pick_victim(self, priority):
+        """메시지를 버릴 채널을 고릅니다. 우선순위가 같거나 낮은 채널 중 가장 낮은 채널입니다."""
+        candidates = [entry for entry in self._channels.values() if entry["queue"] and entry["priority"] <= priority]
+        return min(candidates, key=lambda entry: entry["priority"]) if candidates else None
+
+    def qsize(self, channel):
+        """채널 큐에 남아 있는 메시지 수를 반환합니다."""
+        return len(self._channels[channel]["queue"])
+
+    def get_stats(self):
+        """채널별 대기(depth), 최고 대기(high_water), 수신/처리/버림 건수를 반환합니다."""
+        with self._lock:
+            return {
+                channel: {**entry["stats"], "depth": len(entry["queue"]), "maxsize": entry["maxsize"]}
+                for channel, entry in self._channels.items()
+            }
+
+    def start(self):
+        """처리 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        limits = [entry["maxsize"] for entry in self._channels.values()]
+        if self.max_pending and all(limits) and self.max_pending >= sum(limits):
+            logging.warning(f"[{self.name}] max_pending({self.max_pending})이 채널 한도 합({sum(limits)}) 이상이라 "
+                            f"우선순위에 따른 버림이 동작하지 않습니다.")
+        self._stopping = False
+        self._drain_on_stop = False
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+        self._thread.start()
+        logging.info(f"[{self.name}] 수신 처리 스레드 시작 (채널: {', '.join(self._channels)})")
+        return self
+
+    def stop(self, timeout=5.0, drain=False):
+        """처리 스레드를 종료합니다. drain 이면 큐에 남은 메시지를 모두 처리한 뒤 종료합니다."""
+        self._drain_on_stop = drain
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _drain(self, entry):
+        batch = []
+        with self._lock:
+            q = entry["queue"]
+            while q and len(batch) < self.max_batch:
+                batch.append(q.popleft())
+            self._pending -= len(batch)
+            entry["stats"]["processed"] += len(batch)
+        return batch
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.idle_timeout)
+            self._wakeup.clear()
+            self._process()
+        if self._drain_on_stop:
+            self._process()
+
+    def _process(self):
+        # 한 채널이 max_batch 를 채웠다면 남은 메시지를 위해 바로 한 번 더 돕니다.
+        busy = True
+        while busy and (self._drain_on_stop or not self._stopping):
+            busy = False
+            for channel, entry in self._channels.items():
+                batch = self._drain(entry)
+                if not batch:
+                    continue
+                busy = busy or len(batch) == self.max_batch
+                try:
+                    entry["handler"](batch)
+                except Exception as e:
+                    logging.error(f"[{self.name}] '{channel}' 메시지 {len(batch)}건 처리 실패: {e}", exc_info=True)
+        for ticker in self._tickers:
+            try:
+                ticker()
+            except Exception as e:
+                logging.error(f"[{self.name}] 주기 작업 실패: {e}", exc_info=True)
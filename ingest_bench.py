@@ -0,0 +1,442 @@
+"""수신 → 저장 → 세션 반영 경로의 처리량과 지연 시간을 오프라인으로 측정하는 벤치마크 도구입니다.
+
+대시보드(monitoring.py)와 같은 수신 경로(ingest_pipeline 의 build_ingestion_worker/make_dispatcher 와 같은 설정의
+BatchedMongoWriter, MessageHub)를 조립하고, 설정한 초당 메시지 수로 `robot/alerts` JSON 과
+`multiSensor/numeric` CSV 를 발행합니다. 세션은 이벤트 fragment 주기마다 허브를 읽는 스레드로 흉내 냅니다.
+
+브로커와 DB 는 기본적으로 메모리 대역(콜백 직접 호출, 메모리 컬렉션)을 쓰며,
+--broker 로 로컬 MQTT 브로커(mosquitto 등), --mongo-uri 로 로컬 mongod 를 지정할 수 있습니다.
+결과는 실행 간 비교를 위해 JSON 으로 출력합니다.
+
+사용 예:
+    python ingest_bench.py --rates 10 100 1000 --duration 10 --output bench.json
+    python ingest_bench.py --broker 127.0.0.1:1883 --mongo-uri mongodb://127.0.0.1:27017 --rates 100
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from db_writer import BatchedMongoWriter
+from message_hub import MessageHub
+from alert_coalescer import AlertCoalescer
+from sensor_codec import SENSOR_KEYS
+from sensor_buffer import SensorRingBuffer
+from ingest_pipeline import (build_ingestion_worker, make_dispatcher, ALERTS_WRITER_CONFIG, SENSORS_WRITER_CONFIG,
+                             ALERT_COALESCE_WINDOW, ALERT_COALESCE_REFRESH, SENSORS_DEVICE_ID)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ALERT_TYPES = [("normal", 0.6, "정상 순찰 중"), ("safety", 0.3, "안전조끼 미착용 감지"), ("fire", 0.1, "화재 감지")]
+
+
+class MemoryCollection:
+    """insert_many/update_one 만 지원하는 메모리 컬렉션 대역입니다."""
+
+    def __init__(self):
+        self.docs = []
+        self._lock = threading.Lock()
+
+    def insert_many(self, docs, ordered=False):
+        with self._lock:
+            self.docs.extend(docs)
+
+    def update_one(self, *args, **kwargs):
+        pass
+
+
+class TimedCollection:
+    """insert_many 가 끝난 시각을 문서별로 기록해 발행→저장 지연을 계산하도록 감싼 컬렉션입니다."""
+
+    def __init__(self, inner, on_persist):
+        self.inner = inner
+        self.on_persist = on_persist
+
+    def insert_many(self, docs, ordered=False):
+        result = self.inner.insert_many(docs, ordered=ordered)
+        self.on_persist(docs, time.time_ns())
+        return result
+
+    def update_one(self, *args, **kwargs):
+        return self.inner.update_one(*args, **kwargs)
+
+
+class FakeMessage:
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+class LatencyRecorder:
+    """발행 시각과 저장/세션 반영 시각을 짝지어 지연 시간을 모읍니다.
+
+    경보는 JSON 의 bench_seq 필드로, 센서는 수신 콜백이 찍은 수신 시각(ns)으로 발행 시각을 찾습니다.
+    같은 토픽의 메시지는 브로커를 거쳐도 순서가 유지되므로 수신 콜백에서 토픽별 순번으로 발행 시각과 연결합니다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.published = {}          # topic -> [발행 ns]
+        self._received_index = {}    # topic -> 다음 수신 순번
+        self.sensor_publish = {}     # 수신 ns -> 발행 ns
+        self.sensor_publish_us = {}  # 수신 us -> 발행 ns (DB 타임스탬프는 마이크로초 정밀도)
+        self.alert_publish = {}      # bench_seq -> 발행 ns
+        self.latencies = {"persist": {"alerts": [], "sensors": []}, "session": {"alerts": [], "sensors": []}}
+
+    def on_publish(self, topic, publish_ns, seq=None):
+        with self._lock:
+            self.published.setdefault(topic, []).append(publish_ns)
+            if seq is not None:
+                self.alert_publish[seq] = publish_ns
+
+    def on_sensor_received(self, topic, received_ns):
+        with self._lock:
+            i = self._received_index.get(topic, 0)
+            self._received_index[topic] = i + 1
+            publish_ns = self.published[topic][i]
+            self.sensor_publish[received_ns] = publish_ns
+            self.sensor_publish_us[received_ns // 1000] = publish_ns
+
+    def on_persist(self, kind, docs, persisted_ns):
+        out = self.latencies["persist"][kind]
+        with self._lock:
+            for doc in docs:
+                if kind == "alerts":
+                    publish_ns = self.alert_publish.get(doc.get("bench_seq"))
+                else:
+                    received_us = (doc["timestamp"] - EPOCH) // timedelta(microseconds=1)
+                    publish_ns = self.sensor_publish_us.get(received_us)
+                if publish_ns is not None:
+                    out.append(persisted_ns - publish_ns)
+
+    def on_session_alerts(self, items, seen_ns):
+        out = self.latencies["session"]["alerts"]
+        with self._lock:
+            for item in items:
+                publish_ns = self.alert_publish.get(item.get("bench_seq"))
+                if publish_ns is not None:
+                    out.append(seen_ns - publish_ns)
+
+    def on_session_sensors(self, timestamps_ns, seen_ns):
+        out = self.latencies["session"]["sensors"]
+        with self._lock:
+            for received_ns in timestamps_ns.tolist():
+                publish_ns = self.sensor_publish.get(received_ns)
+                if publish_ns is not None:
+                    out.append(seen_ns - publish_ns)
+
+
+def summarize(samples_ns):
+    """지연 시간 목록(ns)을 ms 단위 요약으로 바꿉니다."""
+    if not samples_ns:
+        return {"count": 0}
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    return {
+        "count": int(len(ms)),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p90": round(float(np.percentile(ms, 90)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "max": round(float(ms.max()), 3),
+        "mean": round(float(ms.mean()), 3),
+    }
+
+
+def make_sensor_payload(rng, fault=False):
+    """multiSensor/numeric 형식의 CSV 페이로드를 만듭니다. (9채널, fault 이면 위험 범위 값)"""
+    gases = rng.uniform(0.0, 0.05, 5) if not fault else rng.uniform(0.5, 2.0, 5)
+    no2 = rng.uniform(0.0, 1.0) if not fault else rng.uniform(3.0, 6.0)
+    oxygen = rng.normal(20.9, 0.1) if not fault else rng.uniform(18.5, 19.5)
+    distance = rng.uniform(20.0, 300.0)
+    flame = 0 if fault and rng.random() < 0.5 else 1
+    return ",".join(f"{v:.3f}" for v in (*gases, no2, oxygen, distance)) + f",{flame}"
+
+
+def make_alert_payload(rng, seq, sources):
+    """robot/alerts 형식의 JSON 페이로드를 만듭니다. 유형과 발생원을 섞어 경보 묶기가 실제처럼 동작하게 합니다."""
+    kinds, weights, messages = zip(*ALERT_TYPES)
+    i = rng.choice(len(kinds), p=np.array(weights) / sum(weights))
+    return json.dumps({
+        "type": kinds[i],
+        "message": messages[i],
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "source_ip": f"10.0.0.{rng.integers(1, sources + 1)}",
+        "bench_seq": seq,
+    }).encode()
+
+
+class IngestPipeline:
+    """monitoring.start_ingestion_worker / get_message_dispatcher 와 같은 함수(ingest_pipeline)로 조립한 수신 경로입니다.
+
+    이벤트 로그는 쓰지 않고, 컬렉션만 저장 시각을 기록하는 대역으로 감쌉니다.
+    """
+
+    def __init__(self, recorder, alerts_collection, sensors_collection, default_device=SENSORS_DEVICE_ID):
+        self.recorder = recorder
+        self.default_device = default_device
+        self.hubs = {"alerts": MessageHub("alerts", capacity=1000), "sensors": MessageHub("sensors", capacity=2000)}
+        self.writers = {
+            "alerts": BatchedMongoWriter(
+                TimedCollection(alerts_collection, lambda docs, t: recorder.on_persist("alerts", docs, t)),
+                name="bench-alerts", **ALERTS_WRITER_CONFIG),
+            "sensors": BatchedMongoWriter(
+                TimedCollection(sensors_collection, lambda docs, t: recorder.on_persist("sensors", docs, t)),
+                name="bench-sensors", **SENSORS_WRITER_CONFIG),
+        }
+        self.coalescer = AlertCoalescer(window=ALERT_COALESCE_WINDOW, refresh_interval=ALERT_COALESCE_REFRESH)
+        self.worker = build_ingestion_worker(self.hubs, self.writers, coalescer=self.coalescer, name="bench-ingest")
+        self.dispatch = make_dispatcher(self.worker, sensors_device=default_device)
+
+    def start(self):
+        for writer in self.writers.values():
+            writer.start()
+        self.worker.start()
+        return self
+
+    def stop(self):
+        self.worker.stop()
+        for writer in self.writers.values():
+            writer.stop()
+
+    # --- MQTT 콜백 (monitoring.start_mqtt_clients 의 on_message 와 같이 dispatch 만 부름) ---
+    def on_message(self, client, userdata, msg):
+        received_ns = time.time_ns()
+        if not msg.topic.startswith("robot/"):
+            self.recorder.on_sensor_received(msg.topic, received_ns)
+        self.dispatch(msg.topic, msg.payload, received_ns)
+
+
+class SessionSimulator(threading.Thread):
+    """이벤트 fragment 주기마다 허브를 읽어 세션 상태에 반영하는 세션 흉내입니다."""
+
+    def __init__(self, pipeline, recorder, interval, device, record=True):
+        super().__init__(daemon=True)
+        self.pipeline = pipeline
+        self.recorder = recorder
+        self.interval = interval
+        self.device = device
+        self.record = record
+        self.cursors = {name: hub.cursor() for name, hub in pipeline.hubs.items()}
+        self.buffer = SensorRingBuffer(SENSOR_KEYS, capacity=1000)
+        self.latest_alerts = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        alerts, self.cursors["alerts"], _ = self.pipeline.hubs["alerts"].read(self.cursors["alerts"])
+        sensors, self.cursors["sensors"], _ = self.pipeline.hubs["sensors"].read(self.cursors["sensors"])
+        seen_ns = time.time_ns()
+        for msg in alerts:
+            if msg.get("type") != "normal" and "update_of" not in msg:
+                self.latest_alerts.insert(0, dict(msg))
+                del self.latest_alerts[100:]
+        for device, decoded in sensors:
+            if device == self.device:
+                self.buffer.extend(decoded.values, decoded.timestamps_ns)
+        if self.record:
+            self.recorder.on_session_alerts(alerts, seen_ns)
+            for device, decoded in sensors:
+                self.recorder.on_session_sensors(decoded.timestamps_ns, seen_ns)
+
+
+class LoopbackTransport:
+    """브로커 없이 발행 즉시 수신 콜백을 부르는 대역입니다."""
+
+    def __init__(self, pipeline):
+        self.on_message = pipeline.on_message
+
+    def publish(self, topic, payload):
+        self.on_message(None, None, FakeMessage(topic, payload))
+
+    def close(self):
+        pass
+
+
+class BrokerTransport:
+    """로컬 MQTT 브로커를 거쳐 발행/구독합니다. (TLS/인증 없음)"""
+
+    def __init__(self, pipeline, host, port, qos):
+        import paho.mqtt.client as mqtt
+        self.qos = qos
+        self.subscriber = mqtt.Client(client_id=f"bench-sub-{os.getpid()}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        self.subscriber.on_message = pipeline.on_message
+        ready = threading.Event()
+        self.subscriber.on_subscribe = lambda *args, **kwargs: ready.set()
+        self.subscriber.connect(host, port, 60)
+        self.subscriber.subscribe([("robot/alerts", qos), ("robot/+/alerts", qos),
+                                   ("multiSensor/numeric", qos), ("multiSensor/+/numeric", qos)])
+        self.subscriber.loop_start()
+        if not ready.wait(10):
+            raise RuntimeError("브로커 구독 확인 시간 초과")
+        self.publisher = mqtt.Client(client_id=f"bench-pub-{os.getpid()}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        self.publisher.max_queued_messages_set(0)
+        self.publisher.connect(host, port, 60)
+        self.publisher.loop_start()
+
+    def publish(self, topic, payload):
+        self.publisher.publish(topic, payload, qos=self.qos)
+
+    def close(self):
+        self.publisher.loop_stop()
+        self.publisher.disconnect()
+        self.subscriber.loop_stop()
+        self.subscriber.disconnect()
+
+
+def open_collections(mongo_uri):
+    """벤치마크용 (경보, 센서) 컬렉션을 엽니다. URI 가 없으면 메모리 대역입니다."""
+    if not mongo_uri:
+        return MemoryCollection(), MemoryCollection()
+    import pymongo
+    db = pymongo.MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)["IngestBench"]
+    db.drop_collection("alerts")
+    db.drop_collection("sensors")
+    return db["alerts"], db["sensors"]
+
+
+def run_scenario(rate, args):
+    """센서 초당 rate 건(장치 전체 합)과 그 alert_ratio 비율의 경보를 duration 초 동안 발행하고 결과를 반환합니다."""
+    rng = np.random.default_rng(args.seed)
+    recorder = LatencyRecorder()
+    alerts_collection, sensors_collection = open_collections(args.mongo_uri)
+    pipeline = IngestPipeline(recorder, alerts_collection, sensors_collection).start()
+    if args.broker:
+        host, _, port = args.broker.partition(":")
+        transport = BrokerTransport(pipeline, host, int(port or 1883), args.qos)
+    else:
+        transport = LoopbackTransport(pipeline)
+
+    devices = [f"r{i + 1}" for i in range(args.devices)] if args.devices > 1 else [None]
+    sensor_topics = [f"multiSensor/{d}/numeric" if d else "multiSensor/numeric" for d in devices]
+    sessions = [SessionSimulator(pipeline, recorder, args.session_interval,
+                                 devices[0] or pipeline.default_device, record=(i == 0))
+                for i in range(args.sessions)]
+    for session in sessions:
+        session.start()
+
+    alert_rate = rate * args.alert_ratio
+    events = []  # (상대 시각, 종류)
+    n_sensors = int(rate * args.duration)
+    n_alerts = int(alert_rate * args.duration)
+    events += [(i / rate, "sensor") for i in range(n_sensors)]
+    events += [(i / alert_rate, "alert") for i in range(n_alerts)] if alert_rate else []
+    events.sort()
+
+    started = time.perf_counter()
+    publish_cpu = time.process_time()
+    for seq, (offset, kind) in enumerate(events):
+        delay = started + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        if kind == "sensor":
+            topic = sensor_topics[seq % len(sensor_topics)]
+            payload = make_sensor_payload(rng, fault=rng.random() < args.fault_ratio).encode()
+            recorder.on_publish(topic, time.time_ns())
+        else:
+            topic = "robot/alerts"
+            payload = make_alert_payload(rng, seq, args.alert_sources)
+            recorder.on_publish(topic, time.time_ns(), seq=seq)
+        transport.publish(topic, payload)
+    publish_elapsed = time.perf_counter() - started
+
+    # 남은 메시지가 모두 저장/반영될 때까지 기다립니다.
+    deadline = time.perf_counter() + args.drain_timeout
+    while time.perf_counter() < deadline:
+        stats = pipeline.worker.get_stats()
+        if all(s["depth"] == 0 for s in stats.values()) and stats["sensors"]["processed"] + stats["sensors"]["dropped"] >= n_sensors:
+            break
+        time.sleep(0.05)
+    for writer in pipeline.writers.values():
+        writer.flush(timeout=args.drain_timeout)
+    time.sleep(args.session_interval * 1.5)
+    total_elapsed = time.perf_counter() - started
+    cpu_seconds = time.process_time() - publish_cpu
+
+    for session in sessions:
+        session.stop_event.set()
+    transport.close()
+    pipeline.stop()
+
+    writer_stats = {name: writer.get_stats() for name, writer in pipeline.writers.items()}
+    return {
+        "rate": rate,
+        "alert_rate": alert_rate,
+        "published": {"sensors": n_sensors, "alerts": n_alerts},
+        "persisted": {name: stats["written"] for name, stats in writer_stats.items()},
+        "publish_seconds": round(publish_elapsed, 3),
+        "total_seconds": round(total_elapsed, 3),
+        "achieved_publish_rate": round((n_sensors + n_alerts) / publish_elapsed, 1) if publish_elapsed else None,
+        "persist_throughput": round(sum(s["written"] for s in writer_stats.values()) / total_elapsed, 1),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "latency_ms": {
+            stage: {kind: summarize(samples) for kind, samples in kinds.items()}
+            for stage, kinds in recorder.latencies.items()
+        },
+        "ingest": pipeline.worker.get_stats(),
+        "writers": {name: {k: stats[k] for k in ("written", "dropped", "batches", "avg_batch_size", "avg_flush_ms", "max_flush_ms")}
+                    for name, stats in writer_stats.items()},
+        "coalescer": pipeline.coalescer.get_stats(),
+        "hubs": {name: hub.get_stats() for name, hub in pipeline.hubs.items()},
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="수신 → 저장 → 세션 반영 경로 벤치마크")
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 100, 1000], help="센서 초당 메시지 수 (장치 전체 합, 여러 개면 차례로 실행)")
+    parser.add_argument("--duration", type=float, default=10.0, help="시나리오별 발행 시간(초)")
+    parser.add_argument("--alert-ratio", type=float, default=0.1, help="센서 메시지 대비 경보 메시지 비율")
+    parser.add_argument("--alert-sources", type=int, default=20, help="경보 발생원(source_ip) 수")
+    parser.add_argument("--fault-ratio", type=float, default=0.01, help="이상값 센서 메시지 비율")
+    parser.add_argument("--devices", type=int, default=1, help="센서 장치 수 (2 이상이면 multiSensor/<장치>/numeric 토픽 사용)")
+    parser.add_argument("--sessions", type=int, default=1, help="흉내 낼 대시보드 세션 수")
+    parser.add_argument("--session-interval", type=float, default=1.0, help="세션이 허브를 읽는 주기(초)")
+    parser.add_argument("--broker", help="로컬 MQTT 브로커 host:port (기본값: 메모리 대역)")
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--mongo-uri", help="로컬 mongod URI, IngestBench DB 를 비우고 사용 (기본값: 메모리 대역)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="결과 JSON 파일 경로 (기본값: 표준 출력)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', stream=sys.stderr)
+
+    runs = []
+    for rate in args.rates:
+        print(f"▶ 센서 {rate:g}건/초, {args.duration:g}초 실행 중...", file=sys.stderr)
+        runs.append(run_scenario(rate, args))
+    result = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "runs": runs,
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
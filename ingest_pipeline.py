@@ -0,0 +1,260 @@
+"""MQTT 원본 메시지 → 수신 스레드 → 저장/발행 경로를 조립합니다.
+
+대시보드(monitoring.py)와 벤치마크(ingest_bench.py), 캡처 재생이 모두 이 모듈로 같은 처리 함수와 설정을 씁니다.
+secrets 가 필요 없는 수신 경로 설정(경보 규칙, 큐/writer 제한, 경보 묶기)도 여기에 둡니다.
+"""
+import json
+import time
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime
+
+import pymongo
+from bson import ObjectId
+
+from ingest import IngestionWorker
+from sensor_codec import SENSOR_KEYS, decode_batch, to_documents
+from sensor_rules import RuleEngine
+from alert_coalescer import AlertCoalescer
+from device_registry import DeviceRegistry, device_from_topic
+from metrics import REGISTRY
+
+# 장치 ID 가 들어간 토픽을 레이블로 쓰면 장치마다 시계열이 끝없이 늘어나므로 채널(alerts/sensors)로만 셉니다.
+# 장치별 수신 건수는 DeviceRegistry 가 따로 집계합니다.
+MQTT_RECEIVED = REGISTRY.counter("mqtt_messages_received_total", "채널별 수신 MQTT 메시지 수", ["channel"])
+PARSE_FAILURES = REGISTRY.counter("ingest_parse_failures_total", "채널별 파싱 실패 메시지 수", ["channel"])
+
+ALERTS_DEVICE_ID = "robot"  # 장치 ID 가 없는 이전 토픽의 경보에 기록할 장치 ID
+SENSORS_DEVICE_ID = "multiSensor"  # 장치 ID 가 없는 이전 토픽의 센서 데이터에 기록할 장치 ID (시계열 meta 필드)
+
+# 공통 센서 경고 기준 설정
+OXYGEN_SAFE_MIN = 19.5
+OXYGEN_SAFE_MAX = 23.5
+NO2_WARN_LIMIT = 3.0
+NO2_DANGER_LIMIT = 5.0
+GAS_SENSORS = ["CH4", "EtOH", "H2", "NH3", "CO"]
+
+# 센서 경보 규칙: 채널, 비교 연산, 단계별 기준값, 해제 여유폭(hysteresis), 최소 지속 시간(초)
+# 단계가 바뀔 때만 이벤트가 기록되며, icon 이 있는 규칙은 단계가 올라갈 때 화면 알림을 띄웁니다.
+SENSOR_RULES = [
+    {"name": "flame", "channel": "Flame", "op": "==", "levels": {"danger": 0},
+     "messages": {"danger": "🔥 긴급: 불꽃 감지됨! 즉시 확인이 필요합니다!", "normal": "✅ 불꽃 감지 해제"},
+     "icon": "🔥", "sound": "fire"},
+    {"name": "oxygen", "channel": "Oxygen", "op": "outside", "levels": {"warning": (OXYGEN_SAFE_MIN, OXYGEN_SAFE_MAX)},
+     "hysteresis": 0.2, "min_duration": 3.0,
+     "messages": {"warning": "🟠 산소 농도 경고! 현재 값: {value:.1f}%", "normal": "✅ 산소 농도 정상 복귀: {value:.1f}%"}},
+    {"name": "no2", "channel": "NO2", "op": ">=", "levels": {"warning": NO2_WARN_LIMIT, "danger": NO2_DANGER_LIMIT},
+     "hysteresis": 0.2, "min_duration": 2.0,
+     "messages": {"warning": "🟡 이산화질소(NO2) 주의! 현재 값: {value:.3f} ppm",
+                  "danger": "🔴 이산화질소(NO2) 위험! 현재 값: {value:.3f} ppm",
+                  "normal": "✅ 이산화질소(NO2) 정상 복귀: {value:.3f} ppm"}},
+    *[{"name": gas, "channel": gas, "op": ">", "levels": {"warning": 0.0},
+       "messages": {"warning": f"🟡 가스 감지됨! [{gas}: {{value:.3f}}]", "normal": f"✅ {gas} 가스 감지 해제"}}
+      for gas in GAS_SENSORS],
+]
+
+# MongoDB 배치 기록 설정 (버퍼 크기, 최대 지연, 버퍼 초과 시 정책)
+ALERTS_WRITER_CONFIG = {"batch_size": 50, "max_latency": 0.5, "max_buffer": 5000, "overflow_policy": "block"}
+SENSORS_WRITER_CONFIG = {"batch_size": 500, "max_latency": 1.0, "max_buffer": 50000, "overflow_policy": "drop_oldest"}
+
+# 같은 (유형, 발생원) 경보를 하나의 사건으로 묶는 시간(초)과 진행 중 사건의 DB 갱신 주기(초)
+ALERT_COALESCE_WINDOW = 10.0
+ALERT_COALESCE_REFRESH = 30.0
+
+# 수신 큐 제한 (채널별 최대 대기 수, 초과 시 정책, 우선순위). 전체 대기 수를 넘으면 센서를 경보보다 먼저 버립니다.
+# 전체 대기 수는 채널 한도의 합보다 작아야 합니다. 같거나 크면 채널 한도가 먼저 걸려 우선순위 버림이 동작하지 않습니다.
+INGEST_MAX_PENDING = 30000
+INGEST_CHANNEL_CONFIG = {
+    'alerts': {"maxsize": 10000, "overflow_policy": "drop_oldest", "priority": 1},
+    'sensors': {"maxsize": 50000, "overflow_policy": "drop_oldest", "priority": 0},
+}
+
+
+def build_ingestion_worker(hubs, writers, event_log=None, rule_engines=None, registry=None, coalescer=None,
+                           rules=SENSOR_RULES, name="ingest"):
+    """경보/센서 채널과 경보 사건 갱신 주기 작업을 등록한 IngestionWorker 를 만듭니다. (시작은 호출한 쪽에서)
+
+    hubs 는 'alerts', 'sensors' (선택: 'sensor_events') 허브, writers 는 'alerts', 'sensors' BatchedMongoWriter 입니다.
+    writers 에 없는 채널은 저장하지 않고 처리/발행만 하며, event_log 가 None 이면 센서 이벤트를 파일에 남기지 않습니다.
+    """
+    rule_engines = {} if rule_engines is None else rule_engines
+    registry = registry or DeviceRegistry()
+    coalescer = coalescer or AlertCoalescer(window=ALERT_COALESCE_WINDOW, refresh_interval=ALERT_COALESCE_REFRESH)
+
+    def handle_alerts(batch):
+        # 같은 사건의 반복 경보는 묶고, 새 사건과 상태(normal) 메시지만 저장/발행합니다.
+        messages = []
+        for msg in batch:
+            registry.touch(msg['source_device'], 'alerts')
+            if msg.get("type") == "normal":
+                messages.append(msg)
+                continue
+            try:
+                msg['timestamp'] = datetime.strptime(msg['timestamp'], "%Y-%m-%d %H:%M:%S")
+            except (ValueError, TypeError, KeyError):
+                msg['timestamp'] = datetime.now()
+            incident = coalescer.add(msg)
+            if incident is None:
+                continue
+            incident['_id'] = ObjectId()
+            if 'alerts' in writers:
+                writers['alerts'].submit(incident)
+            messages.append(incident)
+        if messages:
+            hubs['alerts'].publish_many(messages)
+
+    def flush_incidents():
+        updates = coalescer.collect()
+        if not updates:
+            return
+        collection = writers['alerts'].collection if 'alerts' in writers else None
+        for incident, closed in updates:
+            if collection is not None:
+                # 첫 경보 insert 가 아직 writer 버퍼에 있을 수 있으므로 upsert 로 순서와 무관하게 맞춥니다.
+                fields = {"count": incident["count"], "last_timestamp": incident["last_timestamp"]}
+                rest = {k: v for k, v in incident.items() if k not in fields and k != "_id"}
+                try:
+                    collection.update_one({"_id": incident["_id"]}, {"$set": fields, "$setOnInsert": rest}, upsert=True)
+                except pymongo.errors.PyMongoError as e:
+                    logging.error(f"경보 사건 갱신 실패: {e}")
+        hubs['alerts'].publish_many([
+            {"update_of": incident["_id"], "count": incident["count"], "last_timestamp": incident["last_timestamp"]}
+            for incident, _ in updates
+        ])
+
+    def handle_sensors(batch):
+        # 묶음을 장치별로 나눠 디코딩/평가/저장합니다. 세션은 장치 ID 가 붙은 묶음 중 보고 있는 장치 것만 씁니다.
+        by_device = {}
+        for device, received_ns, payload in batch:
+            by_device.setdefault(device, []).append((received_ns, payload))
+        all_events = []
+        for device, payloads in by_device.items():
+            decoded = decode_batch(payloads)
+            if decoded.rejected:
+                PARSE_FAILURES.labels('sensors').inc(decoded.rejected)
+            if not len(decoded.timestamps_ns):
+                continue
+            registry.touch(device, 'sensors', count=len(decoded.timestamps_ns))
+            rule_engine = rule_engines.get(device)
+            if rule_engine is None:
+                rule_engine = rule_engines[device] = RuleEngine(rules, SENSOR_KEYS)
+            # 묶음 전체를 배열로 한 번에 평가하고, 경보 단계가 바뀐 시점만 기록/알림합니다.
+            events = rule_engine.evaluate(decoded.values, decoded.timestamps_ns)
+            for event in events:
+                event["device"] = device
+                if event_log is not None:
+                    event_log.write(event["message"], ts=event["timestamp"], rule=event["rule"], level=event["level"], device=device)
+            if 'sensors' in writers:
+                writers['sensors'].submit_many(to_documents(decoded, source_device=device))
+            hubs['sensors'].publish((device, decoded))
+            all_events.extend(events)
+        if all_events and 'sensor_events' in hubs:
+            hubs['sensor_events'].publish_many(all_events)
+
+    worker = IngestionWorker(name=name, max_pending=INGEST_MAX_PENDING)
+    worker.add_channel('alerts', handle_alerts, **INGEST_CHANNEL_CONFIG['alerts'])
+    worker.add_channel('sensors', handle_sensors, **INGEST_CHANNEL_CONFIG['sensors'])
+    worker.add_ticker(flush_incidents)
+    return worker
+
+
+def make_dispatcher(worker, alerts_device=ALERTS_DEVICE_ID, sensors_device=SENSORS_DEVICE_ID, received_counter=MQTT_RECEIVED):
+    """토픽에 따라 원본 메시지를 worker 채널에 넣는 dispatch(topic, payload, arrival_ns=None) 함수를 만듭니다.
+
+    arrival_ns 는 수신 시각(ns)으로, 센서 샘플의 시각이 됩니다. 없으면 지금 시각을 씁니다.
+    received_counter 가 None 이면 수신 지표를 올리지 않습니다. (캡처 재생)
+    """
+
+    def dispatch_alert(topic, payload):
+        try:
+            data = json.loads(payload.decode())
+            data['source_device'] = device_from_topic(topic, alerts_device)
+            worker.put('alerts', data)
+        except Exception as e:
+            PARSE_FAILURES.labels('alerts').inc()
+            logging.error(f"ALERT MESSAGE 처리 실패. Error: {e}. Payload: {payload[:200]!r}", exc_info=True)
+
+    def dispatch_sensor(topic, payload, arrival_ns):
+        # 디코딩은 수신 스레드에서 묶음 단위로 하므로 장치 ID, 수신 시각, 원본 bytes 만 넣습니다.
+        worker.put('sensors', (device_from_topic(topic, sensors_device), arrival_ns or time.time_ns(), payload))
+
+    if received_counter is not None:
+        alerts_received, sensors_received = received_counter.labels('alerts'), received_counter.labels('sensors')
+
+    def dispatch(topic, payload, arrival_ns=None):
+        if topic.startswith("robot/"):
+            if received_counter is not None:
+                alerts_received.inc()
+            dispatch_alert(topic, payload)
+        else:
+            if received_counter is not None:
+                sensors_received.inc()
+            dispatch_sensor(topic, payload, arrival_ns)
+    return dispatch
+
+
+class ResultCollector:
+    """허브 자리에 넣어 발행된 항목을 세고 최근 keep 개만 들고 있는 대역입니다. (캡처 재생 결과 확인용)
+
+    size 는 항목 하나의 크기(기본 1), key 를 주면 키별 합계도 셉니다.
+    """
+
+    def __init__(self, keep=200, size=None, key=None):
+        self.size = size
+        self.key = key
+        self.count = 0
+        self.by_key = Counter()
+        self.items = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def publish(self, item):
+        self.publish_many([item])
+
+    def publish_many(self, items):
+        with self._lock:
+            for item in items:
+                n = self.size(item) if self.size else 1
+                self.count += n
+                if self.key is not None:
+                    self.by_key[self.key(item)] += n
+                self.items.append(item)
+
+
+class ReplayPipeline:
+    """캡처 재생 전용 수신 경로입니다.
+
+    실시간 경로와 같은 처리 함수(build_ingestion_worker)를 쓰되, 규칙 엔진/경보 묶기/장치 목록을 재생마다 새로 만들고
+    결과는 세션 허브가 아닌 ResultCollector 로 보냅니다. writers 를 주지 않으면 아무것도 저장하지 않습니다(dry-run).
+    센서 샘플 시각은 캡처된 수신 시각을 그대로 쓰므로, 배속과 관계없이 규칙의 최소 지속 시간/해제 여유폭이
+    원래 시간 간격으로 평가됩니다.
+    """
+
+    def __init__(self, writers=None, name="replay"):
+        self.writers = writers or {}
+        self.results = {
+            'alerts': ResultCollector(key=lambda msg: "update" if "update_of" in msg else msg.get("type")),
+            'sensors': ResultCollector(keep=0, size=lambda item: len(item[1].timestamps_ns), key=lambda item: item[0]),
+            'sensor_events': ResultCollector(key=lambda event: event["level"]),
+        }
+        self.coalescer = AlertCoalescer(window=ALERT_COALESCE_WINDOW, refresh_interval=ALERT_COALESCE_REFRESH)
+        self.worker = build_ingestion_worker(self.results, self.writers, coalescer=self.coalescer, name=name).start()
+        self.dispatch = make_dispatcher(self.worker, received_counter=None)
+
+    def finish(self, timeout=30.0):
+        """남은 메시지를 모두 처리하고, writer 가 있으면 기록을 마친 뒤 종료합니다."""
+        self.worker.stop(timeout, drain=True)
+        for writer in self.writers.values():
+            writer.stop(timeout)
+
+    def summary(self):
+        """재생 결과 요약 (센서 샘플 수/장치별 수, 규칙 이벤트 단계별 수, 경보 사건 수, 최근 이벤트)."""
+        sensors, events = self.results['sensors'], self.results['sensor_events']
+        return {
+            "samples": sensors.count,
+            "devices": dict(sensors.by_key),
+            "events": dict(events.by_key),
+            "incidents": self.coalescer.get_stats()["incidents"],
+            "recent_events": list(events.items),
+            "saved": {name: writer.get_stats()["written"] for name, writer in self.writers.items()},
+        }
@@ -6,10 +6,16 @@ import ssl
 import queue
 import pandas as pd
 import datetime
-import random
+import socket
+import time
 from streamlit_autorefresh import st_autorefresh
 import logging
 import sys
+from alert_coalescer import AlertCoalescer
+from audio_assets import AudioAssetManager
+from supervisor import ConnectionSupervisor
+from db_schema import ensure_indexes
+from change_watcher import CollectionWatcher
 
 # --- 로거 설정 ---
 logger = logging.getLogger(__name__)
@@ -20,10 +26,6 @@ if not logger.handlers:
     handler.setFormatter(formatter)
     logger.addHandler(handler)
 
-# --- 알림음 종류별 Base64 데이터 ---
-FIRE_ALARM_SOUND_BASE64 = "data:audio/wav;base64,UklGRiSAAQBXQVZFZm10IBAAAAABAAEARKwAAIhYAQACABAAAABkYXRhgQEAIAAAAAYWGRo3doN1l3p8gH+Cf4J/in+LgY2Pjp+RlpWXl5iYmJeXlpeXlpeXlpeXlpeXlpeXl5eXl5aXk5iUlpWXl5aXlpeVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVlJWVl-Q"
-SAFETY_ALERT_SOUND_BASE64 = "data:audio/mpeg;base64,SUQzBAAAAAAAIVRYdEnDTPOq/3/3v/2/gAAAAAAAAAAAAAAB/2/g2/gAAA4SAAAEzGgAAAAAAD+kAzYAAAAAAAnnjk8eDEGANjBEyA/IjsgEyA7YEKkC5AlMBNkG/g2/gAAAAAAAAAAAAAAB/2/g2/gAAAA4SAAAEzGgAAAAAAD+kAzYAAAAAAAnnjk8eDEGANjBEyA/IjsgEyA7YEKkC5AlMBNk"
-
 # --- 설정 ---
 HIVE_BROKER = st.secrets["HIVE_BROKER"]
 HIVE_USERNAME = st.secrets["HIVE_USERNAME"]
@@ -34,14 +36,30 @@ HIVE_PORT = 8884
 HIVE_TOPIC = "robot/alerts"
 DB_NAME = "AlertDB"
 COLLECTION_NAME = "AlertData"
+# 이 시간(초) 이상 메시지가 없으면 화면에 알리기만 합니다. 연결 복구는 연결 감시 스레드가 맡습니다.
 CONNECTION_TIMEOUT_SECONDS = 30
+# 고정 클라이언트 ID + 지속 세션(QoS 1)으로 재시작 사이에 못 받은 경보를 브로커가 보관해 줍니다.
+MQTT_CLIENT_ID = st.secrets.get("MQTT_CLIENT_ID", f"streamlit-listener-{socket.gethostname()}")
+MQTT_QOS = 1
+# 화면이 한동안 갱신되지 않아도 메모리가 무한히 늘지 않도록 대기 메시지 수를 제한합니다. (초과 시 가장 오래된 것부터 버림)
+MESSAGE_QUEUE_MAXSIZE = 1000
+# 같은 (유형, 발생원) 경보를 하나의 사건으로 묶는 시간(초)
+ALERT_COALESCE_WINDOW = 10.0
 
 # --- 페이지 설정 및 캐시된 리소스 ---
 st.set_page_config(page_title="안전 모니터링 대시보드", layout="wide")
 
 @st.cache_resource
 def get_message_queue():
-    return queue.Queue()
+    return queue.Queue(maxsize=MESSAGE_QUEUE_MAXSIZE)
+
+@st.cache_resource
+def get_queue_stats():
+    return {"dropped": 0, "high_water": 0}
+
+@st.cache_resource
+def get_alert_coalescer():
+    return AlertCoalescer(window=ALERT_COALESCE_WINDOW)
 
 @st.cache_resource
 def get_db_collection():
@@ -51,6 +69,7 @@ def get_db_collection():
         client.server_info()
         db = client[DB_NAME]
         logger.info(f"MongoDB 연결 성공. DB: '{DB_NAME}', Collection: '{COLLECTION_NAME}'")
+        ensure_indexes({"alerts": db[COLLECTION_NAME]})
         return db[COLLECTION_NAME]
     except Exception as e:
         st.error(f"MongoDB 연결 실패: {e}")
@@ -58,11 +77,11 @@ def get_db_collection():
         return None
 
 @st.cache_resource
-def start_mqtt_client(_message_queue):
+def start_mqtt_client(_message_queue, _queue_stats):
     def on_connect(client, userdata, flags, rc, properties=None):
         if rc == 0:
-            logger.info(f"MQTT 브로커 연결 성공. 토픽 구독: '{HIVE_TOPIC}'")
-            client.subscribe(HIVE_TOPIC)
+            logger.info(f"MQTT 브로커 연결 성공 (이전 세션 유지: {flags.session_present}). 토픽 구독: '{HIVE_TOPIC}'")
+            client.subscribe(HIVE_TOPIC, qos=MQTT_QOS)
         else:
             logger.error(f"MQTT 브로커 연결 실패, 코드: {rc}")
 
@@ -71,38 +90,70 @@ def start_mqtt_client(_message_queue):
             payload = msg.payload.decode()
             data = json.loads(payload)
             if all(key in data for key in ['type', 'message', 'timestamp']):
-                _message_queue.put(data)
+                while True:
+                    try:
+                        _message_queue.put_nowait(data)
+                        break
+                    except queue.Full:
+                        try:
+                            _message_queue.get_nowait()
+                            _queue_stats["dropped"] += 1
+                        except queue.Empty:
+                            pass
+                _queue_stats["high_water"] = max(_queue_stats["high_water"], _message_queue.qsize())
         except (json.JSONDecodeError, TypeError):
             pass
 
-    client_id = f"streamlit-listener-{random.randint(0, 1000)}"
-    client = mqtt.Client(client_id=client_id, transport="websockets", callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+    client = mqtt.Client(client_id=MQTT_CLIENT_ID, clean_session=False, transport="websockets",
+                         callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
     client.username_pw_set(HIVE_USERNAME, HIVE_PASSWORD)
     client.tls_set(cert_reqs=ssl.CERT_NONE)
     client.on_connect = on_connect
     client.on_message = on_message
     try:
         client.connect(HIVE_BROKER, HIVE_PORT, 60)
-        client.loop_start()
-        return client
     except Exception as e:
+        # 첫 연결에 실패해도 클라이언트는 돌려주고, 연결 감시 스레드가 백오프로 다시 붙입니다.
         st.error(f"MQTT 연결 실패: {e}")
         logger.error(f"MQTT 연결 실패: {e}")
-        return None
+        return client
+    client.loop_start()
+    return client
+
+@st.cache_resource
+def start_connection_supervisor(_mqtt_client, _db_collection):
+    # 페이지 렌더와 별도로 연결을 감시하고, 끊긴 구성 요소만 다시 연결합니다. (큐와 커넥션 풀은 유지)
+    supervisor = ConnectionSupervisor(name="supervisor")
+    supervisor.add_mqtt("mqtt", _mqtt_client)
+    if _db_collection is not None:
+        supervisor.add_mongo("mongodb", _db_collection.database.client)
+    return supervisor.start()
 
 # --- 알림음 재생 함수 ---
+@st.cache_resource
+def start_alert_watcher(_db_collection):
+    # 최신 경보 목록을 변경 스트림으로 유지해, 새 세션이 열릴 때마다 DB 를 조회하지 않습니다.
+    if _db_collection is None:
+        return None
+    return CollectionWatcher(_db_collection, capacity=10, query={"type": {"$ne": "normal"}},
+                             sort=[("timestamp", pymongo.DESCENDING)], name="alerts").start()
+
+@st.cache_resource
+def get_audio_assets():
+    # 음원은 시작할 때 한 번만 찾아 검증하고 bytes 로 들고 있다가 st.audio 로 재생합니다.
+    return AudioAssetManager()
+
 def play_notification_sound(sound_type="safety"):
-    if sound_type == "fire":
-        sound_data = FIRE_ALARM_SOUND_BASE64
-    else:
-        sound_data = SAFETY_ALERT_SOUND_BASE64
-    audio_html = f'<audio autoplay><source src="{sound_data}" type="audio/mpeg"></audio>'
-    st.html(audio_html)
+    get_audio_assets().play("fire" if sound_type == "fire" else "safety", nonce=time.time_ns())
 
 # --- 클라이언트 및 큐 실행/초기화 ---
 message_queue = get_message_queue()
+queue_stats = get_queue_stats()
+alert_coalescer = get_alert_coalescer()
 db_collection = get_db_collection()
-mqtt_client = start_mqtt_client(message_queue)
+mqtt_client = start_mqtt_client(message_queue, queue_stats)
+supervisor = start_connection_supervisor(mqtt_client, db_collection)
+alert_watcher = start_alert_watcher(db_collection)
 
 # --- 세션 상태 초기화 ---
 if "latest_alerts" not in st.session_state:
@@ -115,14 +166,11 @@ if "last_message_time" not in st.session_state:
 if "sound_enabled" not in st.session_state:
     st.session_state.sound_enabled = False
 
-# --- 자동 재연결 로직 ---
+# --- 수신 공백 알림 ---
+# 현장이 조용해서 메시지가 없는 것일 수 있으므로 연결을 끊지 않고 알리기만 합니다.
 time_since_last_message = (datetime.datetime.now() - st.session_state.last_message_time).total_seconds()
-if mqtt_client and time_since_last_message > CONNECTION_TIMEOUT_SECONDS:
-    st.warning(f"{CONNECTION_TIMEOUT_SECONDS}초 이상 신호 없음. MQTT 재연결을 시도합니다...")
-    logger.warning("MQTT 연결 시간 초과. 모든 캐시를 지우고 재연결을 시도합니다.")
-    st.cache_resource.clear()
-    st.session_state.last_message_time = datetime.datetime.now()
-    st.rerun()
+if time_since_last_message > CONNECTION_TIMEOUT_SECONDS:
+    st.caption(f"⏱️ {int(time_since_last_message)}초 동안 수신된 메시지가 없습니다.")
 
 # --- UI 제목 ---
 st.title("🛡️ 항만시설 현장 안전 모니터링")
@@ -141,6 +189,8 @@ with st.sidebar:
         st.success("알림음 활성화 상태")
     else:
         st.warning("알림음 비활성화 상태")
+    st.caption(f"수신 대기 {message_queue.qsize()}/{MESSAGE_QUEUE_MAXSIZE}건 "
+               f"(최고 {queue_stats['high_water']}건, 버림 {queue_stats['dropped']}건)")
 
 # --- 메인 로직: 큐에서 메시지 처리 ---
 if db_collection is not None:
@@ -149,6 +199,16 @@ if db_collection is not None:
         st.session_state.last_message_time = datetime.datetime.now()
         
         alert_type = msg.get("type")
+        if alert_type != "normal":
+            try:
+                msg['timestamp'] = datetime.datetime.strptime(msg['timestamp'], "%Y-%m-%d %H:%M:%S")
+            except (ValueError, TypeError):
+                msg['timestamp'] = datetime.datetime.now()
+            # 진행 중인 사건의 반복 경보는 횟수만 늘리고 알림/저장하지 않습니다.
+            msg = alert_coalescer.add(msg)
+            if msg is None:
+                continue
+
         # [핵심 3] 소리가 활성화된 상태에서만 알림음 재생
         if alert_type in ["fire", "safety"] and st.session_state.sound_enabled:
             play_notification_sound(alert_type)
@@ -166,11 +226,6 @@ if db_collection is not None:
         if 'source_ip' in msg:
             del msg['source_ip']
 
-        try:
-            msg['timestamp'] = datetime.datetime.strptime(msg['timestamp'], "%Y-%m-%d %H:%M:%S")
-        except (ValueError, TypeError):
-            msg['timestamp'] = datetime.datetime.now()
-
         st.session_state.latest_alerts.insert(0, msg)
         if len(st.session_state.latest_alerts) > 100:
             st.session_state.latest_alerts.pop()
@@ -182,11 +237,26 @@ if db_collection is not None:
             st.warning(f"DB 저장 실패! ({e})")
             logger.error(f"MongoDB 저장 실패: {e}")
 
+    # 닫혔거나 오래 진행 중인 사건의 반복 횟수와 마지막 시각을 DB 에 반영합니다.
+    for incident, closed in alert_coalescer.collect():
+        if '_id' not in incident:
+            continue
+        try:
+            db_collection.update_one(
+                {"_id": incident['_id']},
+                {"$set": {"count": incident['count'], "last_timestamp": incident['last_timestamp']}}
+            )
+        except Exception as e:
+            logger.error(f"경보 사건 갱신 실패: {e}")
+
 # --- 초기 데이터 로드 ---
 if not st.session_state.latest_alerts and db_collection is not None:
     try:
-        query = {"type": {"$ne": "normal"}}
-        alerts = list(db_collection.find(query).sort("timestamp", pymongo.DESCENDING).limit(10))
+        if alert_watcher is not None and alert_watcher.view.ready:
+            alerts = [dict(alert) for alert in alert_watcher.view.items(10)[0]]
+        else:
+            query = {"type": {"$ne": "normal"}}
+            alerts = list(db_collection.find(query).sort("timestamp", pymongo.DESCENDING).limit(10))
         st.session_state.latest_alerts = alerts
     except Exception as e:
         st.error(f"초기 데이터 로드 실패: {e}")
@@ -200,8 +270,11 @@ with col1:
     st.info(f"{status_message} (마지막 신호: {status_time})")
 with col2:
     st.subheader("MQTT 연결 상태")
-    if mqtt_client and mqtt_client.is_connected():
+    status = supervisor.get_status().get("mqtt")
+    if mqtt_client.is_connected():
         st.success("🟢 실시간 수신 중")
+    elif status and status["retry_in"] is not None:
+        st.error(f"🔴 연결 끊김 (재연결 {status['failures']}회 시도, {status['retry_in']:.0f}초 후 재시도)")
     else:
         st.error("🔴 연결 끊김")
 
@@ -0,0 +1,83 @@
+import threading
+import logging
+
+
+class MessageHub:
+    """프로세스 전체에서 공유하는 고정 크기 메시지 로그입니다.
+
+    발행자는 메시지를 한 번만 기록하고, 각 세션은 자신의 커서(시퀀스 번호)로
+    새 메시지를 읽어 갑니다. 읽기는 메시지를 복사하지 않고 참조만 돌려주므로
+    세션이 늘어나도 메시지당 비용은 거의 늘지 않습니다. 읽는 쪽은 반환된
+    메시지를 수정하지 않아야 합니다.
+    """
+
+    def __init__(self, name, capacity=10000):
+        if capacity < 1:
+            raise ValueError("capacity 는 1 이상이어야 합니다.")
+        self.name = name
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next_seq = 0
+        self._lock = threading.Lock()
+        self._published = 0
+        self._missed = 0
+
+    def publish(self, item):
+        """메시지 한 건을 기록하고 시퀀스 번호를 반환합니다."""
+        with self._lock:
+            seq = self._next_seq
+            self._slots[seq % self.capacity] = item
+            self._next_seq = seq + 1
+            self._published += 1
+        return seq
+
+    def publish_many(self, items):
+        """여러 메시지를 한 번의 잠금으로 기록합니다."""
+        with self._lock:
+            seq = self._next_seq
+            for item in items:
+                self._slots[seq % self.capacity] = item
+                seq += 1
+            self._published += seq - self._next_seq
+            self._next_seq = seq
+
+    def cursor(self, from_start=False):
+        """새 읽기 커서를 만듭니다. 기본값은 지금 이후의 메시지만 읽는 커서입니다."""
+        with self._lock:
+            if from_start:
+                return max(0, self._next_seq - self.capacity)
+            return self._next_seq
+
+    def read(self, cursor, max_items=None):
+        """커서 이후의 메시지를 읽어 (메시지 목록, 다음 커서, 놓친 개수) 를 반환합니다.
+
+        커서가 로그 용량보다 뒤처지면 덮어쓰인 메시지는 건너뛰고 놓친 개수로 알려줍니다.
+        """
+        with self._lock:
+            end = self._next_seq
+            start = max(cursor, end - self.capacity)
+            if max_items is not None:
+                end = min(end, start + max_items)
+            items = [self._slots[seq % self.capacity] for seq in range(start, end)]
+            missed = start - cursor if start > cursor else 0
+            self._missed += missed
+        if missed:
+            logging.warning(f"[{self.name}] 세션 커서가 뒤처져 {missed}건의 메시지를 건너뛰었습니다.")
+        return items, end, missed
+
+    def latest(self, count):
+        """가장 최근 메시지를 최대 count 건까지 오래된 순서로 반환합니다."""
+        with self._lock:
+            end = self._next_seq
+            start = max(0, end - min(count, self.capacity))
+            return [self._slots[seq % self.capacity] for seq in range(start, end)]
+
+    def get_stats(self):
+        """발행 건수, 보관 중인 건수, 세션이 놓친 건수를 반환합니다."""
+        with self._lock:
+            return {
+                "published": self._published,
+                "retained": min(self._next_seq, self.capacity),
+                "next_seq": self._next_seq,
+                "missed": self._missed,
+            }
@@ -0,0 +1,269 @@
+import abc
+import bisect
+import threading
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 지연 시간(초) 히스토그램의 기본 구간 경계
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric(abc.ABC):
+    """레이블 조합별 값을 담는 지표의 공통 부분입니다. 레이블 값 조합마다 자식 객체를 한 번만 만듭니다."""
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values, **kwargs):
+        """레이블 값에 해당하는 자식 지표를 반환합니다. 자주 쓰는 조합은 호출자가 받아 두고 재사용하면 됩니다."""
+        key = tuple(str(v) for v in values) or tuple(str(kwargs[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """레이블 값 조합 하나에 해당하는 자식 지표를 만듭니다."""
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            yield from child.samples(self.name, self.labelnames, key)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, labelnames, key):
+        yield f"{name}{_format_labels(labelnames, key)} {self.value}"
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip((*self.buckets, float("inf")), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{name}_bucket{_format_labels(labelnames, key, [('le', le)])} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, key)} {total}"
+        yield f"{name}_count{_format_labels(labelnames, key)} {count}"
+
+
+class Counter(_Metric):
+    """증가만 하는 누적 값입니다."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    """현재 값을 나타내는 지표입니다."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+
+class Histogram(_Metric):
+    """관측 값을 고정 구간별 개수와 합계로 누적합니다."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+
+class MetricsRegistry:
+    """앱 전체의 지표를 모아 Prometheus 텍스트 형식으로 내보냅니다.
+
+    기록(inc/observe)은 잠금 한 번과 덧셈뿐이라 수신 경로에서도 켜 둘 수 있습니다.
+    큐 깊이나 캐시 적중률처럼 이미 다른 객체가 세고 있는 값은 collector 를 등록해 내보낼 때만 읽습니다.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # 모듈 재실행(Streamlit 재로드) 시 같은 지표를 다시 만들면 기존 것을 그대로 씁니다.
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, name, collect):
+        """내보낼 때마다 호출할 함수를 등록합니다.
+
+        collect() 는 (지표 이름, 종류, 설명, [(레이블 dict, 값)]) 튜플들을 돌려줍니다.
+        같은 name 으로 다시 등록하면 이전 함수를 대체합니다.
+        """
+        with self._lock:
+            self._collectors = [(n, fn) for n, fn in self._collectors if n != name] + [(name, collect)]
+
+    def render(self):
+        """모든 지표를 Prometheus 텍스트 형식 문자열로 반환합니다."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        for collector_name, collect in collectors:
+            try:
+                families = list(collect())
+            except Exception as e:
+                logging.error(f"지표 수집 실패 ({collector_name}): {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 앱 전체가 공유하는 기본 레지스트리
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """레지스트리를 '/metrics' 경로로 제공하는 가벼운 HTTP 스레드입니다."""
+
+    def __init__(self, registry=REGISTRY, host="127.0.0.1", port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """HTTP 서버 스레드를 시작합니다. 포트를 열 수 없으면 로그만 남깁니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            logging.error(f"지표 서버 시작 실패 ({self.host}:{self.port}): {e}")
+            return self
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+        logging.info(f"지표 서버 시작: http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        """HTTP 서버를 종료합니다."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
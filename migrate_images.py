@@ -0,0 +1,94 @@
+"""감지 문서의 base64 이미지를 이미지 저장소(GridFS 또는 로컬 디렉터리)로 옮기는 일괄 변환 도구입니다.
+
+사용 예:
+    python migrate_images.py --uri "$MONGO_URI"
+    python migrate_images.py --uri "$MONGO_URI" --target HIvisDB.HivisData --backend local --blob-dir ./blobs
+    python migrate_images.py --uri "$MONGO_URI" --dry-run
+"""
+import os
+import sys
+import base64
+import logging
+import argparse
+
+import pymongo
+from pymongo import UpdateOne
+
+from image_store import ImageStore, LEGACY_IMAGE_FIELD
+
+DEFAULT_TARGETS = ["crack_monitor.crack_results", "HIvisDB.HivisData"]
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+    stream=sys.stdout
+)
+
+
+def migrate_collection(collection, store, batch_size=100, dry_run=False):
+    """컬렉션의 base64 이미지 문서를 참조 형식으로 변환하고 (변환, 실패) 건수를 반환합니다."""
+    query = {LEGACY_IMAGE_FIELD: {"$exists": True}}
+    total = collection.count_documents(query)
+    logging.info(f"[{collection.full_name}] 변환 대상 문서: {total}건")
+    if dry_run or not total:
+        return 0, 0
+
+    migrated, failed, updates = 0, 0, []
+    cursor = collection.find(query, {LEGACY_IMAGE_FIELD: 1}, batch_size=batch_size, no_cursor_timeout=True)
+    try:
+        for doc in cursor:
+            try:
+                fields = store.put_image(base64.b64decode(doc[LEGACY_IMAGE_FIELD]))
+            except Exception as e:
+                failed += 1
+                logging.error(f"[{collection.full_name}] 문서 {doc['_id']} 이미지 저장 실패: {e}")
+                continue
+            # 이미 변환된 문서를 다시 덮어쓰지 않도록 base64 필드가 남아 있을 때만 갱신합니다.
+            updates.append(UpdateOne(
+                {"_id": doc["_id"], LEGACY_IMAGE_FIELD: {"$exists": True}},
+                {"$set": fields, "$unset": {LEGACY_IMAGE_FIELD: ""}}
+            ))
+            if len(updates) >= batch_size:
+                migrated += collection.bulk_write(updates, ordered=False).modified_count
+                updates = []
+                logging.info(f"[{collection.full_name}] 진행: {migrated}/{total}")
+        if updates:
+            migrated += collection.bulk_write(updates, ordered=False).modified_count
+    finally:
+        cursor.close()
+
+    logging.info(f"[{collection.full_name}] 변환 완료: {migrated}건, 실패: {failed}건")
+    return migrated, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="감지 문서의 base64 이미지를 이미지 저장소로 옮깁니다.")
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI"), help="MongoDB URI (기본값: 환경변수 MONGO_URI)")
+    parser.add_argument("--target", action="append", help="DB.컬렉션 (여러 번 지정 가능, 기본값: 균열/안전조끼 컬렉션)")
+    parser.add_argument("--backend", choices=["gridfs", "local"], default="gridfs")
+    parser.add_argument("--blob-dir", help="로컬 저장소 디렉터리 (--backend local 일 때 필수)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--dry-run", action="store_true", help="변환 대상 건수만 출력합니다.")
+    args = parser.parse_args(argv)
+
+    if not args.uri:
+        parser.error("--uri 또는 환경변수 MONGO_URI 가 필요합니다.")
+    if args.backend == "local" and not args.blob_dir:
+        parser.error("--backend local 에는 --blob-dir 이 필요합니다.")
+
+    client = pymongo.MongoClient(args.uri, serverSelectionTimeoutMS=5000)
+    client.admin.command('ping')
+
+    total_failed = 0
+    for target in args.target or DEFAULT_TARGETS:
+        db_name, collection_name = target.split(".", 1)
+        db = client[db_name]
+        store = ImageStore(db, backend=args.backend, blob_dir=args.blob_dir)
+        _, failed = migrate_collection(db[collection_name], store, args.batch_size, args.dry_run)
+        total_failed += failed
+    return 1 if total_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,36 @@
 import streamlit as st
 import paho.mqtt.client as mqtt
 import pymongo
-import json
 import ssl
-import queue
 import pandas as pd
 from datetime import datetime, timedelta, timezone
-import random
-from streamlit_autorefresh import st_autorefresh
+import socket
 import logging
 import sys
-import plotly.express as px
+import time
+import functools
+import tempfile
 import os
-import base64
+from db_writer import BatchedMongoWriter
+from message_hub import MessageHub
+from sensor_buffer import SensorRingBuffer
+from sensor_codec import SENSOR_KEYS
+from image_store import ImageStore, has_image
+from detection_feed import fetch_page, fetch_detail, fetch_head, view_page, LIST_PROJECTION, STREAM_LIST_STAGES
+from change_watcher import CollectionWatcher
+from image_cache import ImageCache
+from sensor_rollup import ensure_timeseries_collection, SensorRollupJob, load_series
+from sensor_history import HISTORY_INTERVALS, choose_interval, interval_label, load_history
+from sensor_chart import build_trend_figure, build_range_figure
+from event_log import EventLog
+from audio_assets import AudioAssetManager
+from device_registry import DeviceRegistry
+from supervisor import ConnectionSupervisor
+from metrics import REGISTRY, MetricsServer
+from db_schema import ensure_indexes, check_query_plans
+from mqtt_capture import CaptureWriter, CaptureReplayer, list_captures
+from ingest_pipeline import (build_ingestion_worker, make_dispatcher, ReplayPipeline, SENSORS_DEVICE_ID,
+                             ALERTS_WRITER_CONFIG, SENSORS_WRITER_CONFIG)
 
 # --- 로거 설정 ---
 logging.basicConfig(
@@ -22,6 +40,28 @@ logging.basicConfig(
     stream=sys.stdout
 )
 
+# --- 지표 (프로세스 전체에서 공유, 재실행 시 같은 객체를 돌려받음) ---
+# fragment 레이블은 전체 실행이면 'full', 프래그먼트 본문이면 그 이름입니다. 주기 갱신은 대부분 프래그먼트 재실행입니다.
+PAGE_RENDER_SECONDS = REGISTRY.histogram("page_render_seconds", "페이지별 전체 실행과 프래그먼트 실행 소요 시간(초)",
+                                         ["page", "fragment"])
+
+
+def timed_fragment(name):
+    """프래그먼트 본문 실행 시간을 현재 페이지의 page_render_seconds{fragment=name} 에 기록하는 데코레이터입니다.
+
+    @st.fragment 바로 아래에 붙여, 전체 실행 중 호출과 프래그먼트 단독 재실행을 모두 잽니다.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PAGE_RENDER_SECONDS.labels(st.session_state.get('page', 'main'), name).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
 # --- 설정 (st.secrets 에서 가져옴) ---
 try:
     # 안전 모니터링 대시보드용 설정
@@ -30,13 +70,14 @@ try:
     HIVE_USERNAME_ALERTS = st.secrets["HIVE_USERNAME_ALERTS"]
     HIVE_PASSWORD_ALERTS = st.secrets["HIVE_PASSWORD_ALERTS"]
     ALERTS_PORT = 8884
-    ALERTS_TOPIC = "robot/alerts"
+    # 기존 단일 로봇 토픽과 장치별 토픽('robot/<장치 ID>/alerts')을 함께 구독합니다.
+    ALERTS_TOPICS = ["robot/alerts", "robot/+/alerts"]
     ALERTS_DB_NAME = "AlertDB"
     ALERTS_COLLECTION_NAME = "AlertData"
     HIVE_USERNAME_SENSORS = st.secrets["HIVE_USERNAME_SENSORS"]
     HIVE_PASSWORD_SENSORS = st.secrets["HIVE_PASSWORD_SENSORS"]
     SENSORS_PORT = 8883
-    SENSORS_TOPIC = "multiSensor/numeric"
+    SENSORS_TOPICS = ["multiSensor/numeric", "multiSensor/+/numeric"]
     SENSORS_DB_NAME = "SensorDB"
     SENSORS_COLLECTION_NAME = "SensorData"
 
@@ -49,11 +90,82 @@ try:
     HIVIS_COLLECTION_NAME = "HivisData"
 
     # 공통 센서 경고 기준 설정
-    LOG_FILE = "sensor_logs.txt"
-    OXYGEN_SAFE_MIN = 19.5
-    OXYGEN_SAFE_MAX = 23.5
-    NO2_WARN_LIMIT = 3.0
-    NO2_DANGER_LIMIT = 5.0
+    LOG_FILE = "sensor_logs.txt"  # 이전 형식 텍스트 로그 (있으면 처음 시작할 때 이벤트 로그로 가져옴)
+    EVENT_LOG_DIR = "sensor_logs"
+    # 이벤트 로그 세그먼트 회전(크기/기간), 보관 세그먼트 수, 파일 기록 주기
+    EVENT_LOG_CONFIG = {"max_segment_bytes": 4 * 1024 * 1024, "max_segment_age": 86400.0,
+                        "max_segments": 60, "flush_interval": 1.0}
+    EVENT_LOG_PAGE_SIZES = [100, 500, 2000]
+    # MQTT 세션 설정. 클라이언트 ID 가 고정되어야 브로커가 재시작 사이에 못 받은 QoS 1 메시지를 보관해 줍니다.
+    # 같은 호스트에서 여러 인스턴스를 띄울 때는 secrets 의 MQTT_CLIENT_ID_PREFIX 를 인스턴스마다 다르게 지정하세요.
+    MQTT_CLIENT_ID_PREFIX = st.secrets.get("MQTT_CLIENT_ID_PREFIX", f"st-monitoring-{socket.gethostname()}")
+    MQTT_QOS = 1
+
+    # 연결 감시 설정 (확인 주기, 끊긴 뒤 직접 재연결하기까지의 유예, 재연결 백오프 시작/최대 초, 지터 비율)
+    SUPERVISOR_CONFIG = {"interval": 5.0, "grace": 10.0, "base_backoff": 1.0, "max_backoff": 60.0, "jitter": 0.5}
+
+    # 경보/균열/안전조끼 컬렉션의 최신 목록을 변경 스트림으로 유지하는 감시 설정.
+    # capacity 는 감지 목록 첫 페이지(최대 100개)와 다음 페이지 여부 확인용 1건을 담을 수 있어야 합니다.
+    # 변경 스트림을 쓸 수 없는 서버(단일 서버)에서는 poll_interval 초마다 다시 조회합니다.
+    CHANGE_WATCH_CONFIG = {"capacity": 101, "poll_interval": 5.0, "max_backoff": 60.0}
+
+    # 시작할 때 주요 조회의 실행 계획(explain)을 확인해 인덱스를 타지 않으면 경고를 남길지 여부
+    SCHEMA_CHECK_PLANS = True
+
+    # MQTT 원본 트래픽 캡처 (사건 재현/부하 시험용 재생에 사용). 켜면 모든 원본 메시지를 디스크에 기록합니다.
+    # 파일 크기(max_bytes), 보관 파일 수(max_files), 보관 기간(max_age 초)을 넘으면 오래된 파일부터 지웁니다.
+    MQTT_CAPTURE_ENABLED = False
+    MQTT_CAPTURE_DIR = "mqtt_captures"
+    MQTT_CAPTURE_CONFIG = {"max_bytes": 128 * 1024 * 1024, "max_files": 16, "max_age": 7 * 86400.0}
+    CAPTURE_REPLAY_SPEEDS = {"1×": 1.0, "10×": 10.0, "최대": None}
+    # 재생 결과를 저장할 별도 DB (운영 AlertDB/SensorDB 에는 쓰지 않음)
+    CAPTURE_REPLAY_DB_NAME = "ReplayDB"
+
+    # 지표 HTTP 서버 (Prometheus 텍스트 형식, '/metrics'). 로컬에서만 수집하도록 기본은 127.0.0.1 입니다.
+    METRICS_HOST = "127.0.0.1"
+    METRICS_PORT = 9108
+    SESSION_ACTIVE_WINDOW = 30.0  # 이 시간(초) 안에 화면을 갱신한 세션을 접속 중으로 봅니다.
+
+    # 세션들이 공유하는 메시지 허브 용량 (세션이 이보다 많이 뒤처지면 오래된 메시지는 건너뜀)
+    # 센서 허브는 수신 스레드가 한 번에 디코딩한 묶음(DecodedBatch) 단위로 셉니다.
+    ALERTS_HUB_CAPACITY = 1000
+    SENSORS_HUB_CAPACITY = 2000
+
+    # 세션별 실시간 센서 창 크기 (샘플 수)
+    LIVE_WINDOW_CAPACITY = 1000
+
+    # 감지 이미지 저장소 ("gridfs" 또는 "local", 로컬 저장소 참조를 읽을 때는 IMAGE_BLOB_DIR 사용)
+    IMAGE_STORE_BACKEND = "gridfs"
+    IMAGE_BLOB_DIR = "image_blobs"
+    # 디코딩된 감지 이미지 캐시 메모리 예산 (모든 세션 공용)
+    IMAGE_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+    # 센서 롤업(1초/1분/1시간) 갱신 주기(초)와 추세 그래프 조회 구간
+    SENSOR_ROLLUP_INTERVAL = 10.0
+    SENSOR_TREND_SPANS = {
+        "실시간": None,
+        "최근 1시간": timedelta(hours=1),
+        "최근 6시간": timedelta(hours=6),
+        "최근 24시간": timedelta(days=1),
+        "최근 7일": timedelta(days=7),
+    }
+    # 센서 기록 조회: 채널당 최대 버킷 수, 결과를 받아오는 묶음 크기, 조회 가능한 최대 기간(일)
+    SENSOR_HISTORY_MAX_POINTS = 2000
+    SENSOR_HISTORY_BATCH_SIZE = 1000
+    SENSOR_HISTORY_MAX_DAYS = 92
+
+    # 추세 그래프: 채널당 최대 점 수 (그래프 한 칸의 픽셀 폭 정도) 와 줄이는 방식 ("minmax" 또는 "lttb")
+    TREND_MAX_POINTS = 1200
+    TREND_DOWNSAMPLE_METHOD = "minmax"
+
+    # 화면 영역별 부분 새로고침 주기(초). 나머지 화면은 사용자 조작 시에만 다시 그립니다.
+    REFRESH_INTERVALS = {
+        "events": 1,       # 허브 메시지 반영, 알림(toast), 알림음
+        "status": 2,       # 시스템 현재 상태 / MQTT 연결 상태
+        "alerts": 2,       # 최근 경보 내역 표
+        "sensors": 2,      # 센서 수신 상태, 현재 값, 추세 그래프
+        "detections": 5,   # 균열/안전조끼 감지 목록
+    }
 except KeyError as e:
     st.error(f"st.secrets에 필수 설정이 누락되었습니다: {e}. secrets.toml 파일을 확인해주세요.", icon="🚨")
     st.stop()
@@ -62,14 +174,13 @@ except KeyError as e:
 # 캐시 리소스 (앱 재실행 시에도 유지)
 # ==================================
 @st.cache_resource
-def get_alerts_queue():
-    """안전 경보 메시지를 위한 스레드-안전 큐를 생성합니다."""
-    return queue.Queue()
-
-@st.cache_resource
-def get_sensors_queue():
-    """센서 데이터 메시지를 위한 스레드-안전 큐를 생성합니다."""
-    return queue.Queue()
+def get_message_hubs():
+    """모든 세션이 각자의 커서로 읽는 경보/센서/센서 이벤트 메시지 허브를 생성합니다."""
+    return {
+        'alerts': MessageHub("alerts", capacity=ALERTS_HUB_CAPACITY),
+        'sensors': MessageHub("sensors", capacity=SENSORS_HUB_CAPACITY),
+        'sensor_events': MessageHub("sensor_events", capacity=ALERTS_HUB_CAPACITY),
+    }
 
 @st.cache_resource
 def get_mongo_collections():
@@ -83,7 +194,11 @@ def get_mongo_collections():
 
         # 1. 안전 모니터링 컬렉션
         collections["alerts"] = client[ALERTS_DB_NAME][ALERTS_COLLECTION_NAME]
-        collections["sensors"] = client[SENSORS_DB_NAME][SENSORS_COLLECTION_NAME]
+        try:
+            collections["sensors"] = ensure_timeseries_collection(client[SENSORS_DB_NAME], SENSORS_COLLECTION_NAME)
+        except Exception as e:
+            logging.warning(f"센서 시계열 컬렉션 확인 실패, 기존 컬렉션을 사용합니다: {e}")
+            collections["sensors"] = client[SENSORS_DB_NAME][SENSORS_COLLECTION_NAME]
 
         # 2. 도로 균열 감지 컬렉션
         collections["crack"] = client[CRACK_DB_NAME][CRACK_COLLECTION_NAME]
@@ -91,75 +206,206 @@ def get_mongo_collections():
         # 3. 안전 조끼 감지 컬렉션 추가
         collections["hivis"] = client[HIVIS_DB_NAME][HIVIS_COLLECTION_NAME]
 
+        # 필수 인덱스를 만들고(이미 있으면 그대로), 주요 조회가 인덱스를 타는지 확인합니다.
+        ensure_indexes(collections)
+        if SCHEMA_CHECK_PLANS:
+            check_query_plans(collections)
         return collections
     except Exception as e:
         st.error(f"❌ MongoDB 연결 실패: {e}", icon="🚨")
         logging.error(f"MongoDB 연결 실패: {e}")
         return None
 
+@st.cache_resource
+def start_change_watchers():
+    """경보/균열/안전조끼 컬렉션의 최신 목록을 유지하는 감시 스레드를 시작합니다. 모든 세션이 이 목록을 읽습니다."""
+    collections = get_mongo_collections()
+    if not collections:
+        return {}
+    watchers = {
+        'alerts': CollectionWatcher(collections['alerts'], query={"type": {"$ne": "normal"}},
+                                    sort=[("timestamp", pymongo.DESCENDING)], name="alerts", **CHANGE_WATCH_CONFIG),
+    }
+    for name in ('crack', 'hivis'):
+        watchers[name] = CollectionWatcher(collections[name], projection=LIST_PROJECTION, stream_stages=STREAM_LIST_STAGES,
+                                           name=name, **CHANGE_WATCH_CONFIG)
+    for watcher in watchers.values():
+        watcher.start()
+    return watchers
+
+@st.cache_resource
+def get_image_stores():
+    """균열/안전조끼 감지 이미지 저장소를 생성합니다."""
+    collections = get_mongo_collections()
+    if not collections:
+        return {}
+    return {
+        name: ImageStore(collections[name].database, backend=IMAGE_STORE_BACKEND, blob_dir=IMAGE_BLOB_DIR)
+        for name in ('crack', 'hivis')
+    }
+
+@st.cache_resource
+def get_image_cache():
+    """모든 세션이 공유하는 디코딩 이미지 LRU 캐시를 생성합니다."""
+    return ImageCache(max_bytes=IMAGE_CACHE_MAX_BYTES)
+
+@st.cache_resource
+def get_event_log():
+    """센서 이벤트 로그(JSON-lines 세그먼트)를 열고 백그라운드 기록 스레드를 시작합니다."""
+    event_log = EventLog(EVENT_LOG_DIR, **EVENT_LOG_CONFIG)
+    if os.path.exists(LOG_FILE):
+        try:
+            event_log.import_legacy_text(LOG_FILE)
+        except OSError as e:
+            logging.error(f"이전 로그 파일 가져오기 실패: {e}")
+    return event_log.start()
+
+@st.cache_resource
+def get_audio_assets():
+    """경보 음원을 한 번 찾아 검증하고 bytes 로 들고 있습니다. 재생은 st.audio 의 미디어 파일 주소로 합니다."""
+    return AudioAssetManager()
+
+@st.cache_resource
+def get_rule_engines():
+    """장치 ID -> 경보 규칙 엔진. 수신 스레드가 장치마다 엔진을 만들어 채우며, 현재 단계는 모든 세션이 함께 봅니다."""
+    return {}
+
+@st.cache_resource
+def get_device_registry():
+    """수신 스레드가 장치별 마지막 수신 시각을 기록하는 공용 장치 목록을 생성합니다."""
+    return DeviceRegistry()
+
+@st.cache_resource
+def get_mongo_writers():
+    """경보/센서 컬렉션에 대한 백그라운드 배치 writer 를 시작합니다."""
+    collections = get_mongo_collections()
+    if not collections:
+        return {}
+    return {
+        'alerts': BatchedMongoWriter(collections['alerts'], name="alerts", **ALERTS_WRITER_CONFIG).start(),
+        'sensors': BatchedMongoWriter(collections['sensors'], name="sensors", **SENSORS_WRITER_CONFIG).start(),
+    }
+
+@st.cache_resource
+def start_sensor_rollup():
+    """센서 데이터의 1초/1분/1시간 롤업을 주기적으로 갱신하는 작업을 시작합니다."""
+    collections = get_mongo_collections()
+    if not collections:
+        return None
+    job = SensorRollupJob(collections['sensors'].database, SENSORS_COLLECTION_NAME, interval=SENSOR_ROLLUP_INTERVAL)
+    return job.start()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_sensor_trend(span_label, device):
+    """조회 구간에 맞는 해상도(원본/롤업)로 한 장치의 센서 추세를 불러옵니다. 모든 세션이 결과를 공유합니다."""
+    collections = get_mongo_collections()
+    if not collections:
+        return pd.DataFrame(), None
+    end = datetime.now(timezone.utc)
+    return load_series(collections['sensors'].database, SENSORS_COLLECTION_NAME,
+                       end - SENSOR_TREND_SPANS[span_label], end, device=device)
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_sensor_history(start, end, interval, device, channels):
+    """기간/간격/채널별 센서 기록을 서버 집계로 불러옵니다. 같은 조건의 조회는 모든 세션이 결과를 공유합니다."""
+    collections = get_mongo_collections()
+    if not collections:
+        return pd.DataFrame(), None
+    return load_history(collections['sensors'].database, SENSORS_COLLECTION_NAME, start, end, interval=interval,
+                        channels=channels, device=device, default_device=SENSORS_DEVICE_ID,
+                        max_points=SENSOR_HISTORY_MAX_POINTS, batch_size=SENSOR_HISTORY_BATCH_SIZE)
+
+@st.cache_resource
+def start_ingestion_worker():
+    """수신 메시지를 파싱/저장하고 허브에 발행하는 백그라운드 처리 스레드를 시작합니다.
+
+    DB 저장은 이 스레드에서 이루어지므로, 열려 있는 대시보드 탭 수와 관계없이 한 번씩만 기록됩니다.
+    """
+    worker = build_ingestion_worker(get_message_hubs(), get_mongo_writers(), event_log=get_event_log(),
+                                    rule_engines=get_rule_engines(), registry=get_device_registry())
+    return worker.start()
+
+@st.cache_resource
+def get_capture_writer():
+    """두 구독의 원본 메시지를 기록하는 캡처 파일 writer 를 엽니다. 꺼져 있으면 None 입니다."""
+    return CaptureWriter(MQTT_CAPTURE_DIR, **MQTT_CAPTURE_CONFIG) if MQTT_CAPTURE_ENABLED else None
+
+@st.cache_resource
+def get_message_dispatcher():
+    """토픽에 따라 원본 메시지를 수신 스레드 채널에 넣는 함수를 만듭니다. MQTT 콜백과 캡처 재생이 함께 씁니다."""
+    return make_dispatcher(start_ingestion_worker())
+
+@st.cache_resource
+def get_capture_replayer():
+    """캡처 파일을 재생 전용 수신 경로로 흘려보내는 재생기를 생성합니다. 경로는 재생마다 새로 만듭니다."""
+    return CaptureReplayer()
+
+@st.cache_resource
+def get_replay_runs():
+    """마지막 재생 경로(ReplayPipeline)를 모든 세션이 함께 보도록 담아 두는 dict 입니다."""
+    return {}
+
 @st.cache_resource
 def start_mqtt_clients():
     """안전 및 센서 데이터 수신을 위한 MQTT 클라이언트를 시작합니다."""
     clients = {}
+    dispatch = get_message_dispatcher()
+    capture = get_capture_writer()
 
     # 1. 안전 모니터링 클라이언트 (WebSockets)
-    alerts_queue = get_alerts_queue()
 
     def on_connect_alerts(client, userdata, flags, rc, properties=None):
         if rc == 0:
-            logging.info(f"안전 모니터링 MQTT 연결 성공. 토픽 구독: '{ALERTS_TOPIC}'")
-            client.subscribe(ALERTS_TOPIC)
+            logging.info(f"안전 모니터링 MQTT 연결 성공 (이전 세션 유지: {flags.session_present}). 토픽 구독: {ALERTS_TOPICS}")
+            client.subscribe([(topic, MQTT_QOS) for topic in ALERTS_TOPICS])
         else:
             logging.error(f"안전 모니터링 MQTT 연결 실패, 코드: {rc}")
 
-    def on_message_alerts(client, userdata, msg):
+    def on_message(client, userdata, msg):
         try:
-            payload = msg.payload.decode()
-            data = json.loads(payload)
-            alerts_queue.put(data)
+            if capture is not None:
+                capture.record(msg.topic, msg.payload)
+            dispatch(msg.topic, msg.payload)
         except Exception as e:
-            logging.error(f"ALERT MESSAGE 처리 실패. Error: {e}. Payload: {msg.payload.decode()}", exc_info=True)
+            logging.error(f"MQTT 메시지 수신 중 오류 ({msg.topic}): {e}")
 
     try:
         alerts_client = mqtt.Client(
-            client_id=f"st-alerts-{random.randint(0, 1000)}",
+            client_id=f"{MQTT_CLIENT_ID_PREFIX}-alerts",
+            clean_session=False,  # 재연결/재시작 때 브로커가 보관한 QoS 1 메시지를 이어서 받습니다.
             transport="websockets",
             callback_api_version=mqtt.CallbackAPIVersion.VERSION2
         )
         alerts_client.username_pw_set(HIVE_USERNAME_ALERTS, HIVE_PASSWORD_ALERTS)
         alerts_client.tls_set(cert_reqs=ssl.CERT_NONE)
         alerts_client.on_connect = on_connect_alerts
-        alerts_client.on_message = on_message_alerts
+        alerts_client.on_message = on_message
+        # 첫 연결에 실패해도 클라이언트는 남겨 두고 연결 감시 스레드가 다시 붙입니다.
+        clients['alerts'] = alerts_client
         alerts_client.connect(HIVE_BROKER, ALERTS_PORT, 60)
         alerts_client.loop_start()
-        clients['alerts'] = alerts_client
     except Exception as e:
         st.error(f"안전 모니터링 MQTT 연결 실패: {e}", icon="🚨")
+        logging.error(f"안전 모니터링 MQTT 연결 실패: {e}")
 
     # 2. 센서 모니터링 클라이언트 (TLS)
-    sensors_queue = get_sensors_queue()
     def on_connect_sensors(client, userdata, flags, rc, properties=None):
         if rc == 0:
-            logging.info(f"센서 MQTT 연결 성공. 토픽 구독: '{SENSORS_TOPIC}'")
-            client.subscribe(SENSORS_TOPIC)
+            logging.info(f"센서 MQTT 연결 성공 (이전 세션 유지: {flags.session_present}). 토픽 구독: {SENSORS_TOPICS}")
+            client.subscribe([(topic, MQTT_QOS) for topic in SENSORS_TOPICS])
         else:
             logging.error(f"센서 MQTT 연결 실패, 코드: {rc}")
 
-    def on_message_sensors(client, userdata, msg):
-        try:
-            sensors_queue.put(msg.payload.decode().strip())
-        except Exception as e:
-            logging.error(f"센서 메시지 수신 중 오류: {e}")
-
     try:
-        sensors_client = mqtt.Client(client_id=f"st-sensors-{random.randint(0, 1000)}", callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+        sensors_client = mqtt.Client(client_id=f"{MQTT_CLIENT_ID_PREFIX}-sensors", clean_session=False,
+                                     callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
         sensors_client.username_pw_set(HIVE_USERNAME_SENSORS, HIVE_PASSWORD_SENSORS)
         sensors_client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS)
         sensors_client.on_connect = on_connect_sensors
-        sensors_client.on_message = on_message_sensors
+        sensors_client.on_message = on_message
+        clients['sensors'] = sensors_client
         sensors_client.connect(HIVE_BROKER, SENSORS_PORT, 60)
         sensors_client.loop_start()
-        clients['sensors'] = sensors_client
         logging.info("센서 MQTT 클라이언트 시작됨.")
     except Exception as e:
         st.error(f"센서 MQTT 연결 실패: {e}", icon="🚨")
@@ -167,6 +413,86 @@ def start_mqtt_clients():
 
     return clients
 
+@st.cache_resource
+def start_connection_supervisor():
+    """MQTT 클라이언트와 MongoDB 연결을 렌더와 별도로 감시하고, 끊긴 것만 백오프로 다시 연결합니다."""
+    supervisor = ConnectionSupervisor(name="supervisor", **SUPERVISOR_CONFIG)
+    for name, client in start_mqtt_clients().items():
+        supervisor.add_mqtt(f"mqtt-{name}", client)
+    collections = get_mongo_collections()
+    if collections:
+        supervisor.add_mongo("mongodb", collections['alerts'].database.client)
+    return supervisor.start()
+
+@st.cache_resource
+def get_session_tracker():
+    """세션 ID -> 마지막 화면 갱신 시각(monotonic). 접속 중인 세션 수 지표에 사용합니다."""
+    return {}
+
+@st.cache_resource
+def start_metrics_server():
+    """이미 각 구성 요소가 세고 있는 통계를 지표로 내보내도록 등록하고 HTTP 서버를 시작합니다."""
+    ingestion = start_ingestion_worker()
+    writers = get_mongo_writers()
+    hubs = get_message_hubs()
+    image_cache = get_image_cache()
+    supervisor = start_connection_supervisor()
+    sessions = get_session_tracker()
+    watchers = start_change_watchers()
+
+    def collect_ingestion():
+        stats = ingestion.get_stats()
+        yield ("ingest_queue_depth", "gauge", "채널별 수신 큐 대기 메시지 수",
+               [({"channel": c}, s["depth"]) for c, s in stats.items()])
+        yield ("ingest_queue_high_water", "gauge", "채널별 수신 큐 최고 대기 수",
+               [({"channel": c}, s["high_water"]) for c, s in stats.items()])
+        yield ("ingest_dropped_total", "counter", "채널별 큐 초과로 버린 메시지 수",
+               [({"channel": c}, s["dropped"]) for c, s in stats.items()])
+
+    def collect_writers():
+        stats = {name: writer.get_stats() for name, writer in writers.items()}
+        yield ("mongo_written_total", "counter", "writer 별 기록한 문서 수", [({"writer": n}, s["written"]) for n, s in stats.items()])
+        yield ("mongo_dropped_total", "counter", "writer 별 버린 문서 수", [({"writer": n}, s["dropped"]) for n, s in stats.items()])
+        yield ("mongo_buffered", "gauge", "writer 별 기록 대기 문서 수", [({"writer": n}, s["buffered"]) for n, s in stats.items()])
+
+    def collect_hubs():
+        stats = {name: hub.get_stats() for name, hub in hubs.items()}
+        yield ("hub_published_total", "counter", "허브별 발행 메시지 수", [({"hub": n}, s["published"]) for n, s in stats.items()])
+        yield ("hub_missed_total", "counter", "허브별 세션이 놓친 메시지 수", [({"hub": n}, s["missed"]) for n, s in stats.items()])
+
+    def collect_cache():
+        stats = image_cache.get_stats()
+        yield ("image_cache_hits_total", "counter", "이미지 캐시 적중 수", [({}, stats["hits"])])
+        yield ("image_cache_misses_total", "counter", "이미지 캐시 실패 수", [({}, stats["misses"])])
+        yield ("image_cache_hit_ratio", "gauge", "이미지 캐시 적중률", [({}, stats["hit_ratio"])])
+        yield ("image_cache_bytes", "gauge", "이미지 캐시 사용 바이트", [({}, stats["bytes"])])
+
+    def collect_connections():
+        yield ("connection_up", "gauge", "연결 감시 대상별 연결 상태 (1=연결)",
+               [({"component": n}, int(bool(s["alive"]))) for n, s in supervisor.get_status().items()])
+
+    def collect_watchers():
+        stats = {name: watcher.get_status() for name, watcher in watchers.items()}
+        yield ("change_watch_streaming", "gauge", "감시 대상별 변경 스트림 사용 여부 (0=주기 조회/시작 중)",
+               [({"collection": n}, int(s["mode"] == "stream")) for n, s in stats.items()])
+        yield ("change_watch_changes_total", "counter", "감시 대상별 반영한 변경 이벤트 수",
+               [({"collection": n}, s["changes"]) for n, s in stats.items()])
+        yield ("change_watch_reloads_total", "counter", "감시 대상별 목록 전체 조회 수",
+               [({"collection": n}, s["reloads"]) for n, s in stats.items()])
+
+    def collect_sessions():
+        now = time.monotonic()
+        for session_id, last_seen in list(sessions.items()):
+            if now - last_seen > SESSION_ACTIVE_WINDOW:
+                sessions.pop(session_id, None)
+        yield ("dashboard_sessions", "gauge", "접속 중인 대시보드 세션 수", [({}, len(sessions))])
+
+    for name, collect in [("ingestion", collect_ingestion), ("writers", collect_writers), ("hubs", collect_hubs),
+                          ("image_cache", collect_cache), ("connections", collect_connections), ("watchers", collect_watchers),
+                          ("sessions", collect_sessions)]:
+        REGISTRY.add_collector(name, collect)
+    return MetricsServer(REGISTRY, host=METRICS_HOST, port=METRICS_PORT).start()
+
 # ==================================
 # Streamlit 앱 클래스
 # ==================================
@@ -177,9 +503,24 @@ class UnifiedDashboard:
         """앱 초기화"""
         st.set_page_config(page_title="통합 모니터링 대시보드", layout="wide")
         self.collections = get_mongo_collections()
+        self.watchers = start_change_watchers()
+        self.writers = get_mongo_writers()
+        self.image_stores = get_image_stores()
+        self.image_cache = get_image_cache()
+        self.event_log = get_event_log()
+        self.rule_engines = get_rule_engines()
+        self.registry = get_device_registry()
+        self.audio_assets = get_audio_assets()
+        self.rollup_job = start_sensor_rollup()
+        self.hubs = get_message_hubs()
+        self.ingestion = start_ingestion_worker()
         self.clients = start_mqtt_clients()
-        self.alerts_queue = get_alerts_queue()
-        self.sensors_queue = get_sensors_queue()
+        self.supervisor = start_connection_supervisor()
+        self.capture = get_capture_writer()
+        self.replayer = get_capture_replayer()
+        self.replay_runs = get_replay_runs()
+        self.sessions = get_session_tracker()
+        self.metrics_server = start_metrics_server()
         self._initialize_state()
 
     def _initialize_state(self):
@@ -189,21 +530,40 @@ class UnifiedDashboard:
             'latest_alerts': [],
             'current_status': {"message": "데이터 수신 대기 중...", "timestamp": "N/A"},
             'sound_enabled': False,
-            'live_df': pd.DataFrame(),
-            'last_sensor_values': {"CH4": 0.0, "EtOH": 0.0, "H2": 0.0, "NH3": 0.0, "CO": 0.0},
             'sound_primed': False,
             'play_sound_trigger': None,
             'sensor_data_loaded': False,
+            'live_device': SENSORS_DEVICE_ID,
+            'alerts_version': 0,
         }
         for key, value in defaults.items():
             if key not in st.session_state:
                 st.session_state[key] = value
+        if 'live_buffer' not in st.session_state:
+            st.session_state.live_buffer = SensorRingBuffer(SENSOR_KEYS, capacity=LIVE_WINDOW_CAPACITY)
+        if 'session_id' not in st.session_state:
+            st.session_state.session_id = os.urandom(8).hex()
+        if 'hub_cursors' not in st.session_state:
+            # 새 세션은 접속 이후의 메시지부터 읽습니다. (이전 경보는 DB에서 불러옴)
+            st.session_state.hub_cursors = {name: hub.cursor() for name, hub in self.hubs.items()}
+
+    def _read_hub(self, name):
+        """세션 커서 이후에 허브에 쌓인 메시지를 읽고 커서를 이동합니다."""
+        items, st.session_state.hub_cursors[name], _ = self.hubs[name].read(st.session_state.hub_cursors[name])
+        return items
 
     def _process_queues(self):
-        """MQTT 메시지 큐를 처리하여 데이터를 업데이트합니다."""
-        # 1. 안전 경보 큐 처리
-        while not self.alerts_queue.empty():
-            msg = self.alerts_queue.get()
+        """공유 메시지 허브에서 이 세션이 아직 읽지 않은 메시지를 반영합니다."""
+        # 1. 안전 경보 처리
+        for msg in self._read_hub('alerts'):
+            if "update_of" in msg:
+                # 진행 중인 사건의 반복 횟수/마지막 시각 갱신 (알림 없음)
+                for alert in st.session_state.latest_alerts:
+                    if alert.get("_id") == msg["update_of"]:
+                        alert.update(count=msg["count"], last_timestamp=msg["last_timestamp"])
+                        st.session_state.alerts_version += 1
+                        break
+                continue
             alert_type = msg.get("type")
             if alert_type in ["fire", "safety"]:
                 if st.session_state.get('sound_enabled', False):
@@ -213,94 +573,35 @@ class UnifiedDashboard:
                     icon="🔥" if alert_type == "fire" else "⚠️"
                 )
 
-            if msg.get("type") == "normal":
+            if alert_type == "normal":
                 st.session_state.current_status = msg
                 continue
 
-            try:
-                msg['timestamp'] = datetime.strptime(msg['timestamp'], "%Y-%m-%d %H:%M:%S")
-            except (ValueError, TypeError):
-                msg['timestamp'] = datetime.now()
-
-            st.session_state.latest_alerts.insert(0, msg)
+            st.session_state.latest_alerts.insert(0, dict(msg))
             if len(st.session_state.latest_alerts) > 100:
                 st.session_state.latest_alerts.pop()
-            if self.collections and 'alerts' in self.collections:
-                self.collections['alerts'].insert_one(msg.copy())
-
-        # 2. 센서 데이터 큐 처리
-        sensor_keys = ["CH4", "EtOH", "H2", "NH3", "CO", "NO2", "Oxygen", "Distance", "Flame"]
-        new_data = []
-        while not self.sensors_queue.empty():
-            payload = self.sensors_queue.get()
-            try:
-                values = [float(v.strip()) for v in payload.split(',')]
-                if len(values) != len(sensor_keys):
-                    logging.warning(f"센서 데이터 값 개수 불일치. 페이로드: {payload}")
-                    continue
-
-                data_dict = dict(zip(sensor_keys, values))
-                data_dict['Flame'] = int(data_dict['Flame'])
-                data_dict['timestamp'] = datetime.now(timezone.utc)
-                self._check_and_trigger_sensor_alerts(data_dict)
-                new_data.append(data_dict)
-                if self.collections and 'sensors' in self.collections:
-                    self.collections['sensors'].insert_one(data_dict.copy())
-            except (ValueError, IndexError) as e:
-                logging.warning(f"센서 데이터 파싱 오류: {e} - 페이로드: {payload}")
-
-        if new_data:
-            new_df = pd.DataFrame(new_data)
-            new_df['timestamp'] = pd.to_datetime(new_df['timestamp']).dt.tz_convert('UTC')
-            st.session_state.live_df = pd.concat([st.session_state.live_df, new_df], ignore_index=True)
-            if len(st.session_state.live_df) > 1000:
-                st.session_state.live_df = st.session_state.live_df.iloc[-1000:]
-
-    def _check_and_trigger_sensor_alerts(self, data_dict):
-        """센서 데이터를 확인하고 조건에 따라 경고를 발생시킵니다."""
-        def log_alert(message):
-            try:
-                with open(LOG_FILE, "a", encoding="utf-8") as log_file:
-                    log_file.write(f"{datetime.now(timezone.utc).isoformat()} - {message}\n")
-            except Exception as e:
-                logging.error(f"로그 파일 작성 오류: {e}")
-
-        def trigger_ui_alert(message, icon, sound_type):
-            st.toast(message, icon=icon)
-            if st.session_state.sound_enabled:
-                st.session_state.play_sound_trigger = sound_type
-
-        if data_dict.get("Flame") == 0:
-            msg = "🔥 긴급: 불꽃 감지됨! 즉시 확인이 필요합니다!"
-            log_alert(msg)
-            trigger_ui_alert(msg, "🔥", "fire")
-
-        oxygen_val = data_dict.get("Oxygen")
-        if oxygen_val is not None and not (OXYGEN_SAFE_MIN <= oxygen_val <= OXYGEN_SAFE_MAX):
-            msg = f"🟠 산소 농도 경고! 현재 값: {oxygen_val:.1f}%"
-            log_alert(msg)
-
-        no2_val = data_dict.get("NO2")
-        if no2_val is not None:
-            if no2_val >= NO2_DANGER_LIMIT:
-                msg = f"🔴 이산화질소(NO2) 위험! 현재 값: {no2_val:.3f} ppm"
-                log_alert(msg)
-            elif no2_val >= NO2_WARN_LIMIT:
-                msg = f"🟡 이산화질소(NO2) 주의! 현재 값: {no2_val:.3f} ppm"
-                log_alert(msg)
-
-        newly_detected_gases = []
-        gas_sensors = ["CH4", "EtOH", "H2", "NH3", "CO"]
-        for sensor in gas_sensors:
-            new_value = data_dict.get(sensor, 0.0)
-            if new_value > 0 and st.session_state.last_sensor_values.get(sensor, 0.0) == 0:
-                newly_detected_gases.append(f"{sensor}: {new_value:.3f}")
-            st.session_state.last_sensor_values[sensor] = new_value
-
-        if newly_detected_gases:
-            detected_gases_str = ", ".join(newly_detected_gases)
-            msg = f"🟡 가스 감지됨! [{detected_gases_str}]"
-            log_alert(msg)
+            st.session_state.alerts_version += 1
+
+        # 2. 센서 이벤트 알림 처리 (로그 기록은 수신 스레드에서 이미 수행됨)
+        for event in self._read_hub('sensor_events'):
+            if event.get("icon"):
+                st.toast(f"[{event['device']}] {event['message']}", icon=event["icon"])
+                if st.session_state.sound_enabled and event.get("sound"):
+                    st.session_state.play_sound_trigger = event["sound"]
+
+        # 3. 센서 데이터 처리 (세션은 보고 있는 장치의 묶음만 버퍼에 붙이므로 장치 수와 관계없이 버퍼 하나만 유지)
+        live_device = st.session_state.live_device
+        for device, decoded in self._read_hub('sensors'):
+            if device == live_device:
+                st.session_state.live_buffer.extend(decoded.values, decoded.timestamps_ns)
+
+    @st.fragment(run_every=REFRESH_INTERVALS["events"])
+    @timed_fragment("live_updates")
+    def _render_live_updates(self):
+        """허브의 새 메시지를 세션 상태에 반영하고 알림과 알림음을 처리합니다. 새 메시지가 없으면 할 일이 없습니다."""
+        self.sessions[st.session_state.session_id] = time.monotonic()
+        self._process_queues()
+        self._handle_audio_playback()
 
     def _render_header_and_nav(self):
         """페이지 상단의 제목과 네비게이션 버튼을 렌더링합니다."""
@@ -308,6 +609,7 @@ class UnifiedDashboard:
         pages = {
             'main': '🏠 안전 모니터링',
             'sensor_dashboard': '📈 실시간 센서',
+            'sensor_history': '🗂️ 센서 기록 조회',
             'sensor_log': '📜 센서 로그',
             'crack_monitor': '🛣️ 도로 균열 감지',
             'hivis_monitor': '🦺 안전 조끼 감지'
@@ -332,7 +634,7 @@ class UnifiedDashboard:
             if st.session_state.page == 'crack_monitor':
                 st.subheader("도로 균열 필터")
                 st.session_state.crack_limit = st.slider(
-                    "표시할 최근 항목 수", 1, 100, st.session_state.get('crack_limit', 10)
+                    "페이지당 항목 수", 1, 100, st.session_state.get('crack_limit', 10)
                 )
                 if st.button("새로고침 🔄"):
                     st.rerun()
@@ -341,7 +643,7 @@ class UnifiedDashboard:
             elif st.session_state.page == 'hivis_monitor':
                 st.subheader("안전 조끼 필터")
                 st.session_state.hivis_limit = st.slider(
-                    "표시할 최근 항목 수", 1, 100, st.session_state.get('hivis_limit', 10)
+                    "페이지당 항목 수", 1, 100, st.session_state.get('hivis_limit', 10)
                 )
                 if st.button("새로고침 🔄"):
                     st.rerun()
@@ -363,17 +665,140 @@ class UnifiedDashboard:
             else:
                 st.warning("알림음 비활성화 상태")
 
+            if self.writers:
+                st.divider()
+                with st.expander("🗄️ DB 기록 상태"):
+                    for name, writer in self.writers.items():
+                        stats = writer.get_stats()
+                        st.caption(
+                            f"**{name}** | 대기 {stats['buffered']}건 | 기록 {stats['written']}건 | "
+                            f"버림 {stats['dropped']}건 | 배치당 {stats['avg_batch_size']:.1f}건 | "
+                            f"flush 평균 {stats['avg_flush_ms']:.1f}ms (최대 {stats['max_flush_ms']:.1f}ms)"
+                        )
+
+            with st.expander("🔌 연결 상태"):
+                for name, status in self.supervisor.get_status().items():
+                    if status["alive"] is None:
+                        st.caption(f"⚪ **{name}** | 확인 중")
+                    elif status["alive"]:
+                        st.caption(f"🟢 **{name}** | 재연결 {status['reconnects']}회")
+                    else:
+                        retry = f", {status['retry_in']:.0f}초 후 재시도" if status["retry_in"] is not None else ""
+                        st.caption(f"🔴 **{name}** | 실패 {status['failures']}회{retry} | {status['last_error'] or '연결 끊김'}")
+
+                for name, watcher in self.watchers.items():
+                    status = watcher.get_status()
+                    mode = {"stream": "🟢 변경 스트림", "polling": "🟡 주기 조회"}.get(status["mode"], "⚪ 시작 중")
+                    error = f" | {status['last_error']}" if status["failures"] else ""
+                    st.caption(f"{mode} **watch-{name}** | 목록 {status['size']}건 | 반영 {status['changes']}건 | "
+                               f"재조회 {status['reloads']}회{error}")
+            with st.expander("📥 수신 큐 상태"):
+                for name, stats in self.ingestion.get_stats().items():
+                    st.caption(
+                        f"**{name}** | 대기 {stats['depth']}/{stats['maxsize']}건 (최고 {stats['high_water']}건) | "
+                        f"수신 {stats['received']}건 | 처리 {stats['processed']}건 | 버림 {stats['dropped']}건"
+                    )
+
+            with st.expander("⏺️ 트래픽 캡처 / 재생"):
+                self._render_capture_controls()
+
+            if st.session_state.page in ('crack_monitor', 'hivis_monitor'):
+                with st.expander("🖼️ 이미지 캐시 상태"):
+                    stats = self.image_cache.get_stats()
+                    st.caption(
+                        f"적중률 {stats['hit_ratio']:.1%} (적중 {stats['hits']} / 실패 {stats['misses']}) | "
+                        f"{stats['entries']}개, {stats['bytes'] / 2**20:.1f}/{stats['max_bytes'] / 2**20:.0f}MB | "
+                        f"내보냄 {stats['evictions']}개 ({stats['evicted_bytes'] / 2**20:.1f}MB)"
+                    )
+
+    def _render_capture_controls(self):
+        """캡처 상태와, 캡처 파일을 수신 경로로 다시 흘려보내는 재생 컨트롤을 렌더링합니다."""
+        if self.capture is not None:
+            stats = self.capture.get_stats()
+            st.caption(f"기록 중: {os.path.basename(stats['path'] or '-')} · {stats['records']}건 · {stats['bytes'] / 2**20:.1f}MB")
+        else:
+            st.caption("캡처가 꺼져 있습니다.")
+
+        status = self.replayer.get_status()
+        if status["running"]:
+            position = status["position"].astimezone(timezone(timedelta(hours=9))).strftime('%m-%d %H:%M:%S') if status["position"] else "-"
+            st.caption(f"▶ 재생 중: {os.path.basename(status['path'])} · {status['sent']}/{status['total']}건 · 원본 시각 {position}")
+            if st.button("⏹️ 재생 중지", key="capture_replay_stop"):
+                self.replayer.stop()
+            return
+        if status["path"]:
+            st.caption(f"마지막 재생: {os.path.basename(status['path'])} · {status['sent']}/{status['total']}건"
+                       + (f" · 오류: {status['error']}" if status["error"] else ""))
+
+        if 'last' in self.replay_runs:
+            self._render_replay_summary(self.replay_runs['last'].summary())
+
+        captures = list_captures(MQTT_CAPTURE_DIR)
+        if not captures:
+            return
+        path = st.selectbox("캡처 파일", captures[::-1], format_func=os.path.basename, key="capture_replay_path")
+        speed_label = st.radio("재생 속도", list(CAPTURE_REPLAY_SPEEDS), horizontal=True, key="capture_replay_speed")
+        save = st.toggle(f"결과를 {CAPTURE_REPLAY_DB_NAME} 에 저장", key="capture_replay_save")
+        st.caption("재생은 운영 경로와 분리된 경로에서 처리되어 실시간 화면/알림과 운영 DB 에는 반영되지 않습니다.")
+        if st.button("▶️ 재생", key="capture_replay_start"):
+            if self._start_capture_replay(path, CAPTURE_REPLAY_SPEEDS[speed_label], save):
+                st.toast(f"캡처 재생 시작: {self.replayer.get_status()['total']}건", icon="▶️")
+
+    def _start_capture_replay(self, path, speed, save):
+        """캡처 파일을 새 ReplayPipeline 으로 재생합니다. save 면 CAPTURE_REPLAY_DB_NAME 의 같은 이름 컬렉션에 저장합니다."""
+        writers = {}
+        if save and self.collections:
+            db = self.collections['alerts'].database.client[CAPTURE_REPLAY_DB_NAME]
+            writers = {
+                'alerts': BatchedMongoWriter(db[ALERTS_COLLECTION_NAME], name="replay-alerts", **ALERTS_WRITER_CONFIG).start(),
+                'sensors': BatchedMongoWriter(db[SENSORS_COLLECTION_NAME], name="replay-sensors", **SENSORS_WRITER_CONFIG).start(),
+            }
+        pipeline = ReplayPipeline(writers)
+        if not self.replayer.start(path, speed=speed, publish=pipeline.dispatch, on_done=pipeline.finish):
+            pipeline.finish()
+            return False
+        self.replay_runs['last'] = pipeline
+        return True
+
+    def _render_replay_summary(self, summary):
+        """재생 경로가 만든 결과(센서 샘플, 규칙 이벤트, 경보 사건)를 요약해 보여줍니다."""
+        events = ", ".join(f"{level} {n}건" for level, n in sorted(summary["events"].items())) or "없음"
+        saved = f" | 저장 {sum(summary['saved'].values())}건" if summary["saved"] else " | 저장 안 함"
+        st.caption(f"재생 결과: 센서 {summary['samples']:,}건 ({len(summary['devices'])}개 장치) | "
+                   f"규칙 이벤트 {events} | 경보 사건 {summary['incidents']}건{saved}")
+        if summary["recent_events"]:
+            st.dataframe(pd.DataFrame([
+                {"시간": event["timestamp"], "장치": event["device"], "내용": event["message"]}
+                for event in summary["recent_events"][-20:][::-1]
+            ]), hide_index=True, width='stretch')
+
     def _render_main_page(self):
         """메인 대시보드 페이지(안전 모니터링)를 렌더링합니다."""
         st.header("항만시설 현장 안전 모니터링")
         if not st.session_state.latest_alerts and self.collections:
             try:
-                query = {"type": {"$ne": "normal"}}
-                alerts = list(self.collections['alerts'].find(query).sort("timestamp", pymongo.DESCENDING).limit(5))
+                # 감시 스레드가 유지하는 최신 경보 목록이 있으면 DB 를 조회하지 않고 그대로 씁니다.
+                watcher = self.watchers.get('alerts')
+                if watcher is not None and watcher.view.ready:
+                    alerts = [dict(alert) for alert in watcher.view.items(5)[0]]
+                else:
+                    query = {"type": {"$ne": "normal"}}
+                    alerts = list(self.collections['alerts'].find(query).sort("timestamp", pymongo.DESCENDING).limit(5))
                 st.session_state.latest_alerts = alerts
+                st.session_state.alerts_version += 1
             except Exception as e:
                 st.error(f"초기 경보 데이터 로드 실패: {e}")
 
+        self._render_status_panel()
+        self._render_fleet_status()
+        st.divider()
+        st.subheader("🚨 최근 경보 내역")
+        self._render_alert_table()
+
+    @st.fragment(run_every=REFRESH_INTERVALS["status"])
+    @timed_fragment("status_panel")
+    def _render_status_panel(self):
+        """시스템 현재 상태와 MQTT 연결 상태를 렌더링합니다."""
         col1, col2 = st.columns([3, 1])
         with col1:
             st.subheader("📡 시스템 현재 상태")
@@ -383,65 +808,118 @@ class UnifiedDashboard:
         with col2:
             st.subheader("MQTT 연결 상태")
             client = self.clients.get('alerts')
+            status = self.supervisor.get_status().get('mqtt-alerts')
             if client and client.is_connected():
                 st.success("🟢 실시간 수신 중")
+            elif status and status["retry_in"] is not None:
+                st.error(f"🔴 연결 끊김 · 재연결 {status['failures']}회 시도, {status['retry_in']:.0f}초 후 재시도")
             else:
                 st.error("🔴 연결 끊김")
 
-        st.divider()
-        st.subheader("🚨 최근 경보 내역")
+    @st.fragment(run_every=REFRESH_INTERVALS["status"])
+    @timed_fragment("fleet_status")
+    def _render_fleet_status(self):
+        """장치별 마지막 수신 시각과 메시지 수를 렌더링합니다. 공용 장치 목록만 읽으므로 수신량과 관계없습니다."""
+        snapshot = self.registry.snapshot()
+        if not snapshot:
+            return
+        now = datetime.now(timezone.utc)
+        rows = [{
+            "장치": entry["device"],
+            "마지막 수신 (KST)": (entry["last_seen"] + timedelta(hours=9)).strftime("%H:%M:%S"),
+            "경과(초)": int((now - entry["last_seen"]).total_seconds()),
+            "경보": entry["counts"].get("alerts", 0),
+            "센서": entry["counts"].get("sensors", 0),
+        } for entry in snapshot]
+        with st.expander(f"🤖 장치 상태 ({len(rows)}대)"):
+            st.dataframe(pd.DataFrame(rows), width='stretch', hide_index=True)
+
+    @st.fragment(run_every=REFRESH_INTERVALS["alerts"])
+    @timed_fragment("alert_table")
+    def _render_alert_table(self):
+        """최근 경보 내역 표를 렌더링합니다. 새 경보가 없으면 이전에 만든 표를 그대로 사용합니다."""
         if not st.session_state.latest_alerts:
             st.info("수신된 경보가 없습니다.")
+            return
+
+        cached = st.session_state.get('alert_table')
+        if cached is None or cached[0] != st.session_state.alerts_version:
+            cached = (st.session_state.alerts_version, self._build_alert_table())
+            st.session_state.alert_table = cached
+        if cached[1] is not None:
+            st.dataframe(cached[1], width='stretch', hide_index=True)
         else:
-            df = pd.DataFrame(st.session_state.latest_alerts)
-            df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize('UTC').dt.tz_convert('Asia/Seoul')
-            
-            display_df = df.rename(columns={"timestamp": "발생 시각", "type": "유형", "message": "메시지"})
-            
-            desired_columns = ['발생 시각', '유형', '메시지']
-            
-            columns_to_display = [col for col in desired_columns if col in display_df.columns]
-
-            if columns_to_display:
-                st.dataframe(
-                    display_df[columns_to_display].sort_values(by="발생 시각", ascending=False),
-                    width='stretch',
-                    hide_index=True
-                )
-            else:
-                st.warning("경보 데이터는 있으나 표시할 내용이 없습니다.")
+            st.warning("경보 데이터는 있으나 표시할 내용이 없습니다.")
+
+    def _build_alert_table(self):
+        """경보 목록으로 표시용 DataFrame 을 만듭니다. 표시할 열이 없으면 None 입니다."""
+        df = pd.DataFrame(st.session_state.latest_alerts)
+        df['timestamp'] = pd.to_datetime(df['timestamp']).dt.tz_localize('UTC').dt.tz_convert('Asia/Seoul')
+        # 묶인 사건은 반복 횟수와 마지막 경보 시각을 함께 보여줍니다. (이전 문서는 1회로 표시)
+        if 'count' in df.columns:
+            df['count'] = df['count'].fillna(1).astype(int)
+        if 'last_timestamp' in df.columns:
+            df['last_timestamp'] = pd.to_datetime(df['last_timestamp']).dt.tz_localize('UTC').dt.tz_convert('Asia/Seoul')
+        
+        display_df = df.rename(columns={"timestamp": "발생 시각", "source_device": "장치", "type": "유형", "message": "메시지",
+                                        "count": "횟수", "last_timestamp": "마지막 시각"})
+        
+        desired_columns = ['발생 시각', '장치', '유형', '메시지', '횟수', '마지막 시각']
+        
+        columns_to_display = [col for col in desired_columns if col in display_df.columns]
+
+        if not columns_to_display:
+            return None
+        return display_df[columns_to_display].sort_values(by="발생 시각", ascending=False)
 
     def _render_sensor_dashboard(self):
         """실시간 센서 모니터링 페이지를 렌더링합니다."""
         st.header("실시간 센서 모니터링")
 
+        devices = self.registry.devices('sensors')
+        if SENSORS_DEVICE_ID not in devices:
+            devices.insert(0, SENSORS_DEVICE_ID)
+        st.selectbox("장치", devices, key="live_device", on_change=self._on_live_device_change)
+
         if not st.session_state.sensor_data_loaded and self.collections:
             try:
                 with st.spinner("처음 한 번만 과거 센서 데이터를 불러옵니다..."):
-                    records = list(self.collections['sensors'].find().sort("timestamp", -1).limit(1000))
+                    buffer = st.session_state.live_buffer
+                    device = st.session_state.live_device
+                    # 이전 토픽으로 저장된 문서에는 장치 ID 가 없으므로 기본 장치는 필드가 없는 문서도 포함합니다.
+                    query = {"source_device": {"$in": [device, None]} if device == SENSORS_DEVICE_ID else device}
+                    records = list(self.collections['sensors'].find(query).sort("timestamp", -1).limit(buffer.capacity))
                     if records:
-                        temp_df = pd.DataFrame(reversed(records))
-                        temp_df['timestamp'] = pd.to_datetime(temp_df['timestamp'])
-                        if temp_df['timestamp'].dt.tz is None:
-                            temp_df['timestamp'] = temp_df['timestamp'].dt.tz_localize('UTC')
-                        else:
-                            temp_df['timestamp'] = temp_df['timestamp'].dt.tz_convert('UTC')
-                        st.session_state.live_df = temp_df
-                
+                        buffer.clear()
+                        buffer.extend_records(records[::-1])
+
                 st.session_state.sensor_data_loaded = True
                 st.rerun()
             except Exception as e:
                 st.error(f"초기 센서 데이터 로드 실패: {e}")
-        
-        df = st.session_state.live_df
+
+        self._render_sensor_panel()
+
+    def _on_live_device_change(self):
+        """보는 장치가 바뀌면 실시간 버퍼를 비우고 다음 실행에서 그 장치의 과거 데이터를 다시 불러옵니다."""
+        st.session_state.live_buffer.clear()
+        st.session_state.sensor_data_loaded = False
+        st.session_state.pop('trend_figure', None)
+
+    @st.fragment(run_every=REFRESH_INTERVALS["sensors"])
+    @timed_fragment("sensor_panel")
+    def _render_sensor_panel(self):
+        """센서 수신 상태, 현재 값, 추세 그래프를 렌더링합니다. 그래프는 새 샘플이 있을 때만 다시 만듭니다."""
+        buffer = st.session_state.live_buffer
+        latest_data = buffer.latest()
 
         st.subheader("📡 실시간 수신 상태")
         status_cols = st.columns(3)
         now_kst = datetime.now(timezone.utc) + timedelta(hours=9)
         status_cols[0].metric("현재 시간 (KST)", now_kst.strftime("%H:%M:%S"))
 
-        if not df.empty and 'timestamp' in df.columns:
-            last_reception_utc = pd.to_datetime(df['timestamp'].iloc[-1])
+        if latest_data is not None:
+            last_reception_utc = latest_data['timestamp']
             time_diff = datetime.now(timezone.utc) - last_reception_utc
             status_cols[1].metric("마지막 수신 (KST)", (last_reception_utc + timedelta(hours=9)).strftime("%H:%M:%S"))
             if time_diff.total_seconds() < 10:
@@ -453,28 +931,24 @@ class UnifiedDashboard:
             status_cols[2].info("수신 대기 중...")
 
         st.subheader("🚨 종합 현재 상태")
-        if not df.empty:
-            latest_data = df.iloc[-1]
-            flame_detected = latest_data.get("Flame") == 0
-            oxygen_unsafe = not (OXYGEN_SAFE_MIN <= latest_data.get("Oxygen", 20.9) <= OXYGEN_SAFE_MAX)
-            no2_dangerous = latest_data.get("NO2", 0) >= NO2_DANGER_LIMIT
-            no2_warning = latest_data.get("NO2", 0) >= NO2_WARN_LIMIT
-            conditions = [flame_detected, oxygen_unsafe, no2_dangerous, no2_warning]
-
-            if flame_detected: st.error("🔥 불꽃 감지됨!", icon="🔥")
-            if oxygen_unsafe: st.warning(f"🟠 산소 농도 경고! 현재 {latest_data.get('Oxygen', 0):.1f}%", icon="⚠️")
-            if no2_dangerous: st.error(f"🔴 이산화질소(NO2) 농도 위험! 현재 {latest_data.get('NO2', 0):.3f} ppm", icon="☣️")
-            elif no2_warning: st.warning(f"🟡 이산화질소(NO2) 농도 주의! 현재 {latest_data.get('NO2', 0):.3f} ppm", icon="⚠️")
-
-            if not any(conditions):
+        if latest_data is not None:
+            # 수신 스레드의 규칙 엔진이 판정한 현재 단계를 그대로 보여줍니다.
+            rule_engine = self.rule_engines.get(st.session_state.live_device)
+            active = [item for item in rule_engine.current() if item["level"] != "normal"] if rule_engine else []
+            for item in active:
+                if item["level"] == "danger":
+                    st.error(item["message"], icon=item["icon"] or "☣️")
+                else:
+                    st.warning(item["message"], icon="⚠️")
+
+            if not active:
                 st.success("✅ 안정 범위 내에 있습니다.", icon="👍")
         else:
             st.info("데이터 수신 대기 중...")
 
-        if not df.empty:
+        if latest_data is not None:
             st.subheader("📊 현재 센서 값")
-            latest_data = df.iloc[-1]
-            sensors = ["CH4", "EtOH", "H2", "NH3", "CO", "NO2", "Oxygen", "Distance", "Flame"]
+            sensors = SENSOR_KEYS
             metric_cols = st.columns(5)
             for i, sensor in enumerate(sensors):
                 with metric_cols[i % 5]:
@@ -487,198 +961,318 @@ class UnifiedDashboard:
 
             st.divider()
             st.subheader("📈 센서별 실시간 변화 추세")
-            if 'timestamp' in df.columns:
-                sensors_for_graph = ["CH4", "EtOH", "H2", "NH3", "CO", "NO2", "Oxygen", "Distance"]
-                config = {'responsive': True, 'displayModeBar': False}
-                for i in range(0, len(sensors_for_graph), 2):
-                    graph_cols = st.columns(2)
-                    for j, sensor_name in enumerate(sensors_for_graph[i:i+2]):
-                        if sensor_name in df.columns:
-                            with graph_cols[j]:
-                                fig = px.line(df, x="timestamp", y=sensor_name, title=f"{sensor_name} 변화 추세")
-                                fig.update_layout(
-                                    margin=dict(l=20, r=20, t=40, b=20),
-                                    xaxis_title="시간",
-                                    yaxis_title="값"
-                                )
-                                st.plotly_chart(fig, use_container_width=True, config=config)
+            span_label = st.radio("조회 구간", list(SENSOR_TREND_SPANS), horizontal=True, key="sensor_trend_span")
+            sensors_for_graph = ["CH4", "EtOH", "H2", "NH3", "CO", "NO2", "Oxygen", "Distance"]
+            if SENSOR_TREND_SPANS[span_label] is None:
+                # 링 버퍼의 view 를 그대로 사용하고, 새 샘플이 들어왔을 때만 그림을 다시 만듭니다.
+                figure_key = ("live", st.session_state.live_device, buffer.version)
+                timestamps = buffer.timestamps()
+                series = {name: buffer.column(name) for name in sensors_for_graph}
+            else:
+                try:
+                    df, resolution = load_sensor_trend(span_label, st.session_state.live_device)
+                    if resolution:
+                        st.caption(f"해상도: {'원본' if resolution == 'raw' else resolution + ' 평균'} · {len(df)}개 지점")
+                except Exception as e:
+                    st.error(f"센서 추세 조회 실패: {e}")
+                    df = pd.DataFrame()
+                figure_key = (span_label, st.session_state.live_device, len(df), df['timestamp'].iloc[-1] if len(df) else None)
+                timestamps = pd.DatetimeIndex(df['timestamp']).asi8 if len(df) else []
+                series = {name: df[name].to_numpy(dtype=float) for name in sensors_for_graph if name in df.columns}
+
+            if len(timestamps) and series:
+                cached = st.session_state.get('trend_figure')
+                if cached is None or cached[0] != figure_key:
+                    fig = build_trend_figure(timestamps, series, max_points=TREND_MAX_POINTS, method=TREND_DOWNSAMPLE_METHOD)
+                    cached = (figure_key, fig)
+                    st.session_state.trend_figure = cached
+                st.plotly_chart(cached[1], use_container_width=True, config={'responsive': True, 'displayModeBar': False})
+
+    def _render_sensor_history_page(self):
+        """기간을 골라 센서 기록을 집계 간격별 평균/최소/최대로 조회하는 페이지를 렌더링합니다."""
+        st.header("센서 기록 조회")
+        st.write("선택한 기간의 센서 값을 서버에서 간격별 평균/최소/최대로 집계해 보여줍니다.")
+        if not self.collections:
+            st.error("MongoDB에 연결되어 있지 않아 기록을 조회할 수 없습니다.")
+            return
+
+        kst = timezone(timedelta(hours=9))
+        devices = self.registry.devices('sensors')
+        if SENSORS_DEVICE_ID not in devices:
+            devices.insert(0, SENSORS_DEVICE_ID)
+        interval_options = ["자동", *[interval_label(seconds) for seconds in HISTORY_INTERVALS]]
+
+        # 조건을 바꿀 때마다 조회하지 않도록 폼으로 묶고, '조회' 를 눌렀을 때만 조건을 세션에 저장합니다.
+        with st.form("sensor_history_form"):
+            cols = st.columns([1, 2, 3, 1])
+            device = cols[0].selectbox("장치", devices)
+            today = datetime.now(kst).date()
+            date_range = cols[1].date_input("기간 (KST)", (today - timedelta(days=7), today),
+                                            max_value=today)
+            channels = cols[2].multiselect("채널", SENSOR_KEYS, default=["NO2"])
+            interval_choice = cols[3].selectbox("집계 간격", interval_options)
+            submitted = st.form_submit_button("🔍 조회", width='stretch')
+
+        if submitted:
+            if len(date_range) != 2:
+                st.info("시작일과 종료일을 선택해주세요.")
+                return
+            if not channels:
+                st.info("조회할 채널을 하나 이상 선택해주세요.")
+                return
+            if (date_range[1] - date_range[0]).days >= SENSOR_HISTORY_MAX_DAYS:
+                st.warning(f"한 번에 최대 {SENSOR_HISTORY_MAX_DAYS}일까지 조회할 수 있습니다.")
+                return
+            start = datetime.combine(date_range[0], datetime.min.time(), kst).astimezone(timezone.utc)
+            end = min(datetime.combine(date_range[1] + timedelta(days=1), datetime.min.time(), kst).astimezone(timezone.utc),
+                      datetime.now(timezone.utc))
+            interval = None
+            if interval_choice != "자동":
+                interval = HISTORY_INTERVALS[interval_options.index(interval_choice) - 1]
+                if (end - start).total_seconds() / interval > SENSOR_HISTORY_MAX_POINTS:
+                    interval = choose_interval(end - start, max_points=SENSOR_HISTORY_MAX_POINTS)
+                    st.warning(f"선택한 간격은 지점이 너무 많아 {interval_label(interval)} 간격으로 조회합니다.")
+            st.session_state.sensor_history_query = (start, end, interval, device, tuple(channels))
+
+        query = st.session_state.get('sensor_history_query')
+        if query is None:
+            st.info("기간과 채널을 고른 뒤 '조회' 를 눌러주세요.")
+            return
+
+        try:
+            with st.spinner("서버에서 기록을 집계하는 중입니다..."):
+                df, info = load_sensor_history(*query)
+        except Exception as e:
+            st.error(f"센서 기록 조회 실패: {e}")
+            return
+        if info is None or df.empty:
+            st.info("선택한 기간에 기록된 센서 데이터가 없습니다.")
+            return
+
+        start, end, _, device, channels = query
+        sources = ["롤업" if name != SENSORS_COLLECTION_NAME else "원본" for name in info["sources"]]
+        st.caption(
+            f"{device} · {start.astimezone(kst):%Y-%m-%d %H:%M} ~ {end.astimezone(kst):%Y-%m-%d %H:%M} (KST) · "
+            f"{interval_label(info['interval'])} 간격 · {info['buckets']}개 지점 · 원본 {info['samples']:,}건 · "
+            f"출처: {' + '.join(sources)} · {info['elapsed']:.2f}초"
+        )
+        st.plotly_chart(build_range_figure(df, list(channels)), use_container_width=True,
+                        config={'responsive': True, 'displayModeBar': False})
+
+        table = df.copy()
+        table["timestamp"] = table["timestamp"].dt.tz_convert(kst).dt.strftime('%Y-%m-%d %H:%M:%S')
+        table = table.rename(columns={"timestamp": "시각 (KST)", "count": "건수"})
+        with st.expander("📋 집계 표"):
+            st.dataframe(table, width='stretch', hide_index=True)
+        st.download_button(
+            label="📥 집계 결과 CSV 다운로드",
+            data=table.to_csv(index=False).encode("utf-8-sig"),
+            file_name=f"sensor_history_{device}_{start.astimezone(kst):%Y%m%d}_{end.astimezone(kst):%Y%m%d}.csv",
+            mime="text/csv",
+            width='stretch',
+        )
 
     def _render_sensor_log_page(self):
-        """센서 이벤트 로그 페이지를 렌더링합니다."""
+        """센서 이벤트 로그 페이지를 렌더링합니다. 최신 N건 또는 지정한 기간만 로그 끝에서부터 읽습니다."""
         st.header("센서 이벤트 로그")
         st.write("불꽃, 위험 가스 농도 등 주요 이벤트가 감지될 때의 기록입니다.")
-        if os.path.exists(LOG_FILE):
-            try:
-                with open(LOG_FILE, "r", encoding="utf-8") as f:
-                    log_lines = f.readlines()
-                if log_lines:
-                    log_entries = []
-                    for line in reversed(log_lines):
-                        if " - " in line:
-                            parts = line.split(" - ", 1)
-                            try:
-                                utc_dt = datetime.fromisoformat(parts[0])
-                                kst_dt = utc_dt.astimezone(timezone(timedelta(hours=9)))
-                                log_entries.append({
-                                    "감지 시간 (KST)": kst_dt.strftime('%Y-%m-%d %H:%M:%S'),
-                                    "메시지": parts[1].strip()
-                                })
-                            except ValueError:
-                                log_entries.append({"감지 시간 (KST)": parts[0], "메시지": parts[1].strip()})
-                    log_df = pd.DataFrame(log_entries)
-                    st.dataframe(log_df, width='stretch', hide_index=True)
-
-                    csv_data = log_df.to_csv(index=False).encode('utf-8-sig')
-                    st.download_button(
-                        label="📥 로그 CSV 다운로드",
-                        data=csv_data,
-                        file_name=f"sensor_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv",
-                        width='stretch'
-                    )
-                    st.divider()
-                    if st.button("🚨 로그 전체 삭제", type="primary"):
-                        os.remove(LOG_FILE)
-                        st.success("✅ 모든 로그 기록이 삭제되었습니다.")
-                        st.rerun()
-                else:
-                    st.info("👀 로그 파일이 비어있습니다.")
-            except Exception as e:
-                st.error(f"로그 파일을 읽는 중 오류가 발생했습니다: {e}")
+        if self.event_log.is_empty():
+            st.info("👍 아직 감지된 이벤트가 없습니다.")
+            return
+
+        kst = timezone(timedelta(hours=9))
+        mode = st.radio("조회 방식", ["최근 기록", "기간 조회"], horizontal=True, key="sensor_log_mode")
+        start = end = None
+        try:
+            if mode == "최근 기록":
+                limit = st.selectbox("표시 건수", EVENT_LOG_PAGE_SIZES, key="sensor_log_limit")
+                entries = self.event_log.tail(limit)
+            else:
+                today = datetime.now(kst).date()
+                date_range = st.date_input("기간 (KST)", (today - timedelta(days=1), today), key="sensor_log_range")
+                if len(date_range) != 2:
+                    st.info("시작일과 종료일을 선택해주세요.")
+                    return
+                start = datetime.combine(date_range[0], datetime.min.time(), kst)
+                end = datetime.combine(date_range[1], datetime.max.time(), kst)
+                entries = self.event_log.read_range(start, end, limit=EVENT_LOG_PAGE_SIZES[-1])
+        except Exception as e:
+            st.error(f"로그를 읽는 중 오류가 발생했습니다: {e}")
+            return
+
+        if entries:
+            log_df = pd.DataFrame({
+                "감지 시간 (KST)": [e["ts"].astimezone(kst).strftime('%Y-%m-%d %H:%M:%S') for e in entries],
+                "장치": [e.get("device", SENSORS_DEVICE_ID) for e in entries],
+                "메시지": [e["message"] for e in entries],
+            })
+            st.dataframe(log_df, width='stretch', hide_index=True)
         else:
-            st.info("👍 아직 감지된 이벤트가 없어 로그 파일이 생성되지 않았습니다.")
+            st.info("선택한 기간에 기록된 이벤트가 없습니다.")
+
+        stats = self.event_log.get_stats()
+        st.caption(f"전체 {stats['entries']}건 · 세그먼트 {stats['segments']}개 · {stats['bytes'] / 2**20:.1f}MB")
+
+        # CSV 는 버튼을 눌렀을 때만 세그먼트를 차례로 읽어 임시 파일에 이어 씁니다.
+        if st.button("📦 CSV 내보내기 준비", width='stretch'):
+            with st.spinner("CSV 파일을 만드는 중입니다..."):
+                with tempfile.TemporaryFile() as f:
+                    self.event_log.export_csv(f, start, end, fields=("ts", "device", "message"))
+                    f.seek(0)
+                    st.session_state.sensor_log_csv = f.read()
+        if st.session_state.get('sensor_log_csv') is not None:
+            st.download_button(
+                label="📥 로그 CSV 다운로드",
+                data=st.session_state.sensor_log_csv,
+                file_name=f"sensor_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                mime="text/csv",
+                width='stretch',
+                on_click=lambda: st.session_state.pop('sensor_log_csv', None)
+            )
+        st.divider()
+        if st.button("🚨 로그 전체 삭제", type="primary"):
+            self.event_log.clear()
+            st.success("✅ 모든 로그 기록이 삭제되었습니다.")
+            st.rerun()
+
+    @st.fragment(run_every=REFRESH_INTERVALS["detections"])
+    @timed_fragment("detection_feed")
+    def _render_detection_feed(self, feed, header, device_label, count_label, empty_message, data_name):
+        """감지 목록을 (timestamp, _id) 키셋 페이지 단위로 렌더링합니다.
+
+        목록에는 시간/장치/감지 수만 조회하고, 이미지와 감지 상세는 항목을 펼쳤을 때만 불러옵니다.
+        첫 페이지는 감시 스레드가 유지하는 최신 목록에서 읽으므로 새로고침해도 DB 를 조회하지 않습니다.
+        목록이 아직 없으면 최신 문서 키만 확인해, 새 감지가 없을 때는 이전에 읽은 페이지를 다시 씁니다.
+        """
+        limit = st.session_state.get(f'{feed}_limit', 10)
+        # 페이지 시작 커서 스택 (마지막 항목이 현재 페이지, None 은 최신 페이지)
+        pages = st.session_state.setdefault(f'{feed}_pages', [None])
+        st.header(f"{header} (페이지 {len(pages)}, 페이지당 {limit}개)")
+
+        if not (self.collections and feed in self.collections):
+            st.warning(f"데이터베이스에 연결할 수 없어 {data_name} 데이터를 표시할 수 없습니다.")
+            return
+
+        try:
+            collection = self.collections[feed]
+            watcher = self.watchers.get(feed)
+            page = view_page(watcher.view, limit) if watcher is not None and pages[-1] is None else None
+            if page is not None:
+                items, next_cursor, _ = page
+            else:
+                # 이전 페이지들은 키셋 구간이 고정되어 있으므로 최신 페이지일 때만 새 문서를 확인합니다.
+                head = fetch_head(collection) if pages[-1] is None else None
+                page_key = (limit, pages[-1], head)
+                cached = st.session_state.get(f'{feed}_page_cache')
+                if cached is None or cached[0] != page_key:
+                    cached = (page_key, fetch_page(collection, limit, pages[-1]))
+                    st.session_state[f'{feed}_page_cache'] = cached
+                items, next_cursor = cached[1]
+            if not items:
+                st.info("감지 기록이 없습니다.")
+            for item in items:
+                timestamp_local = item['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+                device_name = item.get('source_device', 'N/A')
+                num_detections = item.get('detection_count', 0)
+                label = f"**감지 시간:** {timestamp_local} | **{device_label}:** {device_name} | **{count_label}:** {num_detections}"
+                if st.toggle(label, key=f"{feed}_open_{item['_id']}"):
+                    with st.container(border=True):
+                        try:
+                            self._render_detection_detail(feed, item['_id'], empty_message)
+                        except Exception as e:
+                            st.error(f"감지 상세 정보를 불러오지 못했습니다: {e}")
+        except Exception as e:
+            st.error(f"{data_name} 데이터 로딩 중 오류 발생: {e}")
+            return
+
+        # 페이지 이동은 on_click 콜백에서 커서 스택만 바꾸고, 버튼이 속한 조각(fragment)만 다시 그립니다.
+        nav_cols = st.columns(3)
+        nav_cols[0].button("⏮ 최신", key=f"{feed}_first", disabled=len(pages) == 1, width='stretch',
+                           on_click=pages.__setitem__, args=(slice(None), [None]))
+        nav_cols[1].button("◀ 이전 페이지", key=f"{feed}_prev", disabled=len(pages) == 1, width='stretch',
+                           on_click=pages.pop)
+        nav_cols[2].button("다음 페이지 ▶", key=f"{feed}_next", disabled=next_cursor is None, width='stretch',
+                           on_click=pages.append, args=(next_cursor,))
+
+    def _render_detection_detail(self, feed, doc_id, empty_message):
+        """펼친 감지 항목의 이미지와 상세 감지 정보를 렌더링합니다.
+
+        처음에는 썸네일만 불러오고, 원본 이미지는 '원본 이미지 보기'를 켰을 때만 불러옵니다.
+        """
+        collection = self.collections[feed]
+        full = st.toggle("🔍 원본 이미지 보기", key=f"{feed}_full_{doc_id}")
+        cache_key = (collection.full_name, doc_id, "full" if full else "thumb")
+        img_bytes = self.image_cache.get(cache_key)
+        doc = fetch_detail(collection, doc_id, include_image=img_bytes is None)
+        if img_bytes is None and has_image(doc):
+            img_bytes = self.image_stores[feed].load_image(doc, thumbnail=not full)
+            self.image_cache.put(cache_key, img_bytes)
+
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            if img_bytes:
+                st.image(img_bytes, caption="감지 결과 이미지" if full else "감지 결과 썸네일", width='stretch')
+        with col2:
+            st.subheader("상세 감지 정보")
+            detections = doc.get('detections', [])
+            if not detections:
+                st.info(empty_message)
+            else:
+                for i, d in enumerate(detections):
+                    st.metric(
+                        label=f"#{i+1}: {d.get('class_name', 'N/A')}",
+                        value=f"{d.get('confidence', 0):.2%}"
+                    )
+                    st.code(f"Box: {[int(c) for c in d.get('box_xyxy', [])]}", language="text")
+            st.caption(f"DB ID: {doc_id}")
 
     def _render_crack_monitor_page(self):
         """도로 균열 감지 대시보드 페이지를 렌더링합니다."""
-        limit = st.session_state.get('crack_limit', 10)
-        st.header(f"최근 감지된 균열 목록 (상위 {limit}개)")
-
-        if self.collections and 'crack' in self.collections:
-            collection = self.collections['crack']
-            try:
-                for doc in collection.find({}).sort("timestamp", -1).limit(limit):
-                    timestamp_local = doc['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-                    device_name = doc.get('source_device', 'N/A')
-                    num_detections = len(doc.get('detections', []))
-                    with st.expander(f"**감지 시간:** {timestamp_local} | **장치:** {device_name} | **균열 수:** {num_detections}"):
-                        col1, col2 = st.columns([2, 1])
-                        with col1:
-                            if 'annotated_image_base64' in doc:
-                                img_bytes = base64.b64decode(doc['annotated_image_base64'])
-                                st.image(img_bytes, caption="감지 결과 이미지", width='stretch')
-                        with col2:
-                            st.subheader("상세 감지 정보")
-                            detections = doc.get('detections', [])
-                            if not detections:
-                                st.info("상세 감지 정보가 없습니다.")
-                            else:
-                                for i, d in enumerate(detections):
-                                    st.metric(
-                                        label=f"#{i+1}: {d.get('class_name', 'N/A')}",
-                                        value=f"{d.get('confidence', 0):.2%}"
-                                    )
-                                    st.code(f"Box: {[int(c) for c in d.get('box_xyxy', [])]}", language="text")
-                            st.caption(f"DB ID: {doc.get('_id', 'N/A')}")
-            except Exception as e:
-                st.error(f"도로 균열 데이터 로딩 중 오류 발생: {e}")
-        else:
-            st.warning("데이터베이스에 연결할 수 없어 도로 균열 데이터를 표시할 수 없습니다.")
+        self._render_detection_feed(
+            'crack', "최근 감지된 균열 목록",
+            device_label="장치", count_label="균열 수",
+            empty_message="상세 감지 정보가 없습니다.", data_name="도로 균열"
+        )
 
     def _render_hivis_monitor_page(self):
         """안전 조끼 감지 대시보드 페이지를 렌더링합니다."""
-        limit = st.session_state.get('hivis_limit', 10)
-        st.header(f"최근 감지된 안전 조끼 착용 현황 (상위 {limit}개)")
-
-        if self.collections and 'hivis' in self.collections:
-            collection = self.collections['hivis']
-            try:
-                for doc in collection.find({}).sort("timestamp", -1).limit(limit):
-                    timestamp_local = doc['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-                    device_name = doc.get('source_device', 'N/A')
-                    num_detections = len(doc.get('detections', []))
-                    with st.expander(f"**감지 시간:** {timestamp_local} | **감지 장치:** {device_name} | **감지된 객체 수:** {num_detections}"):
-                        col1, col2 = st.columns([2, 1])
-                        with col1:
-                            img_bytes = base64.b64decode(doc['annotated_image_base64'])
-                            st.image(img_bytes, caption="감지 결과 이미지", width='stretch')
-                        with col2:
-                            st.subheader("상세 감지 정보")
-                            detections = doc.get('detections', [])
-                            if not detections:
-                                st.info("감지된 객체가 없습니다.")
-                            else:
-                                for i, detection in enumerate(detections):
-                                    st.metric(
-                                        label=f"#{i+1}: {detection['class_name']}",
-                                        value=f"{detection['confidence']:.2%}"
-                                    )
-                                    st.code(f"Box: {[int(c) for c in detection['box_xyxy']]}", language="text")
-                            st.caption(f"DB ID: {doc['_id']}")
-            except Exception as e:
-                st.error(f"안전 조끼 데이터 로딩 중 오류 발생: {e}")
-        else:
-            st.warning("데이터베이스에 연결할 수 없어 안전 조끼 데이터를 표시할 수 없습니다.")
+        self._render_detection_feed(
+            'hivis', "최근 감지된 안전 조끼 착용 현황",
+            device_label="감지 장치", count_label="감지된 객체 수",
+            empty_message="감지된 객체가 없습니다.", data_name="안전 조끼"
+        )
 
     def _handle_audio_playback(self):
-        """지정된 경로의 .wav 파일을 Base64로 인코딩하여 재생합니다."""
+        """시작할 때 검증해 둔 경보 음원을 st.audio(미디어 파일 주소)로 재생합니다."""
         if not (trigger := st.session_state.play_sound_trigger):
             return
+        st.session_state.play_sound_trigger = None
 
         if not st.session_state.get('sound_enabled', False):
             st.toast("⚠️ 알림음을 들으려면 사이드바에서 '알림음 활성화'를 켜주세요.")
-            st.session_state.play_sound_trigger = None
             return
 
-        if trigger == 'fire':
-            filename = 'fire_alert.wav'
-        elif trigger == 'safety':
-            filename = 'safety_alert.wav'
-        else:
-            st.session_state.play_sound_trigger = None
-            return
-
-        file_path = os.path.join('app', 'static', filename)
-        
-        if not os.path.exists(file_path):
-            st.error(f"오류: 경고음 파일을 찾을 수 없습니다. ({file_path})")
-            st.session_state.play_sound_trigger = None
-            return
-
-        try:
-            with open(file_path, "rb") as f:
-                audio_bytes = f.read()
-            audio_base64 = base64.b64encode(audio_bytes).decode()
-            
-            st.html(f"""
-                <audio autoplay style="display:none;">
-                    <source src="data:audio/wav;base64,{audio_base64}" type="audio/wav">
-                </audio>
-            """)
-        except Exception as e:
-            st.error(f"음성 파일 재생 중 오류: {e}")
-        
-        finally:
-            st.session_state.play_sound_trigger = None
+        if not self.audio_assets.play(trigger, nonce=time.time_ns()):
+            st.error(f"오류: '{trigger}' 경고음 파일을 찾을 수 없습니다.")
 
     def run(self):
         """Streamlit 앱을 실행합니다."""
+        started = time.perf_counter()
         self._render_header_and_nav()
         self._render_sidebar()
-        self._process_queues()
+        self._render_live_updates()
 
         page_map = {
             'main': self._render_main_page,
             'sensor_dashboard': self._render_sensor_dashboard,
+            'sensor_history': self._render_sensor_history_page,
             'sensor_log': self._render_sensor_log_page,
             'crack_monitor': self._render_crack_monitor_page,
             'hivis_monitor': self._render_hivis_monitor_page
         }
         render_function = page_map.get(st.session_state.page, self._render_main_page)
         render_function()
-
-        self._handle_audio_playback()
-        st_autorefresh(interval=2000, key="refresher")
-        return
+        PAGE_RENDER_SECONDS.labels(st.session_state.page, "full").observe(time.perf_counter() - started)
 
 if __name__ == "__main__":
     if 'app' not in st.session_state:
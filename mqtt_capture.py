@@ -0,0 +1,320 @@
+"""MQTT 원본 트래픽을 추가 전용(append-only) 파일에 기록하고, 같은 속도 또는 빠르게 다시 재생하는 도구입니다.
+
+파일 형식 (리틀 엔디언):
+    헤더   : b"MQCAP\\x01"
+    레코드 : 수신 시각(epoch ns, int64) + 토픽 길이(uint16) + 페이로드 길이(uint32) + 토픽(UTF-8) + 페이로드
+기록 중 프로세스가 죽어 마지막 레코드가 잘려도 그 앞까지는 읽을 수 있습니다.
+
+사용 예:
+    python mqtt_capture.py record --broker 127.0.0.1:1883 --topic 'robot/#' --topic 'multiSensor/#'
+    python mqtt_capture.py info mqtt_captures/capture-20250101T000000000000.mqcap
+    python mqtt_capture.py replay mqtt_captures/capture-20250101T000000000000.mqcap --broker 127.0.0.1:1883 --speed 10
+"""
+import os
+import sys
+import time
+import glob
+import struct
+import atexit
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+
+MAGIC = b"MQCAP\x01"
+RECORD_HEADER = struct.Struct("<qHI")
+FILE_PATTERN = "capture-*.mqcap"
+
+
+class CaptureWriter:
+    """수신한 MQTT 메시지를 캡처 파일에 이어 씁니다.
+
+    콜백 스레드에서 호출해도 되도록 잠금 안에서 버퍼에만 쓰고, flush_interval 초마다 디스크로 내보냅니다.
+    파일은 UTC 날짜가 바뀌거나 max_bytes 를 넘으면 새로 엽니다. 새 파일을 열 때 max_files 개를 넘거나
+    max_age 초보다 오래된 파일은 오래된 것부터 지우므로, 디렉터리는 대략 max_files × max_bytes 를 넘지 않습니다.
+    """
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, flush_interval=1.0, max_files=16, max_age=7 * 86400.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_files = max_files
+        self.max_age = max_age
+        self._file = None
+        self._path = None
+        self._day = None
+        self._size = 0
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"records": 0, "bytes": 0, "files": 0, "pruned": 0}
+        os.makedirs(directory, exist_ok=True)
+        atexit.register(self.close)
+
+    def _open(self, now):
+        if self._file is not None:
+            self._file.close()
+        stamp = datetime.fromtimestamp(now / 1e9, tz=timezone.utc)
+        self._path = os.path.join(self.directory, f"capture-{stamp.strftime('%Y%m%dT%H%M%S%f')}.mqcap")
+        self._file = open(self._path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._size = self._file.tell()
+        self._day = stamp.date()
+        self._stats["files"] += 1
+        logging.info(f"MQTT 캡처 파일 시작: {self._path}")
+        self._prune()
+
+    def _prune(self):
+        # 보관 개수/기간을 넘은 캡처 파일을 오래된 것부터 지웁니다. (지금 쓰는 파일은 제외)
+        paths = [path for path in list_captures(self.directory) if path != self._path]
+        cutoff = time.time() - self.max_age if self.max_age else None
+        excess = len(paths) + 1 - self.max_files if self.max_files else 0
+        for i, path in enumerate(paths):
+            try:
+                if i < excess or (cutoff is not None and os.path.getmtime(path) < cutoff):
+                    os.remove(path)
+                    self._stats["pruned"] += 1
+                    logging.info(f"오래된 MQTT 캡처 파일 삭제: {path}")
+            except OSError as e:
+                logging.warning(f"캡처 파일 삭제 실패: {path}: {e}")
+
+    def record(self, topic, payload, arrival_ns=None):
+        """메시지 한 건을 기록합니다."""
+        arrival_ns = arrival_ns or time.time_ns()
+        topic_bytes = topic.encode("utf-8")
+        frame = RECORD_HEADER.pack(arrival_ns, len(topic_bytes), len(payload)) + topic_bytes + bytes(payload)
+        with self._lock:
+            day = datetime.fromtimestamp(arrival_ns / 1e9, tz=timezone.utc).date()
+            if self._file is None or day != self._day or self._size + len(frame) > self.max_bytes:
+                self._open(arrival_ns)
+            self._file.write(frame)
+            self._size += len(frame)
+            self._stats["records"] += 1
+            self._stats["bytes"] += len(frame)
+            now = time.monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = now
+
+    def close(self):
+        """버퍼를 내보내고 파일을 닫습니다."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_stats(self):
+        """기록한 레코드 수, 바이트 수, 파일 수와 현재 파일 경로를 반환합니다."""
+        with self._lock:
+            return {**self._stats, "path": self._path}
+
+
+def read_capture(path):
+    """캡처 파일의 (수신 시각 ns, 토픽, 페이로드 bytes) 를 차례로 돌려줍니다."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"캡처 파일 형식이 아닙니다: {path}")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            arrival_ns, topic_len, payload_len = RECORD_HEADER.unpack(header)
+            body = f.read(topic_len + payload_len)
+            if len(body) < topic_len + payload_len:
+                logging.warning(f"캡처 파일 끝의 잘린 레코드를 건너뜁니다: {path}")
+                break
+            yield arrival_ns, body[:topic_len].decode("utf-8"), body[topic_len:]
+
+
+def list_captures(directory):
+    """캡처 파일 경로 목록을 오래된 순으로 반환합니다."""
+    return sorted(glob.glob(os.path.join(directory, FILE_PATTERN)))
+
+
+def summarize_capture(path):
+    """캡처 파일의 레코드 수, 시작/끝 시각, 토픽별 건수를 반환합니다."""
+    count, first, last, topics = 0, None, None, {}
+    for arrival_ns, topic, _ in read_capture(path):
+        count += 1
+        first = arrival_ns if first is None else first
+        last = arrival_ns
+        topics[topic] = topics.get(topic, 0) + 1
+    to_dt = lambda ns: datetime.fromtimestamp(ns / 1e9, tz=timezone.utc) if ns is not None else None
+    return {"path": path, "records": count, "start": to_dt(first), "end": to_dt(last), "topics": topics}
+
+
+def replay(records, publish, speed=1.0, stop_event=None, progress=None):
+    """레코드를 원래 간격의 1/speed 로 publish(topic, payload, 원본 수신 시각 ns) 에 넘깁니다. speed 가 None 이면 기다리지 않습니다.
+
+    progress 를 주면 레코드마다 progress(보낸 건수, 원본 시각 ns) 를 호출합니다. 보낸 건수를 반환합니다.
+    """
+    sent = 0
+    origin = started = None
+    for arrival_ns, topic, payload in records:
+        if stop_event is not None and stop_event.is_set():
+            break
+        if speed:
+            if origin is None:
+                origin, started = arrival_ns, time.perf_counter()
+            delay = started + (arrival_ns - origin) / 1e9 / speed - time.perf_counter()
+            if delay > 0:
+                if stop_event is not None:
+                    if stop_event.wait(delay):
+                        break
+                else:
+                    time.sleep(delay)
+        publish(topic, payload, arrival_ns)
+        sent += 1
+        if progress is not None:
+            progress(sent, arrival_ns)
+    return sent
+
+
+class CaptureReplayer:
+    """캡처 파일을 백그라운드 스레드에서 재생하고 진행 상태를 알려줍니다. 한 번에 하나만 재생합니다.
+
+    publish(topic, payload, arrival_ns) 는 생성할 때 또는 재생마다 start() 에 넘깁니다.
+    """
+
+    def __init__(self, publish=None):
+        self.publish = publish
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._status = {"running": False, "path": None, "sent": 0, "total": 0, "speed": None, "position": None, "error": None}
+
+    def start(self, path, speed=1.0, publish=None, on_done=None):
+        """재생을 시작합니다. 이미 재생 중이면 False 를 반환합니다.
+
+        on_done 을 주면 재생이 끝나거나 멈춘 뒤 재생 스레드에서 호출합니다. (남은 처리 마무리 등)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        publish = publish or self.publish
+        total = sum(1 for _ in read_capture(path))
+        self._stop_event.clear()
+        self._status = {"running": True, "path": path, "sent": 0, "total": total, "speed": speed, "position": None, "error": None}
+        self._thread = threading.Thread(target=self._run, args=(path, speed, publish, on_done), name="capture-replay", daemon=True)
+        self._thread.start()
+        logging.info(f"캡처 재생 시작: {path} ({total}건, 속도 {speed or '최대'})")
+        return True
+
+    def stop(self):
+        """재생을 멈춥니다."""
+        self._stop_event.set()
+
+    def _progress(self, sent, arrival_ns):
+        self._status["sent"] = sent
+        self._status["position"] = arrival_ns
+
+    def _run(self, path, speed, publish, on_done):
+        try:
+            replay(read_capture(path), publish, speed=speed, stop_event=self._stop_event, progress=self._progress)
+        except Exception as e:
+            self._status["error"] = str(e)
+            logging.error(f"캡처 재생 실패: {e}", exc_info=True)
+        finally:
+            if on_done is not None:
+                try:
+                    on_done()
+                except Exception as e:
+                    logging.error(f"캡처 재생 마무리 실패: {e}", exc_info=True)
+            self._status["running"] = False
+            logging.info(f"캡처 재생 종료: {self._status['sent']}/{self._status['total']}건")
+
+    def get_status(self):
+        """재생 상태 사본을 반환합니다."""
+        status = dict(self._status)
+        if status["position"] is not None:
+            status["position"] = datetime.fromtimestamp(status["position"] / 1e9, tz=timezone.utc)
+        return status
+
+
+def _parse_speed(value):
+    return None if value in ("max", "0") else float(value)
+
+
+def _connect(args, client_id):
+    import ssl
+    import paho.mqtt.client as mqtt
+    host, _, port = args.broker.partition(":")
+    client = mqtt.Client(client_id=client_id, callback_api_version=mqtt.CallbackAPIVersion.VERSION2)
+    if args.username:
+        client.username_pw_set(args.username, args.password)
+    if args.tls:
+        client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS)
+    client.connect(host, int(port or 1883), 60)
+    return client
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', stream=sys.stdout)
+    parser = argparse.ArgumentParser(description="MQTT 트래픽 캡처/재생 도구")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="브로커를 구독해 캡처 파일에 기록")
+    rec.add_argument("--topic", action="append", help="구독 토픽 (여러 번 지정 가능, 기본값: 경보/센서 토픽)")
+    rec.add_argument("--dir", default="mqtt_captures")
+    rec.add_argument("--qos", type=int, choices=[0, 1], default=1)
+
+    rep = sub.add_parser("replay", help="캡처 파일을 브로커로 다시 발행")
+    rep.add_argument("paths", nargs="+")
+    rep.add_argument("--speed", type=_parse_speed, default=1.0, help="재생 배속 (예: 1, 10, max)")
+    rep.add_argument("--qos", type=int, choices=[0, 1], default=1)
+
+    for p in (rec, rep):
+        p.add_argument("--broker", default="127.0.0.1:1883", help="host:port")
+        p.add_argument("--username", default=os.environ.get("MQTT_USERNAME"))
+        p.add_argument("--password", default=os.environ.get("MQTT_PASSWORD"))
+        p.add_argument("--tls", action="store_true")
+
+    info = sub.add_parser("info", help="캡처 파일 요약")
+    info.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        for path in args.paths:
+            summary = summarize_capture(path)
+            print(f"{path}: {summary['records']}건, {summary['start']} ~ {summary['end']}")
+            for topic, n in sorted(summary["topics"].items()):
+                print(f"    {topic}: {n}건")
+        return 0
+
+    if args.command == "record":
+        writer = CaptureWriter(args.dir)
+        topics = args.topic or ["robot/alerts", "robot/+/alerts", "multiSensor/numeric", "multiSensor/+/numeric"]
+        client = _connect(args, f"capture-{os.getpid()}")
+        client.on_message = lambda c, u, msg: writer.record(msg.topic, msg.payload)
+        client.subscribe([(topic, args.qos) for topic in topics])
+        logging.info(f"캡처 시작: {topics} -> {args.dir} (Ctrl+C 로 종료)")
+        try:
+            client.loop_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            writer.close()
+            logging.info(f"캡처 종료: {writer.get_stats()}")
+        return 0
+
+    client = _connect(args, f"replay-{os.getpid()}")
+    client.loop_start()
+    total, last = 0, []
+
+    def publish(topic, payload, arrival_ns):
+        last[:] = [client.publish(topic, payload, qos=args.qos)]
+
+    for path in args.paths:
+        sent = replay(read_capture(path), publish, speed=args.speed)
+        logging.info(f"{path}: {sent}건 재생")
+        total += sent
+    if last:
+        # 보낸 메시지가 모두 브로커에 전달된 뒤 연결을 닫습니다.
+        last[0].wait_for_publish(timeout=60)
+    client.loop_stop()
+    client.disconnect()
+    logging.info(f"재생 완료: 총 {total}건")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def to_epoch_ns(ts):
+    """datetime(naive 는 UTC 로 간주) 을 UTC 기준 epoch 나노초 정수로 변환합니다."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    delta = ts - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1000
+
+
+class SensorRingBuffer:
+    """센서 채널별 값과 int64 타임스탬프를 담는 고정 용량 열(column) 지향 링 버퍼입니다.
+
+    내부 배열을 용량의 두 배로 잡고 모든 샘플을 i 와 i + capacity 두 위치에 함께 기록합니다.
+    덕분에 현재 창(window)은 항상 연속된 구간이 되어, 순서가 맞춰진 채널 데이터를
+    복사 없이 NumPy view 로 돌려줄 수 있고 추가(append)는 O(1) 입니다.
+    반환된 view 는 다음 추가 시 내용이 바뀔 수 있으므로 렌더링 직후 버려야 합니다.
+    """
+
+    def __init__(self, channels, capacity=1000):
+        if capacity < 1:
+            raise ValueError("capacity 는 1 이상이어야 합니다.")
+        self.channels = list(channels)
+        self.capacity = capacity
+        self._index = {name: i for i, name in enumerate(self.channels)}
+        self._values = np.full((len(self.channels), 2 * capacity), np.nan, dtype=np.float64)
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._head = 0   # 다음에 기록할 위치 (0 <= head < capacity)
+        self._size = 0
+        self._lock = threading.Lock()
+        # 샘플이 추가될 때마다 증가합니다. 렌더링 캐시의 무효화 키로 사용합니다.
+        self.version = 0
+
+    def __len__(self):
+        return self._size
+
+    # ----------------------------------
+    # 쓰기
+    # ----------------------------------
+    def append(self, values, timestamp_ns):
+        """샘플 한 개(channels 순서의 값 목록)를 추가합니다."""
+        with self._lock:
+            head = self._head
+            self._values[:, head] = values
+            self._values[:, head + self.capacity] = values
+            self._timestamps[head] = timestamp_ns
+            self._timestamps[head + self.capacity] = timestamp_ns
+            self._head = (head + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+            self.version += 1
+
+    def extend(self, values, timestamps_ns):
+        """(n, 채널 수) 배열과 길이 n 의 타임스탬프 배열을 한 번에 추가합니다."""
+        values = np.asarray(values, dtype=np.float64)
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        n = len(timestamps_ns)
+        if n == 0:
+            return
+        if values.shape != (n, len(self.channels)):
+            raise ValueError(f"values 모양이 {(n, len(self.channels))} 이어야 합니다: {values.shape}")
+        if n > self.capacity:
+            values, timestamps_ns = values[-self.capacity:], timestamps_ns[-self.capacity:]
+            skipped, n = n - self.capacity, self.capacity
+        else:
+            skipped = 0
+
+        with self._lock:
+            positions = (self._head + skipped + np.arange(n)) % self.capacity
+            for offset in (0, self.capacity):
+                self._values[:, positions + offset] = values.T
+                self._timestamps[positions + offset] = timestamps_ns
+            self._head = (self._head + skipped + n) % self.capacity
+            self._size = min(self._size + skipped + n, self.capacity)
+            self.version += 1
+
+    def extend_records(self, records):
+        """센서 dict 목록(채널 키와 'timestamp' datetime 포함)을 추가합니다."""
+        if not records:
+            return
+        values = np.array([[record.get(name, np.nan) for name in self.channels] for record in records], dtype=np.float64)
+        timestamps = np.array([to_epoch_ns(record['timestamp']) for record in records], dtype=np.int64)
+        self.extend(values, timestamps)
+
+    def clear(self):
+        """버퍼를 비웁니다."""
+        with self._lock:
+            self._head = 0
+            self._size = 0
+            self.version += 1
+
+    # ----------------------------------
+    # 읽기 (복사 없는 view)
+    # ----------------------------------
+    def _window(self):
+        start = self._head - self._size + self.capacity
+        return start, start + self._size
+
+    def column(self, name):
+        """채널 하나의 값을 오래된 순서로 담은 view 를 반환합니다."""
+        start, end = self._window()
+        return self._values[self._index[name], start:end]
+
+    def values(self):
+        """(채널 수, 샘플 수) 모양의 전체 값 view 를 반환합니다."""
+        start, end = self._window()
+        return self._values[:, start:end]
+
+    def timestamps(self):
+        """UTC epoch 나노초 타임스탬프 view 를 반환합니다."""
+        start, end = self._window()
+        return self._timestamps[start:end]
+
+    def latest(self):
+        """가장 최근 샘플을 {채널: 값, 'timestamp': pd.Timestamp} dict 로 반환합니다.
+
+        값이 없는(NaN) 채널은 dict 에서 빠집니다. 버퍼가 비어 있으면 None 입니다.
+        """
+        if not self._size:
+            return None
+        last = (self._head - 1) % self.capacity
+        row = {}
+        for i, name in enumerate(self.channels):
+            value = self._values[i, last].item()
+            if value == value:
+                row[name] = value
+        row['timestamp'] = pd.Timestamp(int(self._timestamps[last]), tz='UTC')
+        return row
+
+    def to_frame(self):
+        """렌더링용 DataFrame(timestamp + 채널 열)을 만듭니다."""
+        frame = pd.DataFrame(self.values().T, columns=self.channels, copy=False)
+        frame.insert(0, 'timestamp', pd.to_datetime(self.timestamps(), utc=True))
+        return frame
@@ -0,0 +1,111 @@
+import math
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+
+def minmax_indices(y, n_buckets):
+    """y 를 n_buckets 개 구간으로 나눠 구간마다 최솟값/최댓값 위치를 골라 정렬된 인덱스로 반환합니다.
+
+    짧은 스파이크(가스 농도 급상승 등)가 사라지지 않도록 구간의 양 끝값을 모두 남깁니다.
+    """
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    size = math.ceil(n / n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(n_buckets, size)
+    offsets = np.arange(n_buckets) * size
+    lows = offsets + np.argmin(np.where(np.isnan(rows), np.inf, rows), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(rows), -np.inf, rows), axis=1)
+    indices = np.unique(np.concatenate([lows, highs]))
+    return indices[indices < n]
+
+
+def lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets 로 모양을 유지하는 n_out 개 점의 인덱스를 고릅니다."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # 다음 구간의 평균점 (마지막 구간이면 끝점)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs(
+            (x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        indices[i + 1] = prev
+    return indices
+
+
+def downsample(x, y, max_points, method="minmax"):
+    """NaN 을 뺀 뒤 최대 max_points 개 점으로 줄인 (x, y) 를 반환합니다."""
+    mask = ~np.isnan(y)
+    x, y = x[mask], y[mask]
+    if len(y) <= max_points:
+        return x, y
+    if method == "lttb":
+        indices = lttb_indices(x, y, max_points)
+    else:
+        indices = minmax_indices(y, max_points // 2)
+    return x[indices], y[indices]
+
+
+def build_trend_figure(timestamps_ns, series, max_points=1200, method="minmax", cols=2, row_height=220):
+    """채널별 추세를 x 축을 공유하는 하나의 subplot 그림으로 만듭니다.
+
+    timestamps_ns 는 UTC epoch 나노초 배열, series 는 {채널 이름: 값 배열} 입니다.
+    채널마다 max_points 개 이하로 줄이므로 보관 기간이 길어져도 그림 크기는 일정합니다.
+    """
+    names = list(series)
+    rows = max(1, math.ceil(len(names) / cols))
+    fig = make_subplots(
+        rows=rows, cols=cols, shared_xaxes=True,
+        subplot_titles=[f"{name} 변화 추세" for name in names],
+        vertical_spacing=0.12 / rows * 2,
+    )
+    x_all = np.asarray(timestamps_ns, dtype=np.int64)
+    for i, name in enumerate(names):
+        x, y = downsample(x_all, np.asarray(series[name], dtype=np.float64), max_points, method)
+        fig.add_trace(
+            go.Scatter(x=pd.to_datetime(x // 1000, unit="us", utc=True), y=y, mode="lines", name=name, showlegend=False),
+            row=i // cols + 1, col=i % cols + 1,
+        )
+    fig.update_layout(height=row_height * rows, margin=dict(l=20, r=20, t=40, b=20))
+    return fig
+
+
+def build_range_figure(frame, channels, cols=1, row_height=260):
+    """집계 간격별 평균선과 최소~최대 범위 띠를 채널마다 그린 그림을 만듭니다.
+
+    frame 은 'timestamp', '<채널>'(평균), '<채널>_min', '<채널>_max' 열을 가진 DataFrame 입니다.
+    """
+    rows = max(1, math.ceil(len(channels) / cols))
+    fig = make_subplots(
+        rows=rows, cols=cols, shared_xaxes=True,
+        subplot_titles=[f"{name} (평균, 최소~최대)" for name in channels],
+        vertical_spacing=0.12 / rows * 2,
+    )
+    x = frame["timestamp"]
+    for i, name in enumerate(channels):
+        row, col = i // cols + 1, i % cols + 1
+        fig.add_trace(go.Scatter(x=x, y=frame[f"{name}_max"], mode="lines", line=dict(width=0),
+                                 name=f"{name} 최대", showlegend=False), row=row, col=col)
+        fig.add_trace(go.Scatter(x=x, y=frame[f"{name}_min"], mode="lines", line=dict(width=0), fill="tonexty",
+                                 fillcolor="rgba(99,110,250,0.2)", name=f"{name} 최소", showlegend=False), row=row, col=col)
+        fig.add_trace(go.Scatter(x=x, y=frame[name], mode="lines", line=dict(color="rgb(99,110,250)"),
+                                 name=f"{name} 평균", showlegend=False), row=row, col=col)
+    fig.update_layout(height=row_height * rows, margin=dict(l=20, r=20, t=40, b=20))
+    return fig
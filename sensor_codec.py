@@ -0,0 +1,132 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# `multiSensor/numeric` 페이로드의 채널 순서
+SENSOR_KEYS = ["CH4", "EtOH", "H2", "NH3", "CO", "NO2", "Oxygen", "Distance", "Flame"]
+
+# 고정 길이 바이너리 페이로드 (리틀 엔디언, 46 바이트)
+#   magic(1) + version(1) + 센서 값 float32 x 9 + 장치 타임스탬프(epoch ms, int64)
+# 첫 바이트가 ASCII 범위 밖이므로 쉼표 구분 텍스트 페이로드와 혼동되지 않습니다.
+BINARY_MAGIC = 0xA5
+BINARY_VERSION = 1
+BINARY_DTYPE = np.dtype([
+    ("magic", "u1"),
+    ("version", "u1"),
+    ("values", "<f4", (len(SENSOR_KEYS),)),
+    ("device_ts_ms", "<i8"),
+])
+BINARY_SIZE = BINARY_DTYPE.itemsize
+
+# 한 번에 디코딩한 센서 데이터 묶음
+#   values               : (n, 9) float64, SENSOR_KEYS 순서
+#   timestamps_ns        : (n,) int64, 대시보드 수신 시각 (UTC epoch ns)
+#   device_timestamps_ns : (n,) int64, 장치 타임스탬프 (텍스트 페이로드는 0)
+#   rejected             : 잘못된 형식으로 버린 페이로드 수
+DecodedBatch = namedtuple("DecodedBatch", "values timestamps_ns device_timestamps_ns rejected")
+
+
+def encode_binary(values, device_ts_ms):
+    """엣지 보드용: 센서 값 9개와 장치 타임스탬프(epoch ms)를 바이너리 페이로드로 만듭니다."""
+    record = np.zeros(1, dtype=BINARY_DTYPE)
+    record["magic"] = BINARY_MAGIC
+    record["version"] = BINARY_VERSION
+    record["values"] = values
+    record["device_ts_ms"] = device_ts_ms
+    return record.tobytes()
+
+
+def is_binary_payload(payload):
+    """페이로드가 고정 길이 바이너리 형식인지 확인합니다."""
+    return len(payload) == BINARY_SIZE and payload[0] == BINARY_MAGIC
+
+
+def _parse_text_rows(rows):
+    """쉼표 구분 텍스트 행 목록을 (n, 9) 배열과 유효 행 마스크로 변환합니다."""
+    n_cols = len(SENSOR_KEYS)
+    values = np.full((len(rows), n_cols), np.nan)
+    if not rows:
+        return values, np.zeros(0, dtype=bool)
+
+    # 쉼표 개수가 맞는 행만 한 번의 변환으로 파싱합니다.
+    comma_counts = np.char.count(np.array(rows, dtype=str), ",")
+    candidates = np.flatnonzero(comma_counts == n_cols - 1)
+    if len(candidates):
+        tokens = ",".join(rows[i] for i in candidates).split(",")
+        try:
+            values[candidates] = np.array(tokens, dtype=np.float64).reshape(-1, n_cols)
+        except ValueError:
+            # 숫자가 아닌 값이 섞인 행이 있을 때만 행 단위로 나눠 파싱합니다.
+            for i in candidates:
+                try:
+                    values[i] = np.array(rows[i].split(","), dtype=np.float64)
+                except ValueError:
+                    pass
+
+    valid = np.isfinite(values).all(axis=1)
+    return values, valid
+
+
+def decode_batch(payloads):
+    """수신한 (수신 시각 ns, 원본 bytes) 목록을 한 번에 디코딩합니다.
+
+    텍스트와 바이너리 페이로드가 섞여 있어도 되며, 잘못된 행은 예외 대신 제외하고
+    rejected 개수로 알려줍니다. 결과는 수신 순서를 유지합니다.
+    """
+    n = len(payloads)
+    received_ns = np.fromiter((received for received, _ in payloads), dtype=np.int64, count=n)
+    values = np.full((n, len(SENSOR_KEYS)), np.nan)
+    device_ns = np.zeros(n, dtype=np.int64)
+    valid = np.zeros(n, dtype=bool)
+
+    binary_idx, text_idx, text_rows = [], [], []
+    for i, (_, raw) in enumerate(payloads):
+        if is_binary_payload(raw):
+            binary_idx.append(i)
+        else:
+            text_idx.append(i)
+            text_rows.append(raw.decode("utf-8", errors="replace").strip() if isinstance(raw, bytes) else raw.strip())
+
+    if binary_idx:
+        records = np.frombuffer(b"".join(payloads[i][1] for i in binary_idx), dtype=BINARY_DTYPE)
+        idx = np.array(binary_idx)
+        values[idx] = records["values"]
+        device_ns[idx] = records["device_ts_ms"] * 1_000_000
+        valid[idx] = (records["version"] == BINARY_VERSION) & np.isfinite(records["values"]).all(axis=1)
+
+    if text_idx:
+        text_values, text_valid = _parse_text_rows(text_rows)
+        idx = np.array(text_idx)
+        values[idx] = text_values
+        valid[idx] = text_valid
+
+    rejected = int(n - valid.sum())
+    if rejected:
+        samples = [payloads[i][1][:80] for i in np.flatnonzero(~valid)[:3]]
+        logging.warning(f"센서 데이터 파싱 오류: {rejected}/{n}건 제외 - 예시 페이로드: {samples}")
+    return DecodedBatch(values[valid], received_ns[valid], device_ns[valid], rejected)
+
+
+def to_documents(batch, source_device=None):
+    """DecodedBatch 를 MongoDB 에 저장할 센서 문서 목록으로 변환합니다.
+
+    source_device 를 주면 시계열 컬렉션의 meta 필드로 쓰이도록 각 문서에 넣습니다.
+    """
+    if not len(batch.timestamps_ns):
+        return []
+    # datetime 은 마이크로초 정밀도이므로 나노초를 잘라낸 뒤 변환합니다.
+    timestamps = pd.to_datetime(batch.timestamps_ns // 1000, unit="us", utc=True).to_pydatetime()
+    device_timestamps = pd.to_datetime(batch.device_timestamps_ns // 1000, unit="us", utc=True).to_pydatetime()
+    docs = []
+    for row, ts, device_ts, device_ns in zip(batch.values.tolist(), timestamps, device_timestamps, batch.device_timestamps_ns):
+        doc = dict(zip(SENSOR_KEYS, row))
+        doc['Flame'] = int(doc['Flame'])
+        doc['timestamp'] = ts
+        if source_device is not None:
+            doc['source_device'] = source_device
+        if device_ns:
+            doc['device_timestamp'] = device_ts
+        docs.append(doc)
+    return docs
@@ -0,0 +1,179 @@
+"""긴 기간의 센서 기록을 MongoDB 집계 파이프라인으로 줄여서 불러옵니다.
+
+시간 구간($match)과 집계 간격($group + $dateTrunc)별 채널 최소/최대/평균은 서버에서 계산하고,
+앱은 간격당 한 행만 받습니다. 롤업 컬렉션(sensor_rollup)이 덮는 구간은 롤업에서, 나머지 앞/뒤 구간은
+원본에서 집계해 이어 붙이므로 한 달 치를 조회해도 원본 문서를 pandas 로 옮기지 않습니다.
+"""
+import time
+import logging
+from datetime import datetime, timezone
+
+import pandas as pd
+import pymongo
+
+from sensor_codec import SENSOR_KEYS
+from sensor_rollup import ROLLUP_LEVELS, ROLLUP_STATE_COLLECTION, rollup_collection_name
+
+# 선택할 수 있는 집계 간격(초). 모두 하루를 나누어떨어지게 해 KST 자정 기준으로 정렬됩니다.
+HISTORY_INTERVALS = [1, 10, 60, 300, 900, 3600, 6 * 3600, 86400]
+# 집계 버킷 경계를 맞출 시간대 (일 단위 간격을 KST 자정에서 자르기 위함)
+BUCKET_TIMEZONE = "+09:00"
+_TZ_OFFSET = 9 * 3600
+
+
+def interval_label(seconds):
+    """집계 간격을 '10초', '15분', '6시간', '1일' 같은 표시 이름으로 바꿉니다."""
+    for unit, name in ((86400, "일"), (3600, "시간"), (60, "분")):
+        if seconds % unit == 0:
+            return f"{seconds // unit}{name}"
+    return f"{seconds}초"
+
+
+def choose_interval(span, max_points=2000):
+    """버킷 수가 max_points 이하가 되는 가장 짧은 집계 간격(초)을 고릅니다."""
+    seconds = span.total_seconds()
+    for interval in HISTORY_INTERVALS:
+        if seconds / interval <= max_points:
+            return interval
+    return HISTORY_INTERVALS[-1]
+
+
+def _trunc(seconds):
+    """집계 간격을 $dateTrunc 의 (unit, binSize) 로 바꿉니다."""
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds % size == 0:
+            return unit, seconds // size
+    return "second", seconds
+
+
+def align(ts, seconds, up=False):
+    """ts 를 $dateTrunc(timezone=BUCKET_TIMEZONE) 와 같은 경계로 내림(up 이면 올림)합니다."""
+    epoch = ts.timestamp() + _TZ_OFFSET
+    floored = epoch - epoch % seconds
+    if up and floored < epoch:
+        floored += seconds
+    return datetime.fromtimestamp(floored - _TZ_OFFSET, tz=timezone.utc)
+
+
+def _device_filter(device, default_device):
+    # 이전 토픽으로 저장된 문서에는 장치 ID 가 없으므로 기본 장치는 필드가 없는 문서도 포함합니다.
+    if device is None:
+        return {}
+    if device == default_device:
+        return {"source_device": {"$in": [device, None]}}
+    return {"source_device": device}
+
+
+def history_pipeline(start, end, interval, channels, device=None, default_device=None, from_rollup=False):
+    """[start, end) 를 interval 초 간격으로 묶어 채널별 최소/최대/평균을 계산하는 파이프라인을 만듭니다.
+
+    결과 문서: {timestamp, count, <채널>: 평균, <채널>_min, <채널>_max}. from_rollup 이면 롤업 문서의
+    {min, max, sum} 과 count 를 다시 합칩니다.
+    """
+    unit, bin_size = _trunc(interval)
+    group = {
+        "_id": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size, "timezone": BUCKET_TIMEZONE}},
+        "count": {"$sum": "$count" if from_rollup else 1},
+    }
+    project = {"_id": 0, "timestamp": "$_id", "count": 1}
+    for key in channels:
+        if from_rollup:
+            group[f"{key}_min"] = {"$min": f"${key}.min"}
+            group[f"{key}_max"] = {"$max": f"${key}.max"}
+            group[f"{key}_sum"] = {"$sum": f"${key}.sum"}
+            project[key] = {"$cond": [{"$gt": ["$count", 0]}, {"$divide": [f"${key}_sum", "$count"]}, None]}
+        else:
+            group[f"{key}_min"] = {"$min": f"${key}"}
+            group[f"{key}_max"] = {"$max": f"${key}"}
+            group[key] = {"$avg": f"${key}"}
+            project[key] = 1
+        project[f"{key}_min"] = 1
+        project[f"{key}_max"] = 1
+
+    match = {"timestamp": {"$gte": start, "$lt": end}, **_device_filter(device, default_device)}
+    return [{"$match": match}, {"$group": group}, {"$sort": {"_id": 1}}, {"$project": project}]
+
+
+def _as_utc(ts):
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def rollup_coverage(db, base_name, level):
+    """롤업 컬렉션이 덮는 [처음 버킷, 워터마크) 구간을 반환합니다. 롤업이 없으면 None 입니다."""
+    first = db[rollup_collection_name(base_name, level)].find_one(
+        {}, {"timestamp": 1}, sort=[("timestamp", pymongo.ASCENDING)]
+    )
+    state = db[ROLLUP_STATE_COLLECTION].find_one({"_id": base_name})
+    if not first or not state or not state.get("watermark"):
+        return None
+    return _as_utc(first["timestamp"]), _as_utc(state["watermark"])
+
+
+def plan_segments(db, base_name, start, end, interval):
+    """조회 구간을 (원본 컬렉션 이름, 롤업 여부, 시작, 끝) 구간들로 나눕니다.
+
+    interval 을 나누어떨어지게 하는 롤업 중 데이터가 있는 가장 굵은 것을 고르고, 롤업이 덮는 부분을 버킷 경계에 맞춰 잘라
+    그 앞뒤는 원본에서 집계합니다. 경계를 맞추므로 한 버킷이 두 구간에 걸치지 않습니다.
+    """
+    for level, seconds, _, _ in reversed(ROLLUP_LEVELS):
+        if interval % seconds:
+            continue
+        coverage = rollup_coverage(db, base_name, level)
+        if not coverage:
+            continue
+        lo = max(start, align(coverage[0], interval, up=True))
+        hi = min(end, align(coverage[1], interval))
+        if lo < hi:
+            segments = [(base_name, False, start, lo), (rollup_collection_name(base_name, level), True, lo, hi),
+                        (base_name, False, hi, end)]
+            return [segment for segment in segments if segment[2] < segment[3]]
+    return [(base_name, False, start, end)]
+
+
+def iter_batches(cursor, batch_size):
+    """커서 결과를 batch_size 개씩 묶어 차례로 돌려줍니다."""
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_history(db, base_name, start, end, interval=None, channels=SENSOR_KEYS, device=None, default_device=None,
+                 max_points=2000, batch_size=1000, use_rollups=True):
+    """[start, end) 의 센서 기록을 집계 간격별 DataFrame 과 조회 정보 dict 로 반환합니다.
+
+    interval 을 주지 않으면 버킷 수가 max_points 이하가 되도록 고릅니다. 결과는 batch_size 개씩 받아
+    DataFrame 조각으로 바꾸므로, 버킷이 많아도 문서 dict 목록을 한꺼번에 들고 있지 않습니다.
+    """
+    started = time.perf_counter()
+    interval = interval or choose_interval(end - start, max_points=max_points)
+    channels = list(channels)
+    columns = ["timestamp", "count", *[col for key in channels for col in (key, f"{key}_min", f"{key}_max")]]
+    segments = plan_segments(db, base_name, start, end, interval) if use_rollups else [(base_name, False, start, end)]
+
+    frames, sources = [], []
+    for collection_name, from_rollup, seg_start, seg_end in segments:
+        pipeline = history_pipeline(seg_start, seg_end, interval, channels, device=device,
+                                    default_device=default_device, from_rollup=from_rollup)
+        cursor = db[collection_name].aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+        for batch in iter_batches(cursor, batch_size):
+            frames.append(pd.DataFrame(batch, columns=columns))
+        sources.append(collection_name)
+
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+    if not frame.empty:
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True)
+    info = {
+        "interval": interval,
+        "sources": sources,
+        "buckets": len(frame),
+        "samples": int(frame["count"].sum()) if not frame.empty else 0,
+        "elapsed": time.perf_counter() - started,
+    }
+    logging.info(f"[{base_name}] 기록 조회 {start.isoformat()} ~ {end.isoformat()} "
+                 f"({interval_label(interval)} 간격, {info['buckets']}개 버킷, {info['elapsed']:.2f}s, 출처: {', '.join(sources)})")
+    return frame, info
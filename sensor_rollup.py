@@ -0,0 +1,294 @@
+"""센서 데이터 시계열 컬렉션 구성과 1초/1분/1시간 롤업(min/max/mean) 유지.
+
+롤업 작업은 주기적으로 최근 구간의 버킷을 원본(또는 한 단계 아래 롤업)에서 다시 계산해
+$merge 로 덮어씁니다. 버킷 단위로 통째로 다시 계산하므로 같은 구간을 여러 번 처리해도
+결과가 같고, 재계산 구간(recompute_window) 안에 늦게 기록된 데이터도 반영됩니다.
+
+사용 예 (수동 작업):
+    python sensor_rollup.py migrate --uri "$MONGO_URI"            # 기존 일반 컬렉션을 시계열 컬렉션으로 옮김
+    python sensor_rollup.py backfill --uri "$MONGO_URI" --since 2025-01-01
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pymongo
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from sensor_codec import SENSOR_KEYS
+
+# (이름, 버킷 길이(초), $dateTrunc 단위, 원본 컬렉션 접미사)  - 원본 접미사 None 은 원본 센서 컬렉션
+ROLLUP_LEVELS = [
+    ("1s", 1, "second", None),
+    ("1m", 60, "minute", "1s"),
+    ("1h", 3600, "hour", "1m"),
+]
+ROLLUP_STATE_COLLECTION = "rollup_state"
+
+
+def rollup_collection_name(base_name, level):
+    """롤업 컬렉션 이름을 반환합니다. 예: SensorData_1m"""
+    return f"{base_name}_{level}"
+
+
+def ensure_timeseries_collection(db, name, time_field="timestamp", meta_field="source_device", granularity="seconds"):
+    """센서 컬렉션을 시계열 컬렉션으로 만듭니다. 이미 일반 컬렉션이 있으면 경고만 남기고 그대로 사용합니다."""
+    existing = {info["name"]: info for info in db.list_collections(filter={"name": name})}
+    if name in existing:
+        if existing[name].get("type") != "timeseries":
+            logging.warning(f"'{db.name}.{name}' 은 일반 컬렉션입니다. "
+                            f"시계열 컬렉션으로 옮기려면 'python sensor_rollup.py migrate' 를 실행하세요.")
+        return db[name]
+    try:
+        db.create_collection(name, timeseries={
+            "timeField": time_field, "metaField": meta_field, "granularity": granularity,
+        })
+        logging.info(f"✅ 시계열 컬렉션 생성: '{db.name}.{name}' (meta: {meta_field})")
+    except CollectionInvalid:
+        pass
+    return db[name]
+
+
+def migrate_to_timeseries(db, name, batch_size=5000, default_device=None):
+    """일반 센서 컬렉션을 '<name>_legacy' 로 바꾸고, 새 시계열 컬렉션에 문서를 옮겨 담습니다."""
+    info = next(iter(db.list_collections(filter={"name": name})), None)
+    if info is None or info.get("type") == "timeseries":
+        logging.info(f"'{db.name}.{name}' 은 옮길 필요가 없습니다.")
+        return 0
+    legacy_name = f"{name}_legacy"
+    db[name].rename(legacy_name)
+    target = ensure_timeseries_collection(db, name)
+
+    moved, batch = 0, []
+    for doc in db[legacy_name].find({}, {"_id": 0}).sort("timestamp", pymongo.ASCENDING).batch_size(batch_size):
+        if default_device and "source_device" not in doc:
+            doc["source_device"] = default_device
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            target.insert_many(batch, ordered=False)
+            moved += len(batch)
+            batch = []
+            logging.info(f"[{name}] 시계열 컬렉션으로 이동: {moved}건")
+    if batch:
+        target.insert_many(batch, ordered=False)
+        moved += len(batch)
+    logging.info(f"[{name}] 이동 완료: {moved}건 (원본은 '{legacy_name}' 에 남아 있습니다)")
+    return moved
+
+
+def _floor(ts, seconds):
+    epoch = int(ts.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+
+def _rollup_pipeline(start, end, unit, from_raw):
+    """[start, end) 구간을 unit 버킷으로 묶는 집계 파이프라인을 만듭니다."""
+    group = {
+        "_id": {"device": "$source_device", "t": {"$dateTrunc": {"date": "$timestamp", "unit": unit}}},
+        "count": {"$sum": 1 if from_raw else "$count"},
+    }
+    for key in SENSOR_KEYS:
+        if from_raw:
+            group[f"{key}_min"] = {"$min": f"${key}"}
+            group[f"{key}_max"] = {"$max": f"${key}"}
+            group[f"{key}_sum"] = {"$sum": f"${key}"}
+        else:
+            group[f"{key}_min"] = {"$min": f"${key}.min"}
+            group[f"{key}_max"] = {"$max": f"${key}.max"}
+            group[f"{key}_sum"] = {"$sum": f"${key}.sum"}
+
+    project = {"_id": 1, "source_device": "$_id.device", "timestamp": "$_id.t", "count": 1}
+    for key in SENSOR_KEYS:
+        project[key] = {"min": f"${key}_min", "max": f"${key}_max", "sum": f"${key}_sum"}
+
+    return [
+        {"$match": {"timestamp": {"$gte": start, "$lt": end}}},
+        {"$group": group},
+        {"$project": project},
+    ]
+
+
+class SensorRollupJob:
+    """원본 센서 컬렉션에서 1초/1분/1시간 롤업을 주기적으로 갱신하는 백그라운드 작업입니다."""
+
+    def __init__(self, db, base_name, interval=10.0, settle_lag=5.0, recompute_window=120.0):
+        self.db = db
+        self.base_name = base_name
+        self.interval = interval
+        # 배치 writer 지연을 고려해 현재 시각보다 settle_lag 초 이전까지만 집계합니다.
+        self.settle_lag = settle_lag
+        self.recompute_window = recompute_window
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.last_duration = None
+
+    def ensure_indexes(self):
+        """롤업 컬렉션의 (장치, 시간) 조회 인덱스를 만듭니다."""
+        for level, _, _, _ in ROLLUP_LEVELS:
+            self.db[rollup_collection_name(self.base_name, level)].create_index(
+                [("source_device", pymongo.ASCENDING), ("timestamp", pymongo.ASCENDING)]
+            )
+            self.db[rollup_collection_name(self.base_name, level)].create_index([("timestamp", pymongo.ASCENDING)])
+
+    def _get_watermark(self):
+        state = self.db[ROLLUP_STATE_COLLECTION].find_one({"_id": self.base_name})
+        if state and state.get("watermark"):
+            watermark = state["watermark"]
+            return watermark if watermark.tzinfo else watermark.replace(tzinfo=timezone.utc)
+        return None
+
+    def _set_watermark(self, watermark):
+        self.db[ROLLUP_STATE_COLLECTION].update_one(
+            {"_id": self.base_name}, {"$set": {"watermark": watermark}}, upsert=True
+        )
+
+    def run_once(self, since=None, until=None):
+        """since(없으면 저장된 워터마크 - 재계산 구간) 부터 until 까지의 롤업을 갱신합니다."""
+        started = time.perf_counter()
+        end = until or datetime.now(timezone.utc) - timedelta(seconds=self.settle_lag)
+        if since is None:
+            watermark = self._get_watermark() or end
+            since = watermark - timedelta(seconds=self.recompute_window)
+
+        for level, seconds, unit, source in ROLLUP_LEVELS:
+            source_name = self.base_name if source is None else rollup_collection_name(self.base_name, source)
+            target_name = rollup_collection_name(self.base_name, level)
+            pipeline = _rollup_pipeline(_floor(since, seconds), end, unit, from_raw=source is None)
+            pipeline.append({"$merge": {"into": target_name, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}})
+            self.db[source_name].aggregate(pipeline, allowDiskUse=True)
+
+        self._set_watermark(end)
+        self.last_run = end
+        self.last_duration = time.perf_counter() - started
+        return end
+
+    def backfill(self, since, chunk=timedelta(days=1)):
+        """since 부터 현재까지 chunk 단위로 나눠 롤업을 다시 계산합니다."""
+        end = datetime.now(timezone.utc) - timedelta(seconds=self.settle_lag)
+        cursor = since
+        while cursor < end:
+            until = min(cursor + chunk, end)
+            self.run_once(since=cursor, until=until)
+            logging.info(f"[{self.base_name}] 롤업 backfill: {cursor.isoformat()} ~ {until.isoformat()}")
+            cursor = until
+
+    def start(self):
+        """주기적 롤업 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        try:
+            self.ensure_indexes()
+        except PyMongoError as e:
+            logging.warning(f"[{self.base_name}] 롤업 인덱스 생성 실패: {e}")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"rollup-{self.base_name}", daemon=True)
+        self._thread.start()
+        logging.info(f"[{self.base_name}] 센서 롤업 작업 시작 (주기 {self.interval}s)")
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"[{self.base_name}] 센서 롤업 실패: {e}")
+            self._stop_event.wait(self.interval)
+
+
+# ==================================
+# 조회: 구간 길이에 맞는 해상도 선택
+# ==================================
+def choose_resolution(span, max_points=3600, raw_max_span=timedelta(minutes=10)):
+    """조회 구간 길이에 맞는 해상도('raw', '1s', '1m', '1h')를 고릅니다.
+
+    raw_max_span 이하면 원본을, 그보다 길면 버킷 수가 max_points 이하가 되는 가장 촘촘한 롤업을 씁니다.
+    """
+    if span <= raw_max_span:
+        return "raw"
+    seconds = span.total_seconds()
+    for level, bucket_seconds, _, _ in ROLLUP_LEVELS:
+        if seconds / bucket_seconds <= max_points:
+            return level
+    return ROLLUP_LEVELS[-1][0]
+
+
+def load_series(db, base_name, start, end, device=None, resolution=None, max_points=3600):
+    """[start, end) 구간의 센서 추세를 (DataFrame, 해상도) 로 반환합니다.
+
+    롤업 해상도에서는 채널별 평균을 채널 이름 열에, 최소/최대를 '<채널>_min', '<채널>_max' 열에 담습니다.
+    """
+    resolution = resolution or choose_resolution(end - start, max_points=max_points)
+    query = {"timestamp": {"$gte": start, "$lt": end}}
+    if device is not None:
+        query["source_device"] = device
+
+    if resolution == "raw":
+        projection = {"_id": 0, "timestamp": 1, **{key: 1 for key in SENSOR_KEYS}}
+        docs = list(db[base_name].find(query, projection).sort("timestamp", pymongo.ASCENDING))
+        frame = pd.DataFrame(docs, columns=["timestamp", *SENSOR_KEYS])
+    else:
+        rows = []
+        for doc in db[rollup_collection_name(base_name, resolution)].find(query).sort("timestamp", pymongo.ASCENDING):
+            count = doc.get("count") or 1
+            row = {"timestamp": doc["timestamp"]}
+            for key in SENSOR_KEYS:
+                stats = doc.get(key) or {}
+                row[key] = stats["sum"] / count if stats.get("sum") is not None else None
+                row[f"{key}_min"] = stats.get("min")
+                row[f"{key}_max"] = stats.get("max")
+            rows.append(row)
+        frame = pd.DataFrame(rows, columns=["timestamp", *[
+            col for key in SENSOR_KEYS for col in (key, f"{key}_min", f"{key}_max")
+        ]])
+        # 장치를 지정하지 않으면 같은 시각의 여러 장치 버킷이 섞이므로 시각별로 합칩니다.
+        if device is None and not frame.empty:
+            agg = {key: "mean" for key in SENSOR_KEYS}
+            agg.update({f"{key}_min": "min" for key in SENSOR_KEYS})
+            agg.update({f"{key}_max": "max" for key in SENSOR_KEYS})
+            frame = frame.groupby("timestamp", as_index=False).agg(agg)
+
+    if not frame.empty:
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], utc=True)
+    return frame, resolution
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        datefmt='%Y-%m-%d %H:%M:%S', stream=sys.stdout)
+    parser = argparse.ArgumentParser(description="센서 시계열 컬렉션 이동 및 롤업 backfill 도구")
+    parser.add_argument("command", choices=["migrate", "backfill"])
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI"), help="MongoDB URI (기본값: 환경변수 MONGO_URI)")
+    parser.add_argument("--db", default="SensorDB")
+    parser.add_argument("--collection", default="SensorData")
+    parser.add_argument("--device", default="multiSensor", help="migrate 시 source_device 가 없는 문서에 넣을 장치 ID")
+    parser.add_argument("--since", help="backfill 시작일 (YYYY-MM-DD, UTC)")
+    args = parser.parse_args(argv)
+    if not args.uri:
+        parser.error("--uri 또는 환경변수 MONGO_URI 가 필요합니다.")
+
+    db = pymongo.MongoClient(args.uri, serverSelectionTimeoutMS=5000)[args.db]
+    if args.command == "migrate":
+        migrate_to_timeseries(db, args.collection, default_device=args.device)
+    else:
+        if not args.since:
+            parser.error("backfill 에는 --since 가 필요합니다.")
+        since = datetime.strptime(args.since, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        job = SensorRollupJob(db, args.collection)
+        job.ensure_indexes()
+        job.backfill(since)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
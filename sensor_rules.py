@@ -0,0 +1,166 @@
+import threading
+from datetime import datetime, timezone
+
+import numpy as np
+
+LEVELS = ("normal", "warning", "danger")
+COMPARATORS = (">=", ">", "<=", "<", "==", "outside")
+
+
+class ThresholdRule:
+    """채널 하나에 대한 단계별 임계값 규칙입니다.
+
+    levels 는 {"warning": 기준값, "danger": 기준값} 형태이며, op 가 "outside" 이면 기준값은 (최소, 최대) 안전 범위입니다.
+    경보는 기준을 넘으면 켜지고, hysteresis 만큼 안쪽으로 돌아와야 꺼집니다.
+    min_duration(초) 동안 계속 켜져 있어야 해당 단계로 인정합니다.
+    messages 는 단계별 메시지 템플릿({value} 사용 가능)이며, 'normal' 메시지는 정상 복귀 시 사용합니다.
+    """
+
+    def __init__(self, name, channel, op, levels, hysteresis=0.0, min_duration=0.0,
+                 messages=None, icon=None, sound=None):
+        if op not in COMPARATORS:
+            raise ValueError(f"지원하지 않는 비교 연산입니다: {op}")
+        unknown = set(levels) - set(LEVELS[1:])
+        if unknown:
+            raise ValueError(f"알 수 없는 경보 단계입니다: {sorted(unknown)}")
+        self.name = name
+        self.channel = channel
+        self.op = op
+        # 낮은 단계부터 평가합니다. (단계 번호, 기준값)
+        self.levels = [(LEVELS.index(level), levels[level]) for level in LEVELS[1:] if level in levels]
+        self.hysteresis = hysteresis
+        self.min_duration_ns = int(min_duration * 1_000_000_000)
+        self.messages = messages or {}
+        self.icon = icon
+        self.sound = sound
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(**config)
+
+    def on_off(self, values, threshold):
+        """경보가 켜지는 샘플과 꺼지는 샘플을 bool 배열로 반환합니다. NaN 은 둘 다 아니므로 이전 상태를 유지합니다."""
+        h = self.hysteresis
+        with np.errstate(invalid="ignore"):
+            if self.op == ">=":
+                return values >= threshold, values < threshold - h
+            if self.op == ">":
+                return values > threshold, values <= threshold - h
+            if self.op == "<=":
+                return values <= threshold, values > threshold + h
+            if self.op == "<":
+                return values < threshold, values >= threshold + h
+            if self.op == "==":
+                return values == threshold, ~np.isnan(values) & (values != threshold)
+            low, high = threshold
+            return (values < low) | (values > high), (values >= low + h) & (values <= high - h)
+
+    def format_message(self, level, value):
+        template = self.messages.get(LEVELS[level])
+        if template is None:
+            template = f"✅ {self.channel} 정상 범위로 복귀 (현재 값: {{value:.3f}})" if level == 0 else f"{self.channel} {LEVELS[level]}: {{value:.3f}}"
+        return template.format(value=value)
+
+
+def _hold(on, off, initial):
+    """on 에서 켜지고 off 에서 꺼지며 그 외에는 직전 상태를 유지하는 상태 배열을 반복문 없이 계산합니다."""
+    positions = np.arange(len(on))
+    last_change = np.where(on | off, positions, -1)
+    np.maximum.accumulate(last_change, out=last_change)
+    return np.where(last_change >= 0, on[np.maximum(last_change, 0)], initial)
+
+
+class RuleEngine:
+    """여러 임계값 규칙을 수신 묶음(샘플 배열) 단위로 평가하고, 단계가 바뀐 시점만 이벤트로 돌려줍니다.
+
+    규칙별 경보 상태와 지속 시작 시각은 묶음 사이에 이어지므로, 묶음 경계에서 같은 이벤트가 반복되지 않습니다.
+    """
+
+    def __init__(self, rules, channels):
+        self.rules = [rule if isinstance(rule, ThresholdRule) else ThresholdRule.from_config(rule) for rule in rules]
+        self._index = {name: i for i, name in enumerate(channels)}
+        missing = [rule.channel for rule in self.rules if rule.channel not in self._index]
+        if missing:
+            raise ValueError(f"알 수 없는 센서 채널입니다: {missing}")
+        self._lock = threading.Lock()
+        # 규칙별 현재 단계, 마지막 값/시각, 단계 진입 시각과 (단계별) 켜짐 상태/켜진 시각
+        self._state = {
+            rule.name: {"level": 0, "value": None, "timestamp": None, "since": None,
+                        "active": {level: False for level, _ in rule.levels},
+                        "run_start": {level: 0 for level, _ in rule.levels}}
+            for rule in self.rules
+        }
+
+    def evaluate(self, values, timestamps_ns):
+        """(샘플 수, 채널 수) 값 배열과 타임스탬프 배열을 평가해 단계 전환 이벤트 목록을 반환합니다."""
+        values = np.asarray(values, dtype=np.float64)
+        timestamps_ns = np.asarray(timestamps_ns, dtype=np.int64)
+        if not len(timestamps_ns):
+            return []
+        positions = np.arange(len(timestamps_ns))
+        events = []
+        with self._lock:
+            for rule in self.rules:
+                column = values[:, self._index[rule.channel]]
+                state = self._state[rule.name]
+                level = np.zeros(len(column), dtype=np.int64)
+                for level_no, threshold in rule.levels:
+                    on, off = rule.on_off(column, threshold)
+                    previous = state["active"][level_no]
+                    active = _hold(on, off, previous)
+                    # 현재 켜짐 구간이 시작된 시각 (이전 묶음에서 이어지면 저장된 시각)
+                    started = active & ~np.concatenate(([previous], active[:-1]))
+                    start_pos = np.where(started, positions, -1)
+                    np.maximum.accumulate(start_pos, out=start_pos)
+                    run_start = np.where(start_pos >= 0, timestamps_ns[np.maximum(start_pos, 0)], state["run_start"][level_no])
+                    confirmed = active & (timestamps_ns - run_start >= rule.min_duration_ns)
+                    level = np.where(confirmed, level_no, level)
+                    state["active"][level_no] = bool(active[-1])
+                    state["run_start"][level_no] = int(run_start[-1])
+
+                changed = np.flatnonzero(level != np.concatenate(([state["level"]], level[:-1])))
+                for i in changed:
+                    events.append(self._make_event(rule, int(level[i]), int(level[i - 1]) if i else state["level"],
+                                                   column[i].item(), int(timestamps_ns[i])))
+                if len(changed):
+                    state["since"] = datetime.fromtimestamp(timestamps_ns[changed[-1]] / 1e9, tz=timezone.utc)
+                state["level"] = int(level[-1])
+                valid = np.flatnonzero(~np.isnan(column))
+                if len(valid):
+                    state["value"] = column[valid[-1]].item()
+                    state["timestamp"] = datetime.fromtimestamp(timestamps_ns[valid[-1]] / 1e9, tz=timezone.utc)
+        return events
+
+    def _make_event(self, rule, level, previous, value, timestamp_ns):
+        raised = level > previous
+        return {
+            "rule": rule.name,
+            "channel": rule.channel,
+            "level": LEVELS[level],
+            "previous": LEVELS[previous],
+            "value": value,
+            "timestamp": datetime.fromtimestamp(timestamp_ns / 1e9, tz=timezone.utc),
+            "message": rule.format_message(level, value),
+            # 화면 알림과 알림음은 경보 단계가 올라갈 때만 사용합니다.
+            "icon": rule.icon if raised else None,
+            "sound": rule.sound if raised else None,
+        }
+
+    def current(self):
+        """규칙별 현재 단계를 [{rule, channel, level, value, since, message}] 로 반환합니다. (경보 단계가 높은 순)"""
+        with self._lock:
+            result = []
+            for rule in self.rules:
+                state = self._state[rule.name]
+                if state["value"] is None:
+                    continue
+                result.append({
+                    "rule": rule.name,
+                    "channel": rule.channel,
+                    "level": LEVELS[state["level"]],
+                    "value": state["value"],
+                    "since": state["since"],
+                    "message": rule.format_message(state["level"], state["value"]),
+                    "icon": rule.icon,
+                })
+        return sorted(result, key=lambda item: -LEVELS.index(item["level"]))
@@ -0,0 +1,139 @@
+import time
+import random
+import threading
+import logging
+import atexit
+
+
+class ConnectionSupervisor:
+    """페이지 렌더와 별도로 돌면서 연결 상태를 주기적으로 확인하고, 끊긴 연결만 다시 붙이는 스레드입니다.
+
+    구성 요소마다 확인 함수(check)와 재연결 함수(reconnect)를 등록합니다. check 가 False 를 돌려주거나
+    예외를 내면 grace 초를 기다린 뒤 재연결하며, 실패하면 지터를 섞은 지수 백오프로 간격을 늘립니다.
+    다른 구성 요소나 큐, 커넥션 풀은 건드리지 않습니다.
+    """
+
+    def __init__(self, name="supervisor", interval=5.0, grace=10.0, base_backoff=1.0, max_backoff=60.0, jitter=0.5):
+        self.name = name
+        self.interval = interval
+        self.grace = grace
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self._components = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def add(self, name, check, reconnect):
+        """구성 요소를 등록합니다. check() 는 살아 있으면 True, reconnect() 는 실패 시 예외를 냅니다."""
+        with self._lock:
+            self._components[name] = {
+                "check": check, "reconnect": reconnect,
+                "alive": None, "down_since": None, "failures": 0, "next_attempt": 0.0,
+                "reconnects": 0, "last_ok": None, "last_error": None,
+            }
+        return self
+
+    def add_mqtt(self, name, client):
+        """paho MQTT 클라이언트를 등록합니다.
+
+        끊긴 직후에는 paho 네트워크 루프가 스스로 재연결하도록 두고, grace 가 지나도 끊겨 있으면
+        루프를 멈추고 이 스레드의 백오프로 재연결한 뒤 루프를 다시 시작합니다.
+        """
+        def reconnect():
+            client.loop_stop()
+            try:
+                client.reconnect()
+            finally:
+                client.loop_start()
+        return self.add(name, client.is_connected, reconnect)
+
+    def add_mongo(self, name, client):
+        """pymongo 클라이언트를 등록합니다. 드라이버가 커넥션 풀을 스스로 복구하므로 ping 으로 확인만 합니다."""
+        def ping():
+            client.admin.command("ping")
+            return True
+        return self.add(name, ping, ping)
+
+    def backoff(self, failures):
+        """실패 횟수에 따른 다음 재시도까지의 대기 시간(초)입니다."""
+        delay = min(self.max_backoff, self.base_backoff * 2 ** max(failures - 1, 0))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    # ----------------------------------
+    # 생명주기
+    # ----------------------------------
+    def start(self):
+        """감시 스레드를 시작합니다."""
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-thread", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        logging.info(f"[{self.name}] 연결 감시 시작 (대상: {', '.join(self._components)})")
+        return self
+
+    def stop(self, timeout=5.0):
+        """감시 스레드를 종료합니다."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.check_all()
+            self._stop_event.wait(self.interval)
+
+    def check_all(self, now=None):
+        """모든 구성 요소를 한 번 확인하고, 필요한 것만 재연결합니다."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            components = list(self._components.items())
+        for name, entry in components:
+            try:
+                alive = bool(entry["check"]())
+                error = None
+            except Exception as e:
+                alive, error = False, str(e)
+            if alive:
+                if entry["alive"] is False:
+                    logging.info(f"[{self.name}] '{name}' 연결 복구됨")
+                entry.update(alive=True, down_since=None, failures=0, next_attempt=0.0, last_ok=time.time())
+                continue
+
+            if entry["alive"] is not False:
+                logging.warning(f"[{self.name}] '{name}' 연결 끊김 감지{f': {error}' if error else ''}")
+                entry.update(alive=False, down_since=now, next_attempt=now + self.grace)
+            if error:
+                entry["last_error"] = error
+            if now < entry["next_attempt"]:
+                continue
+            # 재연결 요청이 받아들여져도 다음 확인 때까지 살아나지 않으면 실패로 보고 간격을 늘립니다.
+            entry["failures"] += 1
+            try:
+                entry["reconnect"]()
+                entry["reconnects"] += 1
+                logging.info(f"[{self.name}] '{name}' 재연결 시도 ({entry['failures']}회)")
+            except Exception as e:
+                entry["last_error"] = str(e)
+                logging.error(f"[{self.name}] '{name}' 재연결 실패 ({entry['failures']}회): {e}")
+            entry["next_attempt"] = now + self.backoff(entry["failures"])
+
+    def get_status(self, now=None):
+        """구성 요소별 상태 사본을 반환합니다. retry_in 은 다음 재연결까지 남은 초입니다."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return {
+                name: {
+                    "alive": entry["alive"],
+                    "failures": entry["failures"],
+                    "reconnects": entry["reconnects"],
+                    "down_for": None if entry["down_since"] is None else now - entry["down_since"],
+                    "retry_in": None if entry["alive"] is not False else max(0.0, entry["next_attempt"] - now),
+                    "last_ok": entry["last_ok"],
+                    "last_error": entry["last_error"],
+                }
+                for name, entry in self._components.items()
+            }